@@ -5,9 +5,11 @@ from concurrent.futures import ThreadPoolExecutor
 import os
 from dotenv import load_dotenv
 import logging
-from backend.utils.logger import Logger # <-- RUTA CORREGIDA
+from backend.utils.logger import Logger, VERBOSE_LOG_SAMPLE_RATE # <-- RUTA CORREGIDA
+from backend.utils.telemetry import telemetry
 import json
 import re
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
@@ -773,25 +775,26 @@ class auto_analyst_ind(dspy.Module):
         # Execute a specific agent with given inputs
         agent_module = getattr(self, specified_agent, None)
         if agent_module:
-            return agent_module(**inputs)
+            with telemetry.span(specified_agent, kind="agent_step"):
+                return agent_module(**inputs)
         else:
             raise ValueError(f"Agent {specified_agent} not found")
     
-    def execute_agent_with_memory(self, specified_agent, inputs, query):
-        # Execute agent with memory context
+    def execute_agent_with_memory(self, specified_agent, inputs, query, session_id=None):
+        # Execute agent with memory context (scoped to the session)
         try:
             # Get memory context
-            memory_context = self.memory_agent.forward(query=query)
+            memory_context = self.memory_agent.forward(query=query, session_id=session_id)
             
             # Add memory context to inputs
             if 'dataset' in inputs:
-                inputs['dataset'] = f"{inputs['dataset']}\n\nMemory Context: {memory_context.memory_context}"
+                inputs['dataset'] = f"{inputs['dataset']}\n\nMemory Context: {memory_context['memory_context']}"
             
             # Execute the agent
             result = self.execute_agent(specified_agent, inputs)
             
             # Update memory with result
-            self.memory_agent.update_memory(query, str(result))
+            self.memory_agent.update_memory(query, str(result), session_id=session_id)
             
             return result
         except Exception as e:
@@ -799,7 +802,7 @@ class auto_analyst_ind(dspy.Module):
             # Fallback to regular execution
             return self.execute_agent(specified_agent, inputs)
     
-    def forward(self, query, specified_agent):
+    def forward(self, query, specified_agent, session_id=None):
         # Main forward method for individual agent execution
         try:
             # Prepare inputs based on agent type
@@ -830,13 +833,13 @@ class auto_analyst_ind(dspy.Module):
                 inputs = {'query': query}
             
             # Execute with memory if available
-            return self.execute_agent_with_memory(specified_agent, inputs, query)
+            return self.execute_agent_with_memory(specified_agent, inputs, query, session_id=session_id)
             
         except Exception as e:
             logger.log_message(f"Error in auto_analyst_ind forward: {str(e)}", level=logging.ERROR)
             return {"error": str(e)}
     
-    def execute_multiple_agents(self, query, agent_list):
+    def execute_multiple_agents(self, query, agent_list, session_id=None):
         # Execute multiple agents in sequence
         results = {}
         accumulated_context = ""
@@ -846,7 +849,7 @@ class auto_analyst_ind(dspy.Module):
                 # Add accumulated context to query for subsequent agents
                 enhanced_query = f"{query}\n\nPrevious Results: {accumulated_context}" if accumulated_context else query
                 
-                result = self.forward(enhanced_query, agent_name)
+                result = self.forward(enhanced_query, agent_name, session_id=session_id)
                 results[agent_name] = result
                 
                 # Accumulate context for next agent
@@ -904,10 +907,36 @@ class auto_analyst(dspy.Module):
         # Execute a specific agent with given inputs
         agent_module = getattr(self, agent_name, None)
         if agent_module:
-            return agent_module(**inputs)
+            with telemetry.span(agent_name, kind="agent_step"):
+                return agent_module(**inputs)
         else:
             raise ValueError(f"Agent {agent_name} not found")
     
+    def _recall_memory(self, query, session_id=None):
+        # Interactions of the session relevant to the query (session from the request trace when not given)
+        try:
+            return self.memory_agent.forward(query=query, session_id=session_id).get("memory_context", "")
+        except Exception as e:
+            logger.log_message(f"Error recalling memory: {str(e)}", level=logging.ERROR)
+            return ""
+    
+    def _remember(self, query, response, session_id=None):
+        try:
+            self.memory_agent.update_memory(query, str(response), session_id=session_id)
+        except Exception as e:
+            logger.log_message(f"Error updating memory: {str(e)}", level=logging.ERROR)
+    
+    def execute_agent_with_memory(self, agent_name, inputs, query, session_id=None):
+        # Execute an agent with the session's memory context added to its dataset input,
+        # then record the interaction in the session's memory
+        memory_context = self._recall_memory(query, session_id)
+        if memory_context and 'dataset' in inputs:
+            inputs = {**inputs, 'dataset': f"{inputs['dataset']}\n\nMemory Context: {memory_context}"}
+        result = self.execute_agent(agent_name, inputs)
+        self._remember(query, getattr(result, 'summary', None) or result, session_id)
+        return result
+    
+    @telemetry.traced("auto_analyst.get_plan", kind="planner")
     def get_plan(self, query):
         # Get execution plan for the query using the planner module
         try:
@@ -930,7 +959,7 @@ class auto_analyst(dspy.Module):
                 Agent_desc=agent_desc
             )
             
-            logger.log_message(f"Planner module result: {plan_result}", level=logging.INFO)
+            logger.log_message("Planner module result: %s", logging.INFO, plan_result, sample_rate=VERBOSE_LOG_SAMPLE_RATE)
             
             # Extract plan and instructions from the result
             if hasattr(plan_result, 'plan') and hasattr(plan_result, 'plan_instructions'):
@@ -1033,7 +1062,7 @@ class auto_analyst(dspy.Module):
             logger.log_message(f"Error in simple planning: {str(e)}", level=logging.ERROR)
             return {"error": str(e)}
     
-    def execute_plan(self, query, plan):
+    def execute_plan(self, query, plan, session_id=None):
         # Execute the planned sequence of agents with real data
         try:
             # Parse plan and plan_instructions
@@ -1060,8 +1089,15 @@ class auto_analyst(dspy.Module):
             
             results = {}
             
+            # Memory of the session, recalled once for the whole plan
+            dataset_description = "df - DataFrame with uploaded data"
+            memory_context = self._recall_memory(query, session_id)
+            if memory_context:
+                dataset_description += f"\n\nMemory Context: {memory_context}"
+            
             # Execute agents in sequence with real implementations
             for agent_name in agent_sequence:
+                agent_start = time.perf_counter()
                 try:
                     logger.log_message(f"Executing agent: {agent_name}", level=logging.INFO)
                     
@@ -1091,7 +1127,7 @@ class auto_analyst(dspy.Module):
                         viz_agent = dspy.Predict(planner_data_viz_agent)
                         result = viz_agent(
                             goal=query,
-                            dataset="df - DataFrame with uploaded data",
+                            dataset=dataset_description,
                             styling_index="Default styling with clear labels and colors",
                             plan_instructions=agent_instructions_str
                         )
@@ -1105,7 +1141,7 @@ class auto_analyst(dspy.Module):
                         # Execute statistical analysis agent
                         stats_agent = dspy.Predict(planner_statistical_analytics_agent)
                         result = stats_agent(
-                            dataset="df - DataFrame with uploaded data",
+                            dataset=dataset_description,
                             goal=query,
                             plan_instructions=agent_instructions_str
                         )
@@ -1119,7 +1155,7 @@ class auto_analyst(dspy.Module):
                         # Execute preprocessing agent
                         prep_agent = dspy.Predict(planner_preprocessing_agent)
                         result = prep_agent(
-                            dataset="df - DataFrame with uploaded data",
+                            dataset=dataset_description,
                             goal=query,
                             plan_instructions=agent_instructions_str
                         )
@@ -1133,7 +1169,7 @@ class auto_analyst(dspy.Module):
                         # Execute machine learning agent
                         ml_agent = dspy.Predict(planner_sk_learn_agent)
                         result = ml_agent(
-                            dataset="df - DataFrame with uploaded data",
+                            dataset=dataset_description,
                             goal=query,
                             plan_instructions=agent_instructions_str
                         )
@@ -1153,21 +1189,28 @@ class auto_analyst(dspy.Module):
                         }
                     
                     logger.log_message(f"Successfully executed agent: {agent_name}", level=logging.INFO)
+                    telemetry.record_span("agent_step", agent_name, time.perf_counter() - agent_start)
                     
                 except Exception as e:
                     logger.log_message(f"Error executing agent {agent_name}: {str(e)}", level=logging.ERROR)
+                    telemetry.record_span("agent_step", agent_name, time.perf_counter() - agent_start, error=str(e))
                     results[agent_name] = {
                         "error": str(e),
                         "type": "error"
                     }
             
+            summaries = [result.get("summary", "") for result in results.values() if result.get("summary")]
+            if summaries:
+                self._remember(query, "\n".join(summaries), session_id)
+            
             return results
             
         except Exception as e:
             logger.log_message(f"Error executing plan: {str(e)}", level=logging.ERROR)
             return {"error": str(e)}
     
-    def execute_workflow(self, user_query: str, available_data: str = "") -> Dict[str, Any]:
+    def execute_workflow(self, user_query: str, available_data: str = "",
+                         session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Execute the appropriate workflow based on routing decision
         """
@@ -1176,7 +1219,7 @@ class auto_analyst(dspy.Module):
             
             # First route the query to determine the approach
             routing_decision = self.route_query(user_query, available_data)
-            logger.log_message(f"Routing decision: {routing_decision}", level=logging.INFO)
+            logger.log_message("Routing decision: %s", logging.INFO, routing_decision)
             
             if routing_decision.get("routing_decision") == "multi_agent":
                 # Execute multi-agent workflow
@@ -1184,7 +1227,7 @@ class auto_analyst(dspy.Module):
                 
                 # Get plan for the query
                 plan = self.get_plan(user_query)
-                logger.log_message(f"Generated plan: {plan}", level=logging.INFO)
+                logger.log_message("Generated plan: %s", logging.INFO, plan, sample_rate=VERBOSE_LOG_SAMPLE_RATE)
                 
                 if isinstance(plan, dict) and "error" in plan:
                     logger.log_message(f"Plan generation error: {plan['error']}", level=logging.ERROR)
@@ -1222,8 +1265,8 @@ class auto_analyst(dspy.Module):
                 
                 # Execute the plan
                 logger.log_message("Executing plan with agents...", level=logging.INFO)
-                results = self.execute_plan(user_query, plan)
-                logger.log_message(f"Plan execution results: {results}", level=logging.INFO)
+                results = self.execute_plan(user_query, plan, session_id=session_id)
+                logger.log_message("Plan execution results: %s", logging.INFO, results, sample_rate=VERBOSE_LOG_SAMPLE_RATE)
                 
                 if isinstance(results, dict) and "error" in results:
                     logger.log_message(f"Plan execution error: {results['error']}", level=logging.ERROR)
@@ -1238,7 +1281,7 @@ class auto_analyst(dspy.Module):
                 response_parts.append(f"\n## 🔍 Resultados de la Ejecución\n")
                 
                 for agent_name, result in results.items():
-                    logger.log_message(f"Processing result for agent {agent_name}: {result}", level=logging.INFO)
+                    logger.log_message("Processing result for agent %s: %s", logging.INFO, agent_name, result, sample_rate=VERBOSE_LOG_SAMPLE_RATE)
                     agent_title = agent_name.replace('_', ' ').replace('planner ', '').title()
                     
                     if isinstance(result, dict):
@@ -1290,6 +1333,7 @@ class auto_analyst(dspy.Module):
                 "message": f"Workflow execution error: {str(e)}"
             }
     
+    @telemetry.traced("auto_analyst.route_query", kind="router")
     def route_query(self, query: str, file_context: str = "") -> Dict[str, Any]:
         """
         Route query to determine if it should use multi-agent system or direct AI
@@ -1339,7 +1383,7 @@ class auto_analyst(dspy.Module):
                 "error": str(e)
             }
     
-    def forward(self, query):
+    def forward(self, query, session_id=None):
         # Main forward method
         try:
             # Get plan for the query
@@ -1349,7 +1393,7 @@ class auto_analyst(dspy.Module):
                 return plan
             
             # Execute the plan
-            results = self.execute_plan(query, plan)
+            results = self.execute_plan(query, plan, session_id=session_id)
             
             return {
                 "plan": plan,
@@ -1,34 +1,127 @@
+import os
 import dspy
-from typing import Dict, Any, List
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, Dict, Any, List, Optional
 import logging
+import numpy as np
 from backend.utils.logger import Logger
+from backend.utils.telemetry import telemetry
+from backend.retrievers.embedding_utils import embed_text, batch_embed_texts
+from backend.retrievers.vector_index import to_unit_vector
 
 logger = Logger("memory_agents", see_time=True, console_log=False)
 
+# Embedding model used for semantic recall of session memory
+MEMORY_EMBEDDING_MODEL = os.getenv("MEMORY_EMBEDDING_MODEL", "openai")
+
+class SessionMemoryStore:
+    """
+    Interaction memory partitioned by session.
+
+    Each session has a bounded ring buffer (`deque(maxlen=...)`), so adding an
+    interaction is O(1) and sessions never see each other's history. Embeddings
+    are computed lazily, in one batch, when context is recalled; recall returns
+    the `top_k` interactions most similar to the query.
+    """
+
+    def __init__(self, max_items_per_session: int = 50, max_sessions: int = 1000,
+                 embedding_model: str = MEMORY_EMBEDDING_MODEL):
+        self.max_items_per_session = max_items_per_session
+        self.max_sessions = max_sessions
+        self.embedding_model = embedding_model
+        self._sessions: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, session_id: str, entry: Dict[str, Any]):
+        """Add an interaction to the session buffer (the oldest one is dropped when full)."""
+        with self._lock:
+            buffer = self._sessions.get(session_id)
+            if buffer is None:
+                buffer = self._sessions[session_id] = deque(maxlen=self.max_items_per_session)
+                # Least recently active sessions are evicted first
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            buffer.append(entry)
+
+    def entries(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._sessions.get(session_id, ()))
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def recall(self, session_id: str, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Return the `top_k` interactions of the session most relevant to the query, in
+        chronological order. Falls back to the most recent ones if embedding fails.
+        """
+        entries = self.entries(session_id)
+        if len(entries) <= top_k:
+            return entries
+
+        try:
+            # Only new entries are embedded; older ones keep their vector
+            missing = [entry for entry in entries if entry.get("_vector") is None]
+            if missing:
+                texts = [f"{entry['query']}\n{entry['response']}" for entry in missing]
+                for entry, embedding in zip(missing, batch_embed_texts(texts, model=self.embedding_model)):
+                    entry["_vector"] = to_unit_vector(embedding)
+
+            dim = entries[-1]["_vector"].shape[0]
+            query_vector = to_unit_vector(embed_text(query, model=self.embedding_model), dim)
+            matrix = np.stack([to_unit_vector(entry["_vector"], dim) for entry in entries])
+            scores = matrix @ query_vector
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            return [entries[i] for i in sorted(best)]
+        except Exception as e:
+            logger.log_message(f"Semantic memory recall failed, using recent interactions: {str(e)}",
+                               level=logging.WARNING)
+            return entries[-top_k:]
+
+
 class memory_agent(dspy.Module):
     """
     Memory agent that maintains conversation context and history.
     Helps other agents understand previous interactions and maintain continuity.
+    Memory is kept per session and recalled by semantic similarity to the query.
     """
     
-    def __init__(self):
+    def __init__(self, max_memory_items: int = 50, recall_k: int = 3, store: Optional[SessionMemoryStore] = None):
         super().__init__()
-        self.memory_store = {}
-        self.max_memory_items = 10  # Keep last 10 interactions
+        self.max_memory_items = max_memory_items  # Interactions kept per session
+        self.recall_k = recall_k
+        self.memory_store = store or SessionMemoryStore(max_items_per_session=max_memory_items)
+    
+    @staticmethod
+    def _resolve_session(session_id: Optional[str]) -> str:
+        """Explicit session, else the session of the request being traced, else a shared default."""
+        if session_id:
+            return session_id
+        trace = telemetry.current_trace()
+        if trace is not None and trace.session_id:
+            return trace.session_id
+        return "default"
         
-    def forward(self, query: str) -> Dict[str, Any]:
+    def forward(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Retrieve relevant memory context for the current query.
         
         Args:
             query: Current user query
+            session_id: Session whose memory is searched
             
         Returns:
             Dictionary containing relevant memory context
         """
         try:
-            # Simple memory retrieval - in practice this could be more sophisticated
-            memory_context = self._get_relevant_context(query)
+            memory_context = self._get_relevant_context(query, self._resolve_session(session_id))
             
             return {
                 "memory_context": memory_context,
@@ -42,13 +135,14 @@ class memory_agent(dspy.Module):
                 "error": str(e)
             }
     
-    def update_memory(self, query: str, response: str):
+    def update_memory(self, query: str, response: str, session_id: Optional[str] = None):
         """
         Update memory with new interaction.
         
         Args:
             query: User query
             response: Agent response
+            session_id: Session the interaction belongs to
         """
         try:
             # Create memory entry
@@ -58,37 +152,29 @@ class memory_agent(dspy.Module):
                 "timestamp": self._get_timestamp()
             }
             
-            # Add to memory store
-            if "interactions" not in self.memory_store:
-                self.memory_store["interactions"] = []
-            
-            self.memory_store["interactions"].append(memory_entry)
-            
-            # Keep only recent interactions
-            if len(self.memory_store["interactions"]) > self.max_memory_items:
-                self.memory_store["interactions"] = self.memory_store["interactions"][-self.max_memory_items:]
+            # O(1): the session's ring buffer drops the oldest entry when full
+            self.memory_store.add(self._resolve_session(session_id), memory_entry)
                 
         except Exception as e:
             logger.log_message(f"Error updating memory: {str(e)}", level=logging.ERROR)
     
-    def _get_relevant_context(self, query: str) -> str:
+    def _get_relevant_context(self, query: str, session_id: str) -> str:
         """
         Get relevant context from memory based on current query.
         
         Args:
             query: Current query
+            session_id: Session whose memory is searched
             
         Returns:
             Relevant context string
         """
-        if "interactions" not in self.memory_store or not self.memory_store["interactions"]:
+        relevant_interactions = self.memory_store.recall(session_id, query, top_k=self.recall_k)
+        if not relevant_interactions:
             return "No previous context available."
         
-        # Simple approach - return last few interactions
-        recent_interactions = self.memory_store["interactions"][-3:]
-        
         context_parts = []
-        for interaction in recent_interactions:
+        for interaction in relevant_interactions:
             context_parts.append(f"Previous: {interaction['query']} -> {interaction['response'][:100]}...")
         
         return "\n".join(context_parts)
@@ -102,11 +188,30 @@ class memory_summarize_agent(dspy.Module):
     """
     Agent that summarizes conversation history and memory.
     Helps compress long conversations into key insights.
+
+    Besides one-off summaries, it keeps a rolling summary per session: each
+    update only sends the turns added since the last checkpoint together with
+    the previous summary, and `schedule_update` runs it on a background worker
+    so it never adds latency to the turn that triggered it.
     """
     
-    def __init__(self):
+    # Tail of the consumed history kept to check that a new history extends it
+    _ANCHOR_CHARS = 64
+
+    def __init__(self, max_sessions: int = 1000, max_workers: int = 2):
         super().__init__()
         self.summarizer = dspy.ChainOfThought(self._create_summary_signature())
+        self.incremental_summarizer = dspy.ChainOfThought(self._create_incremental_signature())
+        self.max_sessions = max_sessions
+        self.max_workers = max_workers
+        # session_id -> {"summary", "checkpoint", "anchor", "updated_at"}, least recently updated first
+        self._states: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._session_locks: Dict[str, threading.Lock] = {}
+        # Latest (history, callback, lm) waiting per session; older requests are overwritten (coalesced)
+        self._pending: Dict[str, tuple] = {}
+        self._running: set = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
     
     def _create_summary_signature(self):
         """Create the signature for memory summarization."""
@@ -117,13 +222,27 @@ class memory_summarize_agent(dspy.Module):
             summary = dspy.OutputField(desc="Concise summary of key insights and context")
         
         return MemorySummarySignature
+
+    def _create_incremental_signature(self):
+        """Create the signature for updating a rolling summary with new turns."""
+
+        class IncrementalSummarySignature(dspy.Signature):
+            """Update an existing conversation summary with the turns that happened after it was written."""
+            previous_summary = dspy.InputField(desc="Summary of the conversation so far")
+            new_turns = dspy.InputField(desc="Conversation turns added since the previous summary")
+            summary = dspy.OutputField(desc="Concise updated summary of key insights and context")
+
+        return IncrementalSummarySignature
     
-    def forward(self, conversation_history: str) -> Dict[str, Any]:
+    def forward(self, conversation_history: str, session_id: Optional[str] = None, lm=None) -> Dict[str, Any]:
         """
         Summarize conversation history.
         
         Args:
             conversation_history: Full conversation history
+            session_id: When given, update and return the session's rolling summary,
+                summarizing only the turns added since its last checkpoint
+            lm: Optional DSPy LM to use instead of the globally configured one
             
         Returns:
             Dictionary containing summary
@@ -134,9 +253,16 @@ class memory_summarize_agent(dspy.Module):
                     "summary": "No conversation history to summarize.",
                     "status": "success"
                 }
+
+            if session_id is not None:
+                return {
+                    "summary": self._update_session(session_id, conversation_history, lm),
+                    "status": "success"
+                }
             
             # Generate summary
-            result = self.summarizer(conversation_history=conversation_history)
+            with self._lm_context(lm):
+                result = self.summarizer(conversation_history=conversation_history)
             
             return {
                 "summary": result.summary,
@@ -149,4 +275,111 @@ class memory_summarize_agent(dspy.Module):
                 "summary": "Error generating summary.",
                 "status": "error",
                 "error": str(e)
-            } 
\ No newline at end of file
+            }
+
+    def schedule_update(self, session_id: str, conversation_history: str,
+                        callback: Optional[Callable[[str], None]] = None, lm=None):
+        """
+        Update the session's rolling summary in the background and return immediately.
+
+        While an update for the session is running, further requests are coalesced:
+        only the latest history is summarized next, and only its callback is called.
+
+        Args:
+            session_id: Session whose summary is updated
+            conversation_history: Full conversation history of the session
+            callback: Called with the new summary once the update succeeds
+            lm: DSPy LM for the update. The worker threads don't see an LM configured
+                with `dspy.settings.configure` elsewhere, so callers should pass one.
+        """
+        with self._lock:
+            self._pending[session_id] = (conversation_history, callback, lm)
+            if session_id in self._running:
+                return
+            self._running.add(session_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="memory-summarizer")
+        self._executor.submit(self._drain, session_id)
+
+    def get_summary(self, session_id: str) -> str:
+        """Current rolling summary of the session (empty if none yet). Never calls the LLM."""
+        with self._lock:
+            state = self._states.get(session_id)
+            return state["summary"] if state else ""
+
+    def clear(self, session_id: str):
+        """Forget the session's rolling summary."""
+        with self._lock:
+            self._states.pop(session_id, None)
+            self._pending.pop(session_id, None)
+
+    def _drain(self, session_id: str):
+        while True:
+            with self._lock:
+                item = self._pending.pop(session_id, None)
+                if item is None:
+                    self._running.discard(session_id)
+                    return
+            conversation_history, callback, lm = item
+            try:
+                summary = self._update_session(session_id, conversation_history, lm)
+                if callback is not None and summary:
+                    callback(summary)
+            except Exception as e:
+                logger.log_message(f"Error updating rolling summary for session {session_id}: {str(e)}",
+                                   level=logging.ERROR)
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            lock = self._session_locks.get(session_id)
+            if lock is None:
+                lock = self._session_locks[session_id] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _lm_context(lm):
+        """Use `lm` for the calls made inside the block (only in the current thread)."""
+        return dspy.context(lm=lm) if lm is not None else nullcontext()
+
+    def _update_session(self, session_id: str, conversation_history: str, lm=None) -> str:
+        """Fold the turns added since the last checkpoint into the session summary and return it."""
+        with self._session_lock(session_id):
+            with self._lock:
+                state = self._states.get(session_id)
+
+            previous_summary, delta = "", conversation_history
+            if state is not None:
+                checkpoint, anchor = state["checkpoint"], state["anchor"]
+                if len(conversation_history) >= checkpoint and \
+                        conversation_history[checkpoint - len(anchor):checkpoint] == anchor:
+                    previous_summary, delta = state["summary"], conversation_history[checkpoint:]
+                else:
+                    # The history was replaced or reset: start the summary over
+                    logger.log_message(f"History of session {session_id} no longer extends the summarized "
+                                       f"prefix, re-summarizing", level=logging.INFO)
+
+            if not delta.strip():
+                return previous_summary
+
+            with self._lm_context(lm), telemetry.span("memory_summarize_agent", kind="agent_step"):
+                if previous_summary:
+                    summary = self.incremental_summarizer(previous_summary=previous_summary,
+                                                          new_turns=delta).summary
+                else:
+                    summary = self.summarizer(conversation_history=delta).summary
+
+            checkpoint = len(conversation_history)
+            with self._lock:
+                self._states[session_id] = {
+                    "summary": summary,
+                    "checkpoint": checkpoint,
+                    "anchor": conversation_history[max(0, checkpoint - self._ANCHOR_CHARS):checkpoint],
+                    "updated_at": time.time(),
+                }
+                self._states.move_to_end(session_id)
+                while len(self._states) > self.max_sessions:
+                    evicted, _ = self._states.popitem(last=False)
+                    if evicted not in self._running:
+                        self._session_locks.pop(evicted, None)
+            return summary
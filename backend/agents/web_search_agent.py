@@ -4,29 +4,51 @@ Uses Brave Search API to find current information and research topics
 """
 
 import os
-import requests
 import json
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from backend.utils.logger import Logger
+from backend.utils.search_client import BRAVE_SEARCH_URL, get_brave_search_client
+from backend.utils.search_providers import BraveProvider, create_web_search
+from backend.utils.page_fetcher import build_page_context, get_page_fetcher
 
 logger = Logger("web_search_agent", see_time=True, console_log=False)
 
 
 class BraveSearchAPI:
     """
-    Brave Search API client for web searches
+    Brave Search API client for web searches.
+
+    Requests go through the shared async search client, so connections are
+    pooled, results are cached for a while and identical concurrent queries
+    share one upstream call.
     """
     
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or os.getenv('BRAVE_SEARCH_API_KEY')
-        self.base_url = "https://api.search.brave.com/res/v1/web/search"
-        self.headers = {
-            "Accept": "application/json",
-            "Accept-Encoding": "gzip",
-            "X-Subscription-Token": self.api_key
-        } if self.api_key else None
+        self.base_url = BRAVE_SEARCH_URL
+        self.client = get_brave_search_client(self.api_key) if self.api_key else None
+        self.provider = BraveProvider(api_key=self.api_key)
+    
+    def _build_params(self, count: int, country: str, search_lang: str, ui_lang: str) -> Dict[str, Any]:
+        return {
+            "count": min(count, 20),  # Brave API max is 20
+            **self.search_params(country, search_lang, ui_lang)
+        }
+    
+    @staticmethod
+    def search_params(country: str = "US", search_lang: str = "en", ui_lang: str = "en-US") -> Dict[str, Any]:
+        """Brave request parameters other than the query and count (locale, safety, recency)"""
+        return {
+            "country": country,
+            "search_lang": search_lang,
+            "ui_lang": ui_lang,
+            "safesearch": "moderate",
+            "freshness": "pd",  # Past day for fresh results
+            "text_decorations": False,
+            "spellcheck": True
+        }
     
     def search(self, query: str, count: int = 10, country: str = "US", 
                search_lang: str = "en", ui_lang: str = "en-US") -> Dict[str, Any]:
@@ -48,32 +70,27 @@ class BraveSearchAPI:
             return self._fallback_search(query)
         
         try:
-            params = {
-                "q": query,
-                "count": min(count, 20),  # Brave API max is 20
-                "country": country,
-                "search_lang": search_lang,
-                "ui_lang": ui_lang,
-                "safesearch": "moderate",
-                "freshness": "pd",  # Past day for fresh results
-                "text_decorations": False,
-                "spellcheck": True
-            }
-            
-            response = requests.get(
-                self.base_url,
-                headers=self.headers,
-                params=params,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.log_message(f"Brave Search successful for query: {query}", level=logging.INFO)
-                return self._format_brave_results(data)
-            else:
-                logger.log_message(f"Brave Search API error: {response.status_code}", level=logging.ERROR)
-                return self._fallback_search(query)
+            data = self.client.search_sync(query, self._build_params(count, country, search_lang, ui_lang))
+            logger.log_message(f"Brave Search successful for query: {query}", level=logging.INFO)
+            return self._format_brave_results(data)
+                
+        except Exception as e:
+            logger.log_message(f"Error in Brave Search: {str(e)}", level=logging.ERROR)
+            return self._fallback_search(query)
+    
+    async def asearch(self, query: str, count: int = 10, country: str = "US",
+                      search_lang: str = "en", ui_lang: str = "en-US") -> Dict[str, Any]:
+        """
+        Async version of `search`, for callers running in an event loop.
+        """
+        if not self.api_key:
+            logger.log_message("Brave Search API key not found", level=logging.WARNING)
+            return self._fallback_search(query)
+        
+        try:
+            data = await self.client.search(query, self._build_params(count, country, search_lang, ui_lang))
+            logger.log_message(f"Brave Search successful for query: {query}", level=logging.INFO)
+            return self._format_brave_results(data)
                 
         except Exception as e:
             logger.log_message(f"Error in Brave Search: {str(e)}", level=logging.ERROR)
@@ -83,31 +100,7 @@ class BraveSearchAPI:
         """
         Format Brave Search API results into a standardized format
         """
-        results = []
-        
-        # Process web results
-        web_results = data.get("web", {}).get("results", [])
-        for result in web_results:
-            formatted_result = {
-                "title": result.get("title", ""),
-                "url": result.get("url", ""),
-                "description": result.get("description", ""),
-                "published": result.get("age", ""),
-                "source": "Brave Search"
-            }
-            results.append(formatted_result)
-        
-        # Process news results if available
-        news_results = data.get("news", {}).get("results", [])
-        for result in news_results:
-            formatted_result = {
-                "title": result.get("title", ""),
-                "url": result.get("url", ""),
-                "description": result.get("description", ""),
-                "published": result.get("age", ""),
-                "source": "News"
-            }
-            results.append(formatted_result)
+        results = self.provider.format_results(data)
         
         return {
             "query": data.get("query", {}).get("original", ""),
@@ -158,9 +151,13 @@ class WebSearchAgent:
     
     def __init__(self):
         self.brave_api = BraveSearchAPI()
+        # Fan-out over every configured provider (Brave, Serper...); Brave keeps the
+        # locale, safesearch and recency parameters this agent has always sent
+        self.web_search = create_web_search(provider_params={"brave": BraveSearchAPI.search_params()})
         logger.log_message("Web Search Agent initialized", level=logging.INFO)
     
-    def search(self, query: str, context: str = "", max_results: int = 10) -> Dict[str, Any]:
+    def search(self, query: str, context: str = "", max_results: int = 10,
+               fetch_pages: int = 0) -> Dict[str, Any]:
         """
         Perform an intelligent web search
         
@@ -168,6 +165,8 @@ class WebSearchAgent:
             query: Search query
             context: Additional context about the search
             max_results: Maximum number of results to return
+            fetch_pages: Number of top result pages to download and extract; their
+                most relevant passages are added as `page_context`
             
         Returns:
             Formatted search results with insights
@@ -176,8 +175,14 @@ class WebSearchAgent:
             # Enhance query based on context
             enhanced_query = self._enhance_query(query, context)
             
-            # Perform search
-            search_results = self.brave_api.search(enhanced_query, count=max_results)
+            # Perform search (without any configured provider, BraveSearchAPI returns its fallback)
+            if self.web_search.providers:
+                search_results = self.web_search.search_sync(enhanced_query, count=max_results)
+            else:
+                search_results = self.brave_api.search(enhanced_query, count=max_results)
+            
+            if fetch_pages > 0 and search_results.get("api_used") != "Fallback":
+                search_results["page_context"] = self._fetch_page_context(query, search_results, fetch_pages)
             
             # Add insights and summary
             search_results["insights"] = self._generate_insights(search_results)
@@ -195,6 +200,21 @@ class WebSearchAgent:
                 "search_time": datetime.utcnow().isoformat()
             }
     
+    def _fetch_page_context(self, query: str, search_results: Dict[str, Any], max_pages: int) -> List[Dict[str, Any]]:
+        """
+        Download the top result pages concurrently (cached on disk) and keep the
+        passages most relevant to the query
+        """
+        urls = [result["url"] for result in search_results.get("results", []) if result.get("url")][:max_pages]
+        if not urls:
+            return []
+        try:
+            pages = get_page_fetcher().fetch_many_sync(urls)
+            return build_page_context(query, pages)
+        except Exception as e:
+            logger.log_message(f"Error fetching result pages: {str(e)}", level=logging.ERROR)
+            return []
+    
     def _enhance_query(self, query: str, context: str) -> str:
         """
         Enhance search query based on context
@@ -244,6 +264,11 @@ class WebSearchAgent:
         if educational_count > 0:
             insights.append(f"{educational_count} results contain educational content")
         
+        page_context = search_results.get("page_context") or []
+        if page_context:
+            pages = {passage["url"] for passage in page_context}
+            insights.append(f"Extracted {len(page_context)} relevant passages from {len(pages)} result pages")
+        
         return insights
     
     def _generate_summary(self, search_results: Dict[str, Any]) -> str:
@@ -255,11 +280,11 @@ class WebSearchAgent:
         if not results:
             return "No relevant search results found."
         
-        # Extract key themes from titles and descriptions
+        # Extract key themes from titles and descriptions (and page passages, when fetched)
         all_text = " ".join([
             result.get("title", "") + " " + result.get("description", "")
             for result in results[:5]  # Use top 5 results
-        ]).lower()
+        ] + [passage["excerpt"] for passage in search_results.get("page_context") or []]).lower()
         
         # Common data science terms
         key_terms = {
@@ -5,16 +5,31 @@ import pandas as pd
 import io
 import os
 import uuid
+import logging
 import traceback
 from pathlib import Path
 
 # Importamos nuestro session_manager global
 from backend.managers.global_managers import session_manager
+from backend.managers.context_builder import build_dataset_schema
+from backend.agents.dspy_system import get_multi_agent_system
 # Importamos la ruta absoluta correcta desde el nuevo archivo de configuración
 from backend.config import UPLOADS_DIR
 
 router = APIRouter(tags=["analytics"])
 
+
+def _clear_conversation_summary(session_id: str):
+    """
+    Olvida el resumen acumulado de la conversación: sin esto el resumidor seguiría
+    añadiendo turnos nuevos al resumen de la conversación (y del dataset) anterior.
+    """
+    try:
+        get_multi_agent_system().memory_summarize_agent.clear(session_id)
+    except Exception as e:
+        logging.warning(f"No se pudo limpiar el resumen de la sesión {session_id}: {e}")
+
+
 @router.post("/analytics/upload-dataset")
 async def upload_dataset(session_id: str = Form(...), file: UploadFile = File(...)):
     """
@@ -58,10 +73,13 @@ async def upload_dataset(session_id: str = Form(...), file: UploadFile = File(..
         session_context = {
             "file_path": str(file_path),          # Usamos la variable correcta 'file_path'
             "dataset_context": dataset_context,
-            "conversation_history": ""            # Reiniciamos el historial de conversación
+            "dataset_schema": build_dataset_schema(df, file.filename),  # Esquema compacto para el ContextBuilder
+            "conversation_history": "",           # Reiniciamos el historial de conversación
+            "conversation_summary": ""            # ...y su resumen acumulado
         }
         # Hacemos UNA SOLA llamada para actualizar el contexto, asegurando la limpieza.
         session_manager.update_context(session_id, session_context)
+        _clear_conversation_summary(session_id)
         # --- FIN DE LA CORRECCIÓN ---
         
         return {
@@ -122,9 +140,11 @@ async def upload_dataset(session_id: str = Form(...), file: UploadFile = File(..
         session_context = {
             "file_path": absolute_file_path,
             "dataset_context": dataset_context,
-            "conversation_history": ""  # <-- ¡Esta es la clave! Reiniciamos el historial.
+            "conversation_history": "",  # <-- ¡Esta es la clave! Reiniciamos el historial.
+            "conversation_summary": ""   # ...y su resumen acumulado
         }
         session_manager.update_context(session_id, session_context)
+        _clear_conversation_summary(session_id)
 
         # Guardamos la RUTA ABSOLUTA (como string) y el RESUMEN en la sesión
         session = session_manager.get_or_create_session(session_id)
@@ -2,55 +2,131 @@
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import Any, Callable, Dict, List, Optional
+import re
+import asyncio
+import logging
+import weakref
+import functools
 import traceback
 
 from backend.managers.global_managers import session_manager, ai_manager
+from backend.agents.dspy_system import get_multi_agent_system
 
 router = APIRouter(tags=["chat"])
 
+# Locks por sesión para serializar los turnos de una misma conversación. Referencias débiles:
+# el lock desaparece cuando ningún turno de la sesión lo usa ni lo espera.
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+_SENTENCE_PATTERN = re.compile(r"[^.!?\n]*(?:[.!?]+|\n+|$)\s*")
+
 class ChatRequest(BaseModel):
     session_id: str
     message: str
 
-@router.post("/chat")
-async def handle_chat_message(request: ChatRequest):
+
+def _schedule_summary_update(session_id: str, conversation_history: str, model: str):
+    """
+    Actualiza en segundo plano el resumen acumulado de la sesión (solo con los turnos
+    nuevos) y lo guarda como 'conversation_summary'. No añade latencia a la respuesta.
+    Solo se programa cuando el historial ya no cabe entero en el contexto del crew: antes
+    el resumen no se usa y sería una llamada al LLM de más en cada turno.
+    """
+    if not ai_manager.context_builder.omits_turns(conversation_history):
+        return
     try:
-        session = session_manager.get_or_create_session(request.session_id)
+        summarizer = get_multi_agent_system().memory_summarize_agent
+        summarizer.schedule_update(
+            session_id,
+            conversation_history,
+            callback=lambda summary: session_manager.update_context(session_id, {"conversation_summary": summary}),
+            # El hilo del resumidor no tiene un LM de DSPy configurado: se le pasa el de la sesión
+            lm=ai_manager.get_dspy_lm(model),
+        )
+    except Exception as e:
+        logging.warning(f"No se pudo programar el resumen de la sesión {session_id}: {e}")
+
+
+def _response_chunks(text: str, max_chars: int = 400) -> List[str]:
+    """Parte la respuesta en fragmentos (por párrafos y frases) para enviarla de forma progresiva."""
+    chunks: List[str] = []
+    current = ""
+    # Cada pieza es una frase o línea con su espacio final: concatenadas reproducen el texto exacto
+    for piece in _SENTENCE_PATTERN.findall(text):
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def process_chat_message(session_id: str, message: str,
+                               on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+    """
+    Ejecuta un turno de chat dentro del proceso (lo usan la ruta /chat y el asistente de voz):
+    lanza el crew en un hilo del executor para no bloquear el bucle de eventos, actualiza el
+    historial de la sesión y, si se pasa `on_event`, emite la respuesta en fragmentos
+    ('agent_response_chunk') seguidos de la respuesta completa ('agent_response').
+    """
+    # Un turno a la vez por sesión: el historial se lee y se reescribe entero
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    async with lock:
+        session = session_manager.get_or_create_session(session_id)
         
         # Recuperamos TODOS los datos necesarios de la sesión
         file_path = session.get("file_path")
         dataset_context = session.get("dataset_context", "")
+        dataset_schema = session.get("dataset_schema")
         conversation_history = session.get("conversation_history", "")
+        conversation_summary = session.get("conversation_summary")
 
-        # --- INICIO DE LA CORRECCIÓN ---
-
-        # 1. OBTÉN EL MODELO DE LA SESIÓN
-        #    Esta línea lee el modelo que el usuario guardó con el ModelSelector.
-        #    Si no ha guardado ninguno, usa 'openai/gpt-4o-mini' como default.
+        # Modelo guardado por el usuario con el ModelSelector ('openai/gpt-4o-mini' por defecto)
         current_model = session.get('current_model', 'openai/gpt-4o-mini')
 
-        # Ejecutamos el crew, ahora sí, pasándole TODOS los parámetros requeridos.
-        result = ai_manager.run_crew(
-            user_input=request.message,
+        if on_event is not None:
+            on_event({"type": "status", "status": "thinking"})
+
+        result = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+            ai_manager.run_crew,
+            user_input=message,
             file_path=file_path,
             dataset_context=dataset_context,
+            dataset_schema=dataset_schema,
             conversation_history=conversation_history,
-            model=current_model  # <-- 2. PASA EL MODELO AL AIManager
-        )
+            conversation_summary=conversation_summary,
+            model=current_model,
+            session_id=session_id
+        ))
 
-        # --- FIN DE LA CORRECCIÓN ---
-
-        # Actualizamos el historial de la conversación (tu lógica aquí es perfecta)
-        new_history_entry = f"User: {request.message}\nAssistant: {result}\n"
+        # Actualizamos el historial de la conversación
+        new_history_entry = f"User: {message}\nAssistant: {result}\n"
         updated_history = conversation_history + new_history_entry
         
-        session_manager.update_context(request.session_id, {
+        session_manager.update_context(session_id, {
             "conversation_history": updated_history
         })
+        _schedule_summary_update(session_id, updated_history, current_model)
+
+    if on_event is not None:
+        for index, chunk in enumerate(_response_chunks(result)):
+            on_event({"type": "agent_response_chunk", "index": index, "text": chunk})
+        on_event({"type": "agent_response", "response": result})
+    return result
+
+
+@router.post("/chat")
+async def handle_chat_message(request: ChatRequest):
+    try:
+        result = await process_chat_message(request.session_id, request.message)
 
         # Devolvemos la respuesta
         return {"response": result}
 
     except Exception as e:
         print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Error al procesar el mensaje: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error al procesar el mensaje: {str(e)}")
@@ -0,0 +1,27 @@
+# /backend/api/metrics_routes.py
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.utils.telemetry import telemetry
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Agregados de latencia y tokens en formato de texto de Prometheus.
+    """
+    return PlainTextResponse(telemetry.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get("/metrics/sessions/{session_id}/traces")
+async def get_session_traces(session_id: str):
+    """
+    Trazas recientes de una sesión (spans de router, planner, agentes, herramientas y LLM).
+    """
+    return {
+        "summary": telemetry.get_session_summary(session_id),
+        "traces": telemetry.get_session_traces(session_id),
+    }
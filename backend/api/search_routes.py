@@ -1,8 +1,9 @@
-import requests
 from fastapi import APIRouter, Query, HTTPException
 from typing import Optional, List
 from pydantic import BaseModel
-import os # <-- 1. Importamos 'os' para leer variables de entorno
+
+from backend.utils.search_client import SearchAPIError
+from backend.utils.search_providers import get_web_search
 
 router = APIRouter(prefix="/api", tags=["search"])
 
@@ -21,52 +22,31 @@ async def web_search(
     count: Optional[int] = Query(10, description="Number of results to return")
 ):
     """
-    Perform a web search using the Brave Search API.
+    Perform a web search with the configured providers (Brave Search, Serper).
     """
-    # 2. Leemos la clave de API directamente de las variables de entorno
-    brave_api_key = os.getenv("BRAVE_SEARCH_API_KEY")
+    # Capa unificada de búsqueda: proveedores configurados (Brave, Serper) en paralelo
+    web_search = get_web_search()
 
-    if not brave_api_key:
-        raise HTTPException(status_code=500, detail="Brave Search API key is not configured")
+    if not web_search.providers:
+        raise HTTPException(status_code=500, detail="No web search provider is configured")
         
     if not q:
         raise HTTPException(status_code=400, detail="Search query is required")
-        
-    url = "https://api.search.brave.com/res/v1/web/search"
-    
-    headers = {
-        "Accept": "application/json",
-        "Accept-Encoding": "gzip",
-        # 3. Usamos la variable que acabamos de leer
-        "X-Subscription-Token": brave_api_key
-    }
-    
-    params = {
-        "q": q,
-        "count": count
-    }
-    
+
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        search_results = response.json()
+        search_results = await web_search.search(q, count=count)
         
-        formatted_results = {
+        return {
             "query": q,
-            "results": []
+            "results": [
+                {
+                    "title": result["title"],
+                    "url": result["url"],
+                    "description": result["description"]
+                }
+                for result in search_results["results"]
+            ]
         }
         
-        if "web" in search_results and "results" in search_results["web"]:
-            for result in search_results["web"]["results"]:
-                formatted_results["results"].append({
-                    "title": result.get("title", ""),
-                    "url": result.get("url", ""),
-                    "description": result.get("description", "")
-                })
-                
-        return formatted_results
-        
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error making request to Brave Search API: {str(e)}")
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=f"Error parsing response from Brave Search API: {str(e)}")
\ No newline at end of file
+    except SearchAPIError as e:
+        raise HTTPException(status_code=500, detail=f"Error making request to the search API: {str(e)}")
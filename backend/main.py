@@ -6,9 +6,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
 import os
-from backend.utils.logger import Logger
+from backend.utils.logger import Logger, shutdown_logging
+from backend.utils.search_client import close_search_clients
+from backend.utils.page_fetcher import close_page_fetcher
 from backend.managers.global_managers import ai_manager
-from backend.api import chat_routes, analytics_routes, model_routes
+from backend.api import chat_routes, analytics_routes, model_routes, metrics_routes
 from fastapi.routing import APIRoute
 
 logger = Logger("main", see_time=True, console_log=True)
@@ -30,6 +32,10 @@ async def lifespan(app: FastAPI):
         logger.log_message(f"FATAL: Failed to configure AI Manager with proxy: {e}", level=logging.CRITICAL)
     yield
     logger.log_message("Shutting down DSAgency Auto-Analyst Backend", level=logging.INFO)
+    close_page_fetcher()
+    close_search_clients()
+    # Vacía la cola de logs pendiente antes de salir
+    shutdown_logging()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -45,6 +51,7 @@ app.add_middleware(
 app.include_router(chat_routes.router, prefix="/api")
 app.include_router(analytics_routes.router, prefix="/api")
 app.include_router(model_routes.router, prefix="/api")
+app.include_router(metrics_routes.router, prefix="/api")
 
 # --- Montar archivos estáticos al final ---
 static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
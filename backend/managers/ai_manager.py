@@ -1,18 +1,44 @@
 # /backend/managers/ai_manager.py (VERSIÓN CORREGIDA Y DINÁMICA)
 
 from langchain_openai import ChatOpenAI
-from typing import Optional
+from typing import Optional, Dict, Any
 import logging
+import os
+import dspy
 
 from backend.agents.agents import ProjectAgents
+from backend.managers.fast_path import FastPathResponder
+from backend.managers.specialist_router import SpecialistRouter
+from backend.managers.context_builder import ContextBuilder
+from backend.utils.telemetry import telemetry
+from backend.utils.llm_telemetry import install_litellm_telemetry, langchain_callbacks
 from crewai import Crew, Process, Task
 
 logging.basicConfig(level=logging.INFO)
 
+# Modos de despacho del crew:
+#   "director": todo pasa por el director de proyecto, que delega en un especialista.
+#   "auto": un router rápido elige al especialista y arma un crew de un solo agente;
+#           si la confianza es baja se recurre al director. Se activa explícitamente
+#           (CREW_DISPATCH_MODE=auto); por defecto se usa "director".
+DISPATCH_MODES = ("director", "auto")
+
 class AIManager:
-    def __init__(self):
+    def __init__(self, enable_fast_path: bool = True, dispatch_mode: Optional[str] = None):
         # El manager ya no guarda un estado de LLM. Ahora es más simple.
-        logging.info("AIManager initialized (ready for dynamic model requests).")
+        # La vía rápida responde saludos y meta-preguntas sin arrancar el crew.
+        self.fast_path = FastPathResponder() if enable_fast_path else None
+        self.specialist_router = SpecialistRouter()
+        # Compacta esquema e historial para no enviar decenas de miles de tokens por turno.
+        self.context_builder = ContextBuilder()
+        self._dspy_lms: Dict[str, Any] = {}
+        # Cada llamada de CrewAI y DSPy (vía LiteLLM) queda registrada como un span `llm` de la traza
+        install_litellm_telemetry()
+        self.dispatch_mode = dispatch_mode or os.getenv("CREW_DISPATCH_MODE", "director")
+        if self.dispatch_mode not in DISPATCH_MODES:
+            logging.warning(f"Unknown dispatch mode '{self.dispatch_mode}', falling back to 'director'.")
+            self.dispatch_mode = "director"
+        logging.info(f"AIManager initialized (ready for dynamic model requests, dispatch mode: {self.dispatch_mode}).")
 
     def _get_llm_instance(self, model_full_name: str) -> ChatOpenAI:
         """
@@ -25,11 +51,38 @@ class AIManager:
             openai_api_base="http://litellm-proxy:4000",
             # La api_key es manejada por el proxy, por lo que este valor es irrelevante
             openai_api_key="sk-irrelevant",
-            temperature=0.2
+            temperature=0.2,
+            # Las llamadas directas de LangChain (vía rápida) también se registran una a una
+            callbacks=langchain_callbacks(model_full_name)
         )
 
+    def get_dspy_lm(self, model_full_name: str):
+        """
+        LM de DSPy para el modelo indicado, también a través del proxy de LiteLLM. Se pasa
+        explícitamente (`dspy.context(lm=...)`) a los módulos DSPy que corren fuera del crew,
+        como el resumidor de la conversación. Se reutiliza una instancia por modelo.
+        """
+        lm = self._dspy_lms.get(model_full_name)
+        if lm is None:
+            lm = self._dspy_lms[model_full_name] = dspy.LiteLLM(
+                model=model_full_name,
+                api_base="http://litellm-proxy:4000",
+                api_key="sk-irrelevant"
+            )
+        return lm
+
     # La firma del método ahora incluye 'model' para saber cuál LLM crear
-    def run_crew(self, user_input: str, dataset_context: str, conversation_history: str, file_path: Optional[str], model: str) -> str:
+    def run_crew(self, user_input: str, dataset_context: str, conversation_history: str, file_path: Optional[str], model: str,
+                 dispatch_mode: Optional[str] = None, dataset_schema: Optional[Dict[str, Any]] = None,
+                 session_id: Optional[str] = None, conversation_summary: Optional[str] = None) -> str:
+        # Cada petición queda registrada como una traza de la sesión (ver /api/metrics)
+        with telemetry.trace(session_id):
+            return self._run_crew(user_input, dataset_context, conversation_history, file_path, model,
+                                  dispatch_mode, dataset_schema, conversation_summary)
+
+    def _run_crew(self, user_input: str, dataset_context: str, conversation_history: str, file_path: Optional[str], model: str,
+                  dispatch_mode: Optional[str], dataset_schema: Optional[Dict[str, Any]],
+                  conversation_summary: Optional[str] = None) -> str:
         logging.info(f"Executing crew with dynamically configured model: {model}")
         
         # 1. Crea la instancia del LLM justo para esta tarea específica
@@ -39,52 +92,108 @@ class AIManager:
             logging.error(f"FATAL: Failed to create LLM instance for model {model}. Details: {e}", exc_info=True)
             return f"Error: No se pudo crear el cliente de IA para el modelo {model}."
 
-        # 2. Crea tus agentes usando la instancia de LLM recién creada
+        # 1b. Vía rápida: los turnos triviales se responden con una plantilla o una sola llamada barata
+        if self.fast_path is not None:
+            with telemetry.span("fast_path", kind="router") as span:
+                fast_answer = self.fast_path.answer(user_input, llm=llm_instance, has_dataset=bool(file_path),
+                                                    conversation_history=conversation_history)
+                span["hit"] = fast_answer is not None
+            if fast_answer is not None:
+                logging.info("Trivial turn answered by the fast path (crew not started).")
+                return fast_answer
+
+        # 2. La fábrica de agentes usa la instancia de LLM recién creada
         agents_factory = ProjectAgents(llm=llm_instance)
+
+        # 3. Construye el contexto compacto (esquema relevante + historial reciente, con presupuesto de tokens)
+        with telemetry.span("context_builder", kind="context") as span:
+            full_context = self.context_builder.build(
+                user_input=user_input,
+                file_path=file_path,
+                dataset_context=dataset_context,
+                conversation_history=conversation_history,
+                dataset_schema=dataset_schema,
+                conversation_summary=conversation_summary,
+            )
+            span["estimated_tokens"] = self.context_builder.estimate_tokens(full_context)
+
+        # 4. Despacho: especialista directo si la intención es evidente, si no el director
+        mode = dispatch_mode or self.dispatch_mode
+        specialist_name = None
+        if mode == "auto":
+            with telemetry.span("specialist_router", kind="router") as span:
+                route = self.specialist_router.route(user_input, has_dataset=bool(file_path))
+                span["specialist"] = route["specialist"] or "director"
+            specialist_name = route["specialist"]
+            logging.info(f"Specialist router: {specialist_name or 'director'} (confidence {route['confidence']:.2f})")
+
+        if specialist_name:
+            crew = self._build_specialist_crew(agents_factory, specialist_name, full_context)
+        else:
+            crew = self._build_director_crew(agents_factory, full_context)
+
+        crew_name = specialist_name or "project_director"
+        with telemetry.span(crew_name, kind="crew", model=model):
+            crew_output = crew.kickoff()
+        
+        if hasattr(crew_output, 'raw'):
+            return crew_output.raw
+        return str(crew_output)
+
+    def _build_director_crew(self, agents_factory: ProjectAgents, full_context: str) -> Crew:
+        """
+        Crew completo: el director recibe la petición y delega en el especialista adecuado.
+        """
         director_proyecto = agents_factory.project_director()
         analista_datos = agents_factory.data_analyst()
         investigador_web = agents_factory.web_researcher()
         visualizador_datos = agents_factory.data_visualization_expert()
         cientifico_datos = agents_factory.predictive_modeler()
 
-        # 3. Construye el contexto completo (tu lógica aquí es perfecta)
-        file_context_info = ""
-        if file_path:
-            file_context_info = f"""
-INFORMACIÓN DEL ARCHIVO A ANALIZAR:
----
-La ruta ABSOLUTA del archivo que el usuario ha cargado es: '{file_path}'
-Cualquier agente que necesite leer o analizar el archivo DEBE usar esta ruta exacta.
----
-"""
-        full_context = f"""{file_context_info}
-CONTEXTO DEL CONJUNTO DE DATOS (resumen):
----
-{dataset_context}
----
-HISTORIAL DE LA CONVERSACIÓN ANTERIOR:
----
-{conversation_history}
----
-NUEVA PETICIÓN DEL USUARIO:
-{user_input}"""
-
-        # 4. Define la tarea y el Crew (sin cambios)
         project_management_task = Task(
             description=full_context,
             expected_output="Una respuesta final y completa que satisfaga la petición del usuario, basada en la colaboración del equipo.",
             agent=director_proyecto,
         )
 
-        crew = Crew(
-            agents=[director_proyecto, analista_datos, investigador_web, visualizador_datos, cientifico_datos],
+        agents = [director_proyecto, analista_datos, investigador_web, visualizador_datos, cientifico_datos]
+        self._instrument_agents(agents)
+
+        return Crew(
+            agents=agents,
             tasks=[project_management_task],
             process=Process.sequential,
             verbose=True
         )
 
-        crew_output = crew.kickoff()
-        
-        if hasattr(crew_output, 'raw'):
-            return crew_output.raw
-        return str(crew_output)
\ No newline at end of file
+    def _build_specialist_crew(self, agents_factory: ProjectAgents, specialist_name: str, full_context: str) -> Crew:
+        """
+        Crew de un solo agente: el especialista elegido por el router trabaja directamente
+        sobre la petición, ahorrando el salto de delegación del director.
+        """
+        specialist = getattr(agents_factory, specialist_name)()
+        self._instrument_agents([specialist])
+
+        specialist_task = Task(
+            description=full_context,
+            expected_output="Una respuesta final y completa que satisfaga la petición del usuario, basada en tu trabajo como especialista.",
+            agent=specialist,
+        )
+
+        return Crew(
+            agents=[specialist],
+            tasks=[specialist_task],
+            process=Process.sequential,
+            verbose=True
+        )
+
+    def _instrument_agents(self, agents):
+        """
+        Registra un span `agent_step` por cada paso de cada agente y etiqueta sus llamadas
+        al LLM con el rol del agente (metadata de LiteLLM) para atribuirlas en la telemetría.
+        """
+        for agent in agents:
+            agent.step_callback = telemetry.step_recorder(agent.role)
+            llm_params = getattr(agent.llm, "additional_params", None)
+            if isinstance(llm_params, dict):
+                llm_params["metadata"] = {**(llm_params.get("metadata") or {}), "agent": agent.role}
@@ -0,0 +1,198 @@
+# /backend/managers/context_builder.py
+
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+
+from backend.managers.fast_path import normalize_text
+
+# Rutas de modelos guardados por ModelTrainingTool ("Ruta del Modelo: models/....pkl").
+MODEL_PATH_PATTERN = re.compile(r"([\w./\\-]+\.(?:pkl|joblib))\b")
+
+
+def build_dataset_schema(df: pd.DataFrame, filename: str, max_top_values: int = 5) -> Dict[str, Any]:
+    """
+    Genera una representación compacta (y serializable) del esquema del dataset,
+    pensada para guardarse en la sesión y renderizarse por columnas bajo demanda.
+    """
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        column = {
+            "name": str(name),
+            "dtype": str(series.dtype),
+            "nulls": int(series.isna().sum()),
+            "unique": int(series.nunique(dropna=True)),
+        }
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            described = series.describe()
+            column["stats"] = {
+                key: round(float(described[key]), 4)
+                for key in ("min", "max", "mean", "std")
+                if key in described and pd.notna(described[key])
+            }
+        else:
+            top_values = series.astype(str).value_counts().head(max_top_values)
+            column["top"] = [str(value) for value in top_values.index]
+        columns.append(column)
+
+    return {
+        "filename": filename,
+        "rows": int(df.shape[0]),
+        "cols": int(df.shape[1]),
+        "columns": columns,
+        "sample": df.head(3).astype(str).to_dict(orient="records"),
+    }
+
+
+class ContextBuilder:
+    """
+    Construye el `full_context` de `run_crew` respetando un presupuesto de tokens
+    por sección: esquema compacto del dataset (solo con detalle para las columnas
+    relevantes a la pregunta) e historial reciente de la conversación, precedido
+    del resumen acumulado de la sesión cuando se omiten turnos antiguos.
+    """
+
+    def __init__(self, dataset_token_budget: int = 1500, history_token_budget: int = 2000,
+                 turn_token_budget: int = 400, summary_token_budget: int = 400,
+                 full_detail_max_columns: int = 15, chars_per_token: int = 4):
+        self.dataset_token_budget = dataset_token_budget
+        self.history_token_budget = history_token_budget
+        self.turn_token_budget = turn_token_budget
+        self.summary_token_budget = summary_token_budget
+        self.full_detail_max_columns = full_detail_max_columns
+        self.chars_per_token = chars_per_token
+
+    def estimate_tokens(self, text: str) -> int:
+        return len(text) // self.chars_per_token + 1
+
+    def _truncate(self, text: str, token_budget: int) -> str:
+        max_chars = token_budget * self.chars_per_token
+        if len(text) <= max_chars:
+            return text
+        return text[:max_chars] + "[...]"
+
+    def select_columns(self, schema: Dict[str, Any], question: str) -> List[Dict[str, Any]]:
+        """
+        Devuelve las columnas que merecen detalle: todas si el dataset es estrecho,
+        si no solo las mencionadas en la pregunta.
+        """
+        columns = schema.get("columns", [])
+        if len(columns) <= self.full_detail_max_columns:
+            return columns
+
+        normalized_question = f" {normalize_text(question.replace('_', ' '))} "
+        question_tokens = set(normalized_question.split())
+        relevant = []
+        for column in columns:
+            normalized_name = normalize_text(column["name"].replace("_", " "))
+            # Coincidencia exacta del nombre, o de alguna palabra significativa del nombre.
+            name_tokens = {token for token in normalized_name.split() if len(token) >= 4}
+            if normalized_name and (f" {normalized_name} " in normalized_question or name_tokens & question_tokens):
+                relevant.append(column)
+        return relevant
+
+    @staticmethod
+    def _render_column(column: Dict[str, Any]) -> str:
+        line = f"- {column['name']} ({column['dtype']}, nulos={column['nulls']}, únicos={column['unique']})"
+        if "stats" in column:
+            stats = ", ".join(f"{key}={value}" for key, value in column["stats"].items())
+            line += f": {stats}"
+        elif column.get("top"):
+            line += f": valores frecuentes {', '.join(column['top'])}"
+        return line
+
+    def render_schema(self, schema: Dict[str, Any], question: str) -> str:
+        columns = schema.get("columns", [])
+        detailed = self.select_columns(schema, question)
+        detailed_names = {column["name"] for column in detailed}
+
+        lines = [f"Dataset '{schema.get('filename', '')}': {schema.get('rows', 0)} filas x {schema.get('cols', 0)} columnas."]
+        other_columns = [f"{c['name']}:{c['dtype']}" for c in columns if c["name"] not in detailed_names]
+        if detailed:
+            lines.append("Columnas relevantes:")
+            lines.extend(self._render_column(column) for column in detailed)
+        if other_columns:
+            lines.append("Otras columnas: " + ", ".join(other_columns))
+        if schema.get("sample"):
+            sample_names = [column["name"] for column in (detailed or columns[:self.full_detail_max_columns])]
+            sample = {name: schema["sample"][0].get(name) for name in sample_names}
+            lines.append("Fila de ejemplo: " + str(sample))
+
+        return self._truncate("\n".join(lines), self.dataset_token_budget)
+
+    def _select_turns(self, conversation_history: str) -> Tuple[List[str], List[str]]:
+        """Devuelve (todos los turnos, turnos recientes que caben en el presupuesto, ya recortados)."""
+        turns = [turn for turn in re.split(r"(?=^User: )", conversation_history, flags=re.MULTILINE) if turn.strip()]
+        kept: List[str] = []
+        used_tokens = 0
+        for turn in reversed(turns):
+            turn = self._truncate(turn.strip(), self.turn_token_budget)
+            turn_tokens = self.estimate_tokens(turn)
+            if kept and used_tokens + turn_tokens > self.history_token_budget:
+                break
+            kept.append(turn)
+            used_tokens += turn_tokens
+        kept.reverse()
+        return turns, kept
+
+    def omits_turns(self, conversation_history: str) -> bool:
+        """Indica si `compact_history` dejaría fuera turnos antiguos (solo entonces hace falta el resumen)."""
+        if not conversation_history:
+            return False
+        turns, kept = self._select_turns(conversation_history)
+        return len(kept) < len(turns)
+
+    def compact_history(self, conversation_history: str, conversation_summary: Optional[str] = None) -> str:
+        """
+        Conserva los turnos más recientes dentro del presupuesto, recortando cada turno
+        largo, y preserva siempre la última ruta de modelo guardado (`model_path`).
+        Si hay turnos omitidos y un resumen de la sesión, el resumen los sustituye.
+        """
+        if not conversation_history:
+            return ""
+
+        turns, kept = self._select_turns(conversation_history)
+        compacted = "\n".join(kept)
+        omitted = len(turns) - len(kept)
+        if omitted:
+            compacted = f"[{omitted} turnos anteriores omitidos]\n{compacted}"
+            if conversation_summary:
+                summary = self._truncate(conversation_summary.strip(), self.summary_token_budget)
+                compacted = f"Resumen de la conversación anterior: {summary}\n{compacted}"
+
+        model_paths = MODEL_PATH_PATTERN.findall(conversation_history)
+        if model_paths and model_paths[-1] not in compacted:
+            compacted += f"\nmodel_path del último modelo entrenado: {model_paths[-1]}"
+        return compacted
+
+    def build(self, user_input: str, file_path: Optional[str], dataset_context: str,
+              conversation_history: str, dataset_schema: Optional[Dict[str, Any]] = None,
+              conversation_summary: Optional[str] = None) -> str:
+        file_context_info = ""
+        if file_path:
+            file_context_info = f"""
+INFORMACIÓN DEL ARCHIVO A ANALIZAR:
+---
+La ruta ABSOLUTA del archivo que el usuario ha cargado es: '{file_path}'
+Cualquier agente que necesite leer o analizar el archivo DEBE usar esta ruta exacta.
+---
+"""
+        if dataset_schema:
+            dataset_section = self.render_schema(dataset_schema, user_input)
+        else:
+            # Sesiones antiguas sin esquema: recortamos el resumen en texto al presupuesto.
+            dataset_section = self._truncate((dataset_context or "").strip(), self.dataset_token_budget)
+
+        return f"""{file_context_info}
+CONTEXTO DEL CONJUNTO DE DATOS (resumen):
+---
+{dataset_section}
+---
+HISTORIAL DE LA CONVERSACIÓN ANTERIOR:
+---
+{self.compact_history(conversation_history, conversation_summary)}
+---
+NUEVA PETICIÓN DEL USUARIO:
+{user_input}"""
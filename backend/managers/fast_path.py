@@ -0,0 +1,166 @@
+# /backend/managers/fast_path.py
+
+import re
+import time
+import logging
+import unicodedata
+from typing import Optional, Dict, List, Tuple
+
+from backend.utils.telemetry import telemetry
+
+# Frases que, por sí solas, forman un turno trivial. El orden de las categorías
+# define la prioridad cuando un mensaje mezcla varias ("hola, ¿qué puedes hacer?").
+TRIVIAL_PHRASES: Dict[str, List[str]] = {
+    "capabilities": [
+        "que puedes hacer", "que sabes hacer", "que haces", "quien eres", "que eres",
+        "como funciona", "como funcionas", "como te uso", "en que me puedes ayudar",
+        "en que puedes ayudarme", "ayuda", "help", "what can you do", "who are you",
+    ],
+    "farewell": [
+        "adios", "hasta luego", "hasta pronto", "hasta manana", "nos vemos", "chao", "chau",
+        "bye", "goodbye", "see you",
+    ],
+    "thanks": [
+        "gracias por tu ayuda", "gracias por la ayuda", "muchas gracias", "mil gracias",
+        "gracias", "thank you", "thanks", "te lo agradezco",
+    ],
+    "small_talk": [
+        "como estas", "como te va", "que tal estas", "como va todo", "how are you",
+    ],
+    "greeting": [
+        "buenos dias", "buenas tardes", "buenas noches", "buenas", "hola", "saludos",
+        "que tal", "hey", "hello", "hi",
+    ],
+    "acknowledgment": [
+        "de acuerdo", "entendido", "perfecto", "genial", "excelente", "vale", "ok", "okay",
+        "listo", "muy bien", "bien", "great", "cool",
+    ],
+}
+
+# Palabras de relleno que no cambian la intención de un turno trivial.
+FILLER_WORDS = {
+    "a", "todos", "amigo", "equipo", "de", "nuevo", "por", "todo", "tu", "la", "el", "y",
+    "muy", "pues", "oye", "si", "no", "again", "so", "much", "there",
+}
+
+TEMPLATES: Dict[str, str] = {
+    "greeting": "¡Hola! Soy tu asistente de análisis de datos. ¿En qué puedo ayudarte hoy?",
+    "thanks": "¡Con gusto! Si necesitas algo más sobre tus datos, aquí estoy.",
+    "farewell": "¡Hasta luego! Cuando quieras seguir con el análisis, aquí estaré.",
+    "acknowledgment": "Perfecto. Dime cuál es el siguiente paso y me pongo con ello.",
+    "capabilities": (
+        "Puedo ayudarte a:\n"
+        "- Explorar y resumir tu conjunto de datos (estadísticas, correlaciones, cálculos).\n"
+        "- Crear visualizaciones interactivas con Plotly.\n"
+        "- Entrenar modelos predictivos y usarlos para predecir nuevos valores.\n"
+        "- Buscar información actualizada en la web."
+    ),
+}
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sin tildes ni puntuación y con espacios simples."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+SMALL_TALK_SYSTEM_PROMPT = (
+    "Eres el asistente de DSAgency, una plataforma de análisis de datos. "
+    "Responde de forma amable y muy breve (una o dos frases), en el idioma del usuario."
+)
+
+
+class FastPathResponder:
+    """
+    Responde turnos triviales (saludos, agradecimientos, despedidas y meta-preguntas)
+    sin arrancar el crew. Las categorías fijas usan una plantilla; la charla casual
+    usa una única llamada corta al LLM.
+    """
+
+    def __init__(self, max_words: int = 8, small_talk_max_tokens: int = 80):
+        self.max_words = max_words
+        self.small_talk_max_tokens = small_talk_max_tokens
+        # Frases más largas primero para que "muchas gracias" gane a "gracias".
+        self._patterns: List[Tuple[re.Pattern, str]] = sorted(
+            (
+                (re.compile(rf"\b{re.escape(phrase)}\b"), category)
+                for category, phrases in TRIVIAL_PHRASES.items()
+                for phrase in phrases
+            ),
+            key=lambda item: len(item[0].pattern),
+            reverse=True,
+        )
+        self._priority = list(TRIVIAL_PHRASES.keys())
+
+    @staticmethod
+    def _awaits_answer(conversation_history: Optional[str]) -> bool:
+        """Indica si el último turno del asistente acaba preguntando algo (pregunta en su última línea)."""
+        if not conversation_history:
+            return False
+        position = conversation_history.rfind("Assistant:")
+        if position == -1:
+            return False
+        lines = [line for line in conversation_history[position + len("Assistant:"):].splitlines() if line.strip()]
+        return bool(lines) and "?" in lines[-1]
+
+    def classify(self, user_input: str, conversation_history: Optional[str] = None) -> Optional[str]:
+        """
+        Devuelve la categoría del turno trivial, o None si el mensaje necesita el crew.
+        Un "vale" o "sí, de acuerdo" que responde a una pregunta del asistente ("¿Quieres
+        que entrene el modelo?") es una instrucción, no un acuse de recibo: va al crew.
+        """
+        normalized = normalize_text(user_input or "")
+        if not normalized or len(normalized.split()) > self.max_words:
+            return None
+
+        matched = set()
+        remainder = normalized
+        for pattern, category in self._patterns:
+            if pattern.search(remainder):
+                matched.add(category)
+                remainder = pattern.sub(" ", remainder)
+
+        leftover = [word for word in remainder.split() if word not in FILLER_WORDS]
+        if not matched or leftover:
+            return None
+
+        category = next(category for category in self._priority if category in matched)
+        if category == "acknowledgment" and self._awaits_answer(conversation_history):
+            return None
+        return category
+
+    def answer(self, user_input: str, llm=None, has_dataset: bool = False,
+               conversation_history: Optional[str] = None) -> Optional[str]:
+        """
+        Intenta responder el turno por la vía rápida. Devuelve None si no es trivial.
+        """
+        category = self.classify(user_input, conversation_history)
+        if category is None:
+            return None
+
+        if category == "small_talk" and llm is not None:
+            try:
+                start = time.perf_counter()
+                reply = llm.invoke(
+                    [("system", SMALL_TALK_SYSTEM_PROMPT), ("human", user_input)],
+                    max_tokens=self.small_talk_max_tokens,
+                )
+                usage = getattr(reply, "usage_metadata", None) or {}
+                telemetry.record_llm_call(
+                    model=getattr(llm, "model_name", "unknown"),
+                    prompt_tokens=usage.get("input_tokens", 0),
+                    completion_tokens=usage.get("output_tokens", 0),
+                    duration_s=time.perf_counter() - start,
+                    agent="fast_path",
+                )
+                content = getattr(reply, "content", str(reply)).strip()
+                if content:
+                    return content
+            except Exception as e:
+                logging.warning(f"Fast path small-talk call failed, using template. Details: {e}")
+            return TEMPLATES["greeting"]
+
+        response = TEMPLATES.get(category, TEMPLATES["greeting"])
+        if category in ("greeting", "capabilities") and not has_dataset:
+            response += "\n\nPara empezar, sube un archivo CSV o Excel con tus datos."
+        return response
@@ -0,0 +1,84 @@
+# /backend/managers/specialist_router.py
+
+import re
+from typing import Dict, Any, List
+
+from backend.managers.fast_path import normalize_text
+
+# Palabras clave por especialista (normalizadas: minúsculas y sin tildes).
+# Son las mismas pistas que el backstory del director usa para delegar.
+SPECIALIST_KEYWORDS: Dict[str, List[str]] = {
+    "data_analyst": [
+        "analiza", "analizar", "analisis", "eda", "describe", "resume", "resumen", "calcula",
+        "calcular", "promedio", "media", "mediana", "maximo", "minimo", "correlacion", "cuantos",
+        "cuantas", "suma", "total", "nulos", "valores faltantes", "estadisticas", "agrupa",
+        "desviacion", "percentil", "outliers", "columnas", "filas",
+    ],
+    "data_visualization_expert": [
+        "grafico", "graficos", "grafica", "graficas", "graficar", "visualiza", "visualizacion",
+        "plot", "chart", "histograma", "barras", "dispersion", "scatter", "pastel", "pie",
+        "mapa de calor", "heatmap", "boxplot", "diagrama", "dibuja",
+    ],
+    "predictive_modeler": [
+        "predice", "predecir", "prediccion", "predicciones", "pronostica", "pronostico", "modelo",
+        "entrena", "entrenar", "entrenamiento", "regresion", "clasificacion", "forecast",
+        "model_path", "machine learning",
+    ],
+    "web_researcher": [
+        "quien es", "quien fue", "busca en internet", "busca en la web", "buscar en internet",
+        "internet", "web", "noticias", "actualidad", "clima", "poblacion", "precio de la accion",
+        "presidente", "cotizacion",
+    ],
+}
+
+# Especialistas que no pueden trabajar sin un archivo cargado.
+DATASET_SPECIALISTS = {"data_analyst", "data_visualization_expert", "predictive_modeler"}
+
+
+class SpecialistRouter:
+    """
+    Router rápido (sin LLM) que elige directamente al especialista de `ProjectAgents`
+    cuando la intención es evidente. Si la confianza es baja devuelve `specialist=None`
+    y el llamador debe recurrir al director de proyecto.
+
+    Una sola palabra clave no basta ("¿Qué modelo de coche aparece más?" no pide entrenar
+    nada): el especialista necesita al menos `min_score` coincidencias y además una cuota
+    `min_confidence` del total.
+    """
+
+    def __init__(self, min_confidence: float = 0.75, min_score: int = 2):
+        self.min_confidence = min_confidence
+        self.min_score = min_score
+        self._patterns = {
+            specialist: [re.compile(rf"\b{re.escape(keyword)}\b") for keyword in keywords]
+            for specialist, keywords in SPECIALIST_KEYWORDS.items()
+        }
+
+    def route(self, user_input: str, has_dataset: bool = False) -> Dict[str, Any]:
+        """
+        Puntúa la petición contra cada especialista.
+
+        Returns:
+            Diccionario con `specialist` (o None), `confidence` y `scores`.
+        """
+        normalized = normalize_text(user_input or "")
+        scores = {
+            specialist: sum(1 for pattern in patterns if pattern.search(normalized))
+            for specialist, patterns in self._patterns.items()
+        }
+
+        total = sum(scores.values())
+        if total == 0:
+            return {"specialist": None, "confidence": 0.0, "scores": scores}
+
+        best = max(scores, key=scores.get)
+        confidence = scores[best] / total
+
+        # Sin archivo, los especialistas de datos no pueden hacer nada útil: mejor el director.
+        if best in DATASET_SPECIALISTS and not has_dataset:
+            return {"specialist": None, "confidence": confidence, "scores": scores}
+
+        if scores[best] < self.min_score or confidence < self.min_confidence:
+            return {"specialist": None, "confidence": confidence, "scores": scores}
+
+        return {"specialist": best, "confidence": confidence, "scores": scores}
@@ -1,14 +1,30 @@
 # Usamos imports absolutos para mayor claridad y robustez
-from backend.agents.retrievers.document_retrievers import DocumentRetriever, SemanticRetriever, KeywordRetriever
-from backend.agents.retrievers.agent_memory_retrievers import AgentMemoryRetriever, ErrorMemoryRetriever
-from backend.agents.retrievers.embedding_utils import embed_text, calculate_similarity
+from backend.retrievers.document_retrievers import (
+    DocumentRetriever, SemanticRetriever, KeywordRetriever, HybridRetriever, create_retriever
+)
+from backend.retrievers.agent_memory_retrievers import AgentMemoryRetriever, ErrorMemoryRetriever
+from backend.retrievers.embedding_utils import embed_text, calculate_similarity
+from backend.retrievers.embedding_cache import EmbeddingCache, get_embedding_cache
+from backend.retrievers.local_embeddings import LocalEmbeddingEngine, get_local_embedding_engine
+from backend.retrievers.vector_index import VectorIndex, ExactIndex, IVFIndex, HNSWIndex, create_index
 
 __all__ = [
     'DocumentRetriever',
     'SemanticRetriever',
     'KeywordRetriever',
+    'HybridRetriever',
+    'create_retriever',
     'AgentMemoryRetriever',
     'ErrorMemoryRetriever',
     'embed_text',
     'calculate_similarity',
+    'EmbeddingCache',
+    'get_embedding_cache',
+    'LocalEmbeddingEngine',
+    'get_local_embedding_engine',
+    'VectorIndex',
+    'ExactIndex',
+    'IVFIndex',
+    'HNSWIndex',
+    'create_index',
 ]
\ No newline at end of file
@@ -1,76 +1,216 @@
 import os
 import json
 import logging
-from typing import List, Dict, Any, Optional, Union
+import time
+import uuid
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime
+import numpy as np
 import pandas as pd
-from .document_retrievers import DocumentRetriever, SemanticRetriever
-from backend.agents.retrievers.document_retrievers import KeywordRetriever
+from .document_retrievers import DocumentRetriever, SemanticRetriever, KeywordRetriever, create_retriever
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
 class AgentMemoryRetriever:
     """Retriever for agent memory records."""
     
-    def __init__(self, memory_dir: str = None, use_semantic: bool = True):
+    def __init__(self, memory_dir: str = None, use_semantic: bool = True, index_backend: str = "exact",
+                 index_params: Optional[Dict[str, Any]] = None, retrieval_mode: Optional[str] = None,
+                 compaction_threshold: int = 1000, lazy: bool = True, warm_up: bool = False,
+                 warm_up_workers: int = 4):
         """
         Initialize the agent memory retriever.
         
+        Each agent's memories are stored as a JSON snapshot (`<agent>.json`) plus an
+        append-only JSONL log (`<agent>.jsonl`) of memories saved since the last
+        compaction. Appends and compactions hold an exclusive file lock, so several
+        worker processes can share the directory.
+        
+        With `lazy` (the default) construction only lists the memory directory; an
+        agent's memories are loaded and indexed on first use. `warm_up` additionally
+        starts loading every agent in the background; `status()` reports progress.
+        
         Args:
             memory_dir: Directory containing agent memory files
             use_semantic: Whether to use semantic retrieval (vs. keyword)
+            index_backend: Vector index backend for semantic retrieval ("exact", "ivf" or "hnsw")
+            index_params: Optional tuning parameters for the index backend
+            retrieval_mode: "semantic", "keyword" or "hybrid" (overrides use_semantic when given)
+            compaction_threshold: Log entries after which the log is folded into the snapshot
+            lazy: Load each agent's memories on first use instead of all at construction
+            warm_up: Start loading all agents in a background thread pool
+            warm_up_workers: Threads used by the background warm-up
         """
         self.memory_dir = memory_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/agent_memory")
         self.use_semantic = use_semantic
+        self.retrieval_mode = retrieval_mode or ("semantic" if use_semantic else "keyword")
+        self.index_backend = index_backend
+        self.index_params = index_params or {}
+        self.compaction_threshold = compaction_threshold
         os.makedirs(self.memory_dir, exist_ok=True)
         
-        # Create retrievers for each agent
+        # Per-agent counters, so saving a memory never requires reading the files back
+        self._memory_counts: Dict[str, int] = {}
+        self._log_counts: Dict[str, int] = {}
+        self._thread_lock = threading.Lock()
+        
+        # Retrievers of the agents loaded so far; known agents are discovered up front
         self.agent_retrievers = {}
-        self._load_agent_memories()
+        self._known_agents = set()
+        self._failed_agents: Dict[str, str] = {}
+        self._load_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._registry_lock = threading.Lock()
+        self.warm_up_workers = warm_up_workers
+        self._warm_up_executor: Optional[ThreadPoolExecutor] = None
+        self._warm_up_started_at: Optional[float] = None
+        self._warm_up_finished_at: Optional[float] = None
+        
+        self._discover_agents()
+        if not lazy:
+            self._load_agent_memories()
+        elif warm_up:
+            self.warm_up()
+    
+    def _snapshot_path(self, agent_name: str) -> str:
+        return os.path.join(self.memory_dir, f"{agent_name}.json")
+    
+    def _log_path(self, agent_name: str) -> str:
+        return os.path.join(self.memory_dir, f"{agent_name}.jsonl")
+    
+    @contextmanager
+    def _locked(self, agent_name: str):
+        """Exclusive lock on an agent's memory files, across threads and processes."""
+        with self._thread_lock:
+            with open(os.path.join(self.memory_dir, f"{agent_name}.lock"), 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _discover_agents(self):
+        """Record the agents that have memory files, without reading them."""
+        if not os.path.exists(self.memory_dir):
+            return
+        
+        self._known_agents.update(
+            os.path.splitext(file)[0]
+            for file in os.listdir(self.memory_dir)
+            if file.endswith('.json') or file.endswith('.jsonl')
+        )
     
     def _load_agent_memories(self):
         """Load memory files for all agents."""
-        if not os.path.exists(self.memory_dir):
+        for agent_name in sorted(self._known_agents):
+            self._ensure_loaded(agent_name)
+    
+    def _ensure_loaded(self, agent_name: str) -> Optional[DocumentRetriever]:
+        """Return the agent's retriever, loading its memories on first use (once per agent)."""
+        retriever = self.agent_retrievers.get(agent_name)
+        if retriever is not None or agent_name in self._failed_agents:
+            return retriever
+        
+        with self._registry_lock:
+            load_lock = self._load_locks[agent_name]
+        with load_lock:
+            if agent_name not in self.agent_retrievers and agent_name not in self._failed_agents:
+                self._load_agent_memory(agent_name)
+        return self.agent_retrievers.get(agent_name)
+    
+    def warm_up(self, max_workers: Optional[int] = None):
+        """
+        Load every known agent in a background thread pool. Returns immediately.
+        
+        Args:
+            max_workers: Optional number of threads (default: warm_up_workers)
+        """
+        if self._warm_up_executor is not None:
+            return
+        pending = sorted(self._known_agents - set(self.agent_retrievers))
+        self._warm_up_started_at = time.time()
+        if not pending:
+            self._warm_up_finished_at = self._warm_up_started_at
             return
         
-        for file in os.listdir(self.memory_dir):
-            if file.endswith('.json'):
-                agent_name = os.path.splitext(file)[0]
-                file_path = os.path.join(self.memory_dir, file)
-                self._load_agent_memory(agent_name, file_path)
+        self._warm_up_executor = ThreadPoolExecutor(max_workers=max_workers or self.warm_up_workers,
+                                                    thread_name_prefix="agent-memory-warmup")
+        futures = [self._warm_up_executor.submit(self._ensure_loaded, agent) for agent in pending]
+        
+        def _finish(_):
+            if all(future.done() for future in futures):
+                self._warm_up_finished_at = time.time()
+                self._warm_up_executor.shutdown(wait=False)
+        
+        for future in futures:
+            future.add_done_callback(_finish)
+    
+    def status(self) -> Dict[str, Any]:
+        """
+        Readiness of the retriever: how many agents are loaded and whether warm-up finished.
+        
+        Returns:
+            Dictionary with ready, agents_total, agents_loaded, agents_failed, progress and warm-up timing
+        """
+        total = len(self._known_agents | set(self.agent_retrievers))
+        loaded = len(self.agent_retrievers)
+        done = loaded + len(self._failed_agents)
+        return {
+            "ready": done >= total,
+            "agents_total": total,
+            "agents_loaded": loaded,
+            "agents_failed": dict(self._failed_agents),
+            "progress": round(done / total, 3) if total else 1.0,
+            "warming_up": self._warm_up_started_at is not None and self._warm_up_finished_at is None,
+            "warm_up_seconds": round((self._warm_up_finished_at or time.time()) - self._warm_up_started_at, 3)
+            if self._warm_up_started_at is not None else None,
+        }
     
-    def _load_agent_memory(self, agent_name: str, memory_file: str):
-        """Load memory for a specific agent."""
+    def _memory_document(self, agent_name: str, position: int, memory: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the retriever document for a memory entry."""
+        return {
+            "id": f"{agent_name}_{position}",
+            "content": self._format_memory_content(memory),
+            "metadata": {
+                "agent": agent_name,
+                "timestamp": memory.get("timestamp", ""),
+                "memory_type": memory.get("type", "general"),
+                "original": memory
+            }
+        }
+    
+    def _load_agent_memory(self, agent_name: str):
+        """Load memory for a specific agent (snapshot followed by the log)."""
         try:
-            with open(memory_file, 'r') as f:
-                memories = json.load(f)
+            # Under the lock, so a compaction can't replace the log between the two reads
+            with self._locked(agent_name):
+                snapshot, log_entries = self._read_memories(agent_name)
+            memories = snapshot + log_entries
             
             # Create a retriever for this agent
-            if self.use_semantic:
-                retriever = SemanticRetriever()
-            else:
-                retriever = KeywordRetriever()
+            retriever = create_retriever(self.retrieval_mode, self.index_backend, self.index_params)
             
-            # Add memories as documents
-            for i, memory in enumerate(memories):
-                # Format memory content
-                content = self._format_memory_content(memory)
-                
-                # Add to retriever
-                retriever.add_document(
-                    doc_id=f"{agent_name}_{i}",
-                    content=content,
-                    metadata={
-                        "agent": agent_name,
-                        "timestamp": memory.get("timestamp", ""),
-                        "memory_type": memory.get("type", "general"),
-                        "original": memory
-                    }
-                )
+            # Add memories as documents in one batch so embeddings are requested in bulk
+            retriever.add_documents([
+                self._memory_document(agent_name, i, memory) for i, memory in enumerate(memories)
+            ])
             
+            self._memory_counts[agent_name] = len(memories)
+            self._log_counts[agent_name] = len(log_entries)
             self.agent_retrievers[agent_name] = retriever
             logger.info(f"Loaded {len(memories)} memories for agent {agent_name}")
         except Exception as e:
+            self._failed_agents[agent_name] = str(e)
             logger.error(f"Error loading memories for agent {agent_name}: {str(e)}")
     
     def _format_memory_content(self, memory: Dict[str, Any]) -> str:
@@ -106,15 +246,17 @@ class AgentMemoryRetriever:
         results = []
         
         # Determine which agents to search
-        if agent_name and agent_name in self.agent_retrievers:
+        known_agents = self._known_agents | set(self.agent_retrievers)
+        if agent_name and agent_name in known_agents:
             agents_to_search = [agent_name]
         else:
-            agents_to_search = list(self.agent_retrievers.keys())
+            agents_to_search = sorted(known_agents)
         
-        # Retrieve memories from each agent
+        # Retrieve memories from each agent (loading it on first use)
         for agent in agents_to_search:
-            agent_results = self.agent_retrievers[agent].retrieve(query, top_k=top_k)
-            results.extend(agent_results)
+            retriever = self._ensure_loaded(agent)
+            if retriever is not None:
+                results.extend(retriever.retrieve(query, top_k=top_k))
         
         # Filter by time period if specified
         if time_period:
@@ -186,6 +328,10 @@ class AgentMemoryRetriever:
         """
         Save a new memory entry for an agent.
         
+        The entry is appended to the agent's log (one JSON line) and indexed in
+        memory; the log is compacted into the snapshot every `compaction_threshold`
+        entries.
+        
         Args:
             agent_name: Name of the agent
             memory: Memory data to save
@@ -194,80 +340,205 @@ class AgentMemoryRetriever:
         if "timestamp" not in memory:
             memory["timestamp"] = datetime.now().isoformat()
         
-        # Load existing memories
-        memories = self._load_memories_for_agent(agent_name)
-        
-        # Add the new memory
-        memories.append(memory)
-        
-        # Save to file
-        self._save_memories_for_agent(agent_name, memories)
+        # Memories already on disk (possibly written by another process after discovery) are
+        # loaded before appending, so the new entry is indexed exactly once and ids never collide
+        if agent_name not in self.agent_retrievers:
+            if os.path.exists(self._snapshot_path(agent_name)) or os.path.exists(self._log_path(agent_name)):
+                self._known_agents.add(agent_name)
+            if agent_name in self._known_agents:
+                # Retry agents whose earlier load failed
+                self._failed_agents.pop(agent_name, None)
+                self._ensure_loaded(agent_name)
+        has_history = agent_name in self._known_agents
+        
+        # Append to the log
+        try:
+            with self._locked(agent_name):
+                with open(self._log_path(agent_name), 'a+b') as f:
+                    if f.seek(0, os.SEEK_END) == 0:
+                        f.write(self._log_header())
+                    else:
+                        # Terminate a partial line left by an interrupted write so the new entry stays readable
+                        f.seek(-1, os.SEEK_END)
+                        if f.read(1) != b"\n":
+                            f.write(b"\n")
+                    f.write((json.dumps(memory) + "\n").encode("utf-8"))
+                self._log_counts[agent_name] = self._log_counts.get(agent_name, 0) + 1
+                if self._log_counts[agent_name] >= self.compaction_threshold:
+                    self._compact_agent_memory(agent_name)
+        except Exception as e:
+            logger.error(f"Error saving memory for agent {agent_name}: {str(e)}")
         
         # Update the retriever
         if agent_name not in self.agent_retrievers:
-            if self.use_semantic:
-                self.agent_retrievers[agent_name] = SemanticRetriever()
-            else:
-                from .document_retrievers import KeywordRetriever
-                self.agent_retrievers[agent_name] = KeywordRetriever()
+            if has_history:
+                # Its memories on disk could not be loaded: indexing only the new one would restart
+                # the ids at 0. The entry is in the log and is indexed when the agent loads.
+                logger.warning(f"Memory for agent {agent_name} saved but not indexed (its memories failed to load)")
+                return
+            self.agent_retrievers[agent_name] = create_retriever(self.retrieval_mode, self.index_backend,
+                                                                 self.index_params)
+            self._known_agents.add(agent_name)
         
         # Add to retriever
-        content = self._format_memory_content(memory)
+        position = self._memory_counts.get(agent_name, 0)
+        self._memory_counts[agent_name] = position + 1
+        document = self._memory_document(agent_name, position, memory)
         self.agent_retrievers[agent_name].add_document(
-            doc_id=f"{agent_name}_{len(memories)-1}",
-            content=content,
-            metadata={
-                "agent": agent_name,
-                "timestamp": memory.get("timestamp", ""),
-                "memory_type": memory.get("type", "general"),
-                "original": memory
-            }
+            doc_id=document["id"],
+            content=document["content"],
+            metadata=document["metadata"]
         )
     
-    def _load_memories_for_agent(self, agent_name: str) -> List[Dict[str, Any]]:
-        """Load all memories for a specific agent."""
-        memory_file = os.path.join(self.memory_dir, f"{agent_name}.json")
+    @staticmethod
+    def _log_header() -> bytes:
+        """First line of a new log: a random id that tells this log apart from earlier ones."""
+        return (json.dumps({"_log_id": uuid.uuid4().hex}) + "\n").encode("utf-8")
+    
+    def _read_snapshot(self, agent_name: str) -> Dict[str, Any]:
+        """
+        Read the compacted memories of an agent, with the id of the log they were compacted
+        from and its size at that point (older snapshots are a bare list of memories).
+        """
+        memory_file = self._snapshot_path(agent_name)
+        if not os.path.exists(memory_file):
+            return {"memories": [], "log_id": None, "log_offset": 0}
+        with open(memory_file, 'r') as f:
+            snapshot = json.load(f)
+        if isinstance(snapshot, list):
+            return {"memories": snapshot, "log_id": None, "log_offset": 0}
+        return snapshot
+    
+    def _read_log(self, agent_name: str, skip_log_id: Optional[str] = None,
+                  skip_offset: int = 0) -> Tuple[List[Dict[str, Any]], Optional[str], int]:
+        """
+        Read the memories appended since the last compaction.
+        
+        If the log is still the one identified by `skip_log_id`, entries within its first
+        `skip_offset` bytes are already in the snapshot and are skipped.
+        
+        Returns:
+            (entries, log id, log size in bytes)
+        """
+        log_file = self._log_path(agent_name)
+        if not os.path.exists(log_file):
+            return [], None, 0
+        
+        entries = []
+        log_id = None
+        position = 0
+        with open(log_file, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                start, position = position, position + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # A write interrupted by a crash leaves a partial last line
+                    logger.warning(f"Skipping unreadable line {line_number} in {log_file}")
+                    continue
+                if line_number == 1 and isinstance(entry, dict) and "_log_id" in entry:
+                    log_id = entry["_log_id"]
+                elif log_id is None or log_id != skip_log_id or start >= skip_offset:
+                    entries.append(entry)
+        return entries, log_id, position
+    
+    def _read_memories(self, agent_name: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Snapshot memories and the log entries not yet compacted into it."""
+        snapshot = self._read_snapshot(agent_name)
+        log_entries, _, _ = self._read_log(agent_name, snapshot.get("log_id"), snapshot.get("log_offset", 0))
+        return snapshot.get("memories", []), log_entries
+    
+    def _compact_agent_memory(self, agent_name: str):
+        """Fold the log into the snapshot. Must be called with the agent's lock held."""
+        snapshot = self._read_snapshot(agent_name)
+        log_entries, log_id, log_size = self._read_log(agent_name, snapshot.get("log_id"),
+                                                       snapshot.get("log_offset", 0))
+        memories = snapshot.get("memories", []) + log_entries
+        # The snapshot records which log (and how much of it) it contains: a crash before the
+        # log is replaced below leaves those entries in the log, and loading skips them
+        self._save_memories_for_agent(agent_name, memories, log_id=log_id, log_offset=log_size)
+        
+        # Start a new log only once the snapshot containing its entries is in place
+        log_file = self._log_path(agent_name)
+        tmp_file = log_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(self._log_header())
+        os.replace(tmp_file, log_file)
+        self._log_counts[agent_name] = 0
+        logger.info(f"Compacted {len(memories)} memories for agent {agent_name}")
+    
+    def compact(self, agent_name: Optional[str] = None):
+        """
+        Compact the memory log of one agent (or of every agent).
         
-        if os.path.exists(memory_file):
+        Args:
+            agent_name: Optional name of the agent to compact (or None for all)
+        """
+        agents = [agent_name] if agent_name else sorted(self._known_agents | set(self.agent_retrievers))
+        for agent in agents:
             try:
-                with open(memory_file, 'r') as f:
-                    return json.load(f)
+                with self._locked(agent):
+                    self._compact_agent_memory(agent)
             except Exception as e:
-                logger.error(f"Error loading memories for agent {agent_name}: {str(e)}")
+                logger.error(f"Error compacting memories for agent {agent}: {str(e)}")
+    
+    def _load_memories_for_agent(self, agent_name: str) -> List[Dict[str, Any]]:
+        """Load all memories for a specific agent."""
+        try:
+            snapshot, log_entries = self._read_memories(agent_name)
+            return snapshot + log_entries
+        except Exception as e:
+            logger.error(f"Error loading memories for agent {agent_name}: {str(e)}")
         
         return []
     
-    def _save_memories_for_agent(self, agent_name: str, memories: List[Dict[str, Any]]):
-        """Save all memories for a specific agent."""
-        memory_file = os.path.join(self.memory_dir, f"{agent_name}.json")
+    def _save_memories_for_agent(self, agent_name: str, memories: List[Dict[str, Any]],
+                                 log_id: Optional[str] = None, log_offset: int = 0):
+        """
+        Save all memories for a specific agent as the snapshot (written atomically), noting
+        the log they include entries from (`log_id`) up to `log_offset` bytes.
+        """
+        memory_file = self._snapshot_path(agent_name)
+        tmp_file = memory_file + ".tmp"
         
-        try:
-            with open(memory_file, 'w') as f:
-                json.dump(memories, f, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving memories for agent {agent_name}: {str(e)}")
+        with open(tmp_file, 'w') as f:
+            json.dump({"memories": memories, "log_id": log_id, "log_offset": log_offset}, f)
+        os.replace(tmp_file, memory_file)
 
 
 class ErrorMemoryRetriever:
     """Retriever for error memory records."""
     
-    def __init__(self, error_db_path: str = None, use_semantic: bool = True):
+    def __init__(self, error_db_path: str = None, use_semantic: bool = True, index_backend: str = "exact",
+                 index_params: Optional[Dict[str, Any]] = None, retrieval_mode: Optional[str] = None):
         """
         Initialize the error memory retriever.
         
         Args:
             error_db_path: Path to the error database file
             use_semantic: Whether to use semantic retrieval (vs. keyword)
+            index_backend: Vector index backend for semantic retrieval ("exact", "ivf" or "hnsw")
+            index_params: Optional tuning parameters for the index backend
+            retrieval_mode: "semantic", "keyword" or "hybrid" (overrides use_semantic when given);
+                hybrid matches exact error signatures and paraphrased descriptions alike
         """
         self.error_db_path = error_db_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/error_memory.json")
         self.use_semantic = use_semantic
+        self.retrieval_mode = retrieval_mode or ("semantic" if use_semantic else "keyword")
         self._ensure_error_db_exists()
         
         # Create retriever
-        if self.use_semantic:
-            self.retriever = SemanticRetriever()
-        else:
-            self.retriever = KeywordRetriever()
+        self.retriever = create_retriever(self.retrieval_mode, index_backend, index_params)
+        
+        # Metadata indexes (document indices per value, timestamps sorted for range queries)
+        self._by_agent: Dict[str, List[int]] = defaultdict(list)
+        self._by_error_type: Dict[str, List[int]] = defaultdict(list)
+        self._by_severity: Dict[str, List[int]] = defaultdict(list)
+        self._timestamps = np.empty(0, dtype=np.float64)
+        self._timestamp_docs = np.empty(0, dtype=np.int64)
+        self._untimed_docs = np.empty(0, dtype=np.int64)
         
         # Load error database
         self._load_error_db()
@@ -285,28 +556,93 @@ class ErrorMemoryRetriever:
             with open(self.error_db_path, 'r') as f:
                 error_db = json.load(f)
             
-            # Add errors as documents
-            for i, error in enumerate(error_db):
-                # Format error content
-                content = self._format_error_content(error)
-                
-                # Add to retriever
-                self.retriever.add_document(
-                    doc_id=f"error_{i}",
-                    content=content,
-                    metadata={
+            # Add errors as documents in one batch so embeddings are requested in bulk
+            documents = [
+                {
+                    "id": f"error_{i}",
+                    "content": self._format_error_content(error),
+                    "metadata": {
                         "agent": error.get("agent", "UnknownAgent"),
                         "timestamp": error.get("timestamp", ""),
                         "error_type": error.get("analysis", {}).get("type", "Unknown"),
                         "severity": error.get("analysis", {}).get("severity", "Unknown"),
                         "original": error
                     }
-                )
+                }
+                for i, error in enumerate(error_db)
+            ]
+            self.retriever.add_documents(documents)
+            self._build_metadata_indexes(documents)
             
             logger.info(f"Loaded {len(error_db)} error records")
         except Exception as e:
             logger.error(f"Error loading error database: {str(e)}")
     
+    def _build_metadata_indexes(self, documents: List[Dict[str, Any]]):
+        """Index agent, error type, severity and timestamp of every loaded error record."""
+        timed = []
+        untimed = []
+        for doc_idx, document in enumerate(documents):
+            metadata = document["metadata"]
+            self._by_agent[metadata["agent"]].append(doc_idx)
+            self._by_error_type[metadata["error_type"]].append(doc_idx)
+            self._by_severity[metadata["severity"]].append(doc_idx)
+            
+            timestamp = self._to_epoch(metadata.get("timestamp", ""))
+            if timestamp is None:
+                # Records without a usable timestamp pass every time filter
+                untimed.append(doc_idx)
+            else:
+                timed.append((timestamp, doc_idx))
+        
+        timed.sort()
+        self._timestamps = np.array([timestamp for timestamp, _ in timed], dtype=np.float64)
+        self._timestamp_docs = np.array([doc_idx for _, doc_idx in timed], dtype=np.int64)
+        self._untimed_docs = np.array(untimed, dtype=np.int64)
+    
+    @staticmethod
+    def _to_epoch(value: Union[str, datetime, None]) -> Optional[float]:
+        """Convert an ISO timestamp (naive = local time) or datetime to epoch seconds."""
+        if not value:
+            return None
+        try:
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return value.timestamp()
+        except (ValueError, TypeError, OverflowError):
+            return None
+    
+    def _filter_candidates(self, agent_name: Optional[str], error_type: Optional[str], severity: Optional[str],
+                           time_period: Optional[str]) -> Optional[np.ndarray]:
+        """
+        Resolve the metadata filters to the matching document indices.
+        
+        Returns:
+            Sorted document indices, or None when no filter applies
+        """
+        candidate_sets = []
+        for index, value in ((self._by_agent, agent_name), (self._by_error_type, error_type),
+                             (self._by_severity, severity)):
+            if value:
+                candidate_sets.append(np.asarray(index.get(value, []), dtype=np.int64))
+        
+        if time_period:
+            # Parsed once per call; the range is found by binary search over sorted timestamps
+            start_time, end_time = self._parse_time_period(time_period)
+            if start_time or end_time:
+                low = np.searchsorted(self._timestamps, start_time.timestamp(), side="left") if start_time else 0
+                high = np.searchsorted(self._timestamps, end_time.timestamp(), side="right") if end_time \
+                    else len(self._timestamps)
+                candidate_sets.append(np.concatenate([self._timestamp_docs[low:high], self._untimed_docs]))
+        
+        if not candidate_sets:
+            return None
+        
+        candidates = np.unique(candidate_sets[0])
+        for other in candidate_sets[1:]:
+            candidates = np.intersect1d(candidates, other, assume_unique=False)
+        return candidates
+    
     def _format_error_content(self, error: Dict[str, Any]) -> str:
         """Format an error entry as searchable content."""
         content_parts = []
@@ -352,43 +688,13 @@ class ErrorMemoryRetriever:
         Returns:
             List of relevant error records
         """
-        # First retrieve based on the query
-        results = self.retriever.retrieve(query, top_k=top_k*2)  # Get more initially for filtering
-        
-        # Apply filters
-        filtered_results = []
-        for result in results:
-            metadata = result.get("metadata", {})
-            
-            # Filter by agent name
-            if agent_name and metadata.get("agent") != agent_name:
-                continue
-            
-            # Filter by error type
-            if error_type and metadata.get("error_type") != error_type:
-                continue
-            
-            # Filter by severity
-            if severity and metadata.get("severity") != severity:
-                continue
-            
-            # Filter by time period
-            if time_period:
-                start_time, end_time = self._parse_time_period(time_period)
-                if start_time or end_time:
-                    timestamp_str = metadata.get("timestamp", "")
-                    if timestamp_str:
-                        try:
-                            timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                            if (start_time and timestamp < start_time) or (end_time and timestamp > end_time):
-                                continue
-                        except:
-                            pass  # If timestamp parsing fails, include the result
-            
-            filtered_results.append(result)
+        # Apply the filters first, then score only the matching records
+        candidates = self._filter_candidates(agent_name, error_type, severity, time_period)
+        if candidates is not None and candidates.size == 0:
+            return []
         
-        # Return top k filtered results
-        return filtered_results[:top_k]
+        results = self.retriever.retrieve(query, top_k=top_k, doc_indices=candidates)
+        return results[:top_k]
     
     def _parse_time_period(self, time_period: str):
         """Parse a time period string into start and end times."""
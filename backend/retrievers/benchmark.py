@@ -0,0 +1,107 @@
+"""
+Benchmark harness comparing the approximate vector index backends to exact search.
+
+Uses synthetic clustered unit vectors (so no embedding API calls are made) and
+reports build time, query latency percentiles and recall@k against ExactIndex.
+
+    python -m backend.retrievers.benchmark --size 100000 --dim 384 --backends ivf hnsw
+    python -m backend.retrievers.benchmark --backends ivf --params '{"ivf": {"nlist": 256, "nprobe": 16}}'
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+from .vector_index import ExactIndex, create_index
+
+
+def make_dataset(size: int, dim: int, num_queries: int, clusters: int = 100, noise: float = 0.35,
+                 seed: int = 0):
+    """Generate clustered unit vectors and queries drawn from the same distribution."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+
+    def sample(n):
+        points = centers[rng.integers(0, clusters, n)] + noise * rng.standard_normal((n, dim)).astype(np.float32)
+        return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+    return sample(size), sample(num_queries)
+
+
+def run_benchmark(backend: str, vectors: np.ndarray, queries: np.ndarray, top_k: int = 10,
+                  params: Optional[Dict[str, Any]] = None,
+                  ground_truth: Optional[List[np.ndarray]] = None) -> Dict[str, Any]:
+    """
+    Build an index with the given backend and measure it on the queries.
+
+    Args:
+        backend: Index backend name
+        vectors: Unit vectors to insert, one per row
+        queries: Unit query vectors, one per row
+        top_k: Number of neighbours retrieved per query
+        params: Backend tuning parameters
+        ground_truth: Exact top-k ids per query, used to compute recall
+
+    Returns:
+        Dictionary with build time, latency percentiles, recall and the result ids
+    """
+    index = ExactIndex() if backend == "exact" else create_index(backend, **(params or {}))
+
+    start = time.perf_counter()
+    for vector_id, vector in enumerate(vectors):
+        index.add(vector_id, vector)
+    build_s = time.perf_counter() - start
+
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        ids, _ = index.search(query, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids)
+
+    report = {
+        "backend": type(index).__name__,
+        "params": params or {},
+        "build_s": round(build_s, 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "results": results,
+    }
+    if ground_truth is not None:
+        hits = sum(len(set(found.tolist()) & set(truth.tolist())) for found, truth in zip(results, ground_truth))
+        report["recall"] = round(hits / float(sum(len(truth) for truth in ground_truth)), 4)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector index backends to exact search")
+    parser.add_argument("--size", type=int, default=100000, help="Number of indexed vectors")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimension")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--top-k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--backends", nargs="+", default=["ivf", "hnsw"], help="Backends to compare")
+    parser.add_argument("--params", type=str, default="{}", help="JSON object mapping backend name to its tuning parameters")
+    args = parser.parse_args()
+
+    vectors, queries = make_dataset(args.size, args.dim, args.queries)
+    params = json.loads(args.params)
+
+    exact = run_benchmark("exact", vectors, queries, top_k=args.top_k)
+    exact["recall"] = 1.0
+    reports = [exact]
+    for backend in args.backends:
+        reports.append(run_benchmark(backend, vectors, queries, top_k=args.top_k, params=params.get(backend),
+                                     ground_truth=exact["results"]))
+
+    print(f"{args.size} vectors x {args.dim} dims, {args.queries} queries, top_k={args.top_k}")
+    print(f"{'backend':<12} {'build_s':>9} {'p50_ms':>9} {'p95_ms':>9} {'recall':>8}  params")
+    for report in reports:
+        print(f"{report['backend']:<12} {report['build_s']:>9} {report['p50_ms']:>9} {report['p95_ms']:>9} "
+              f"{report['recall']:>8}  {report['params']}")
+
+
+if __name__ == "__main__":
+    main()
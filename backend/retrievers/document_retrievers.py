@@ -1,10 +1,17 @@
 import os
+import re
 import json
+import math
+import time
+import heapq
 import logging
-from typing import List, Dict, Any, Optional, Union
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from backend.agents.retrievers.embedding_utils import embed_text, calculate_similarity
+from .embedding_utils import embed_text, batch_embed_texts
+from .vector_index import VectorIndex, create_index, to_unit_vector
 
 logger = logging.getLogger(__name__)
 
@@ -48,8 +55,17 @@ class DocumentRetriever:
         """
         start_idx = len(self.documents)
         self.documents.extend(documents)
-        for i in range(start_idx, len(self.documents)):
-            self._index_document(i)
+        self._index_documents(list(range(start_idx, len(self.documents))))
+    
+    def _index_documents(self, doc_indices: List[int]):
+        """
+        Index several documents at once. Subclasses can override this to batch work.
+        
+        Args:
+            doc_indices: Indices of the documents in the documents list
+        """
+        for doc_idx in doc_indices:
+            self._index_document(doc_idx)
     
     def _index_document(self, doc_idx: int):
         """
@@ -60,13 +76,15 @@ class DocumentRetriever:
         """
         pass
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def retrieve(self, query: str, top_k: int = 5,
+                 doc_indices: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents for a query (to be implemented by subclasses).
         
         Args:
             query: The search query
             top_k: Number of top results to return
+            doc_indices: Optional document indices to restrict the search to (pre-filtering)
             
         Returns:
             List of the top k relevant documents
@@ -84,8 +102,15 @@ class DocumentRetriever:
             "documents": self.documents,
             "index": self.document_index
         }
-        with open(path, 'w') as f:
-            json.dump(save_data, f)
+        self._write_json(path, save_data)
+    
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        """Write compact JSON atomically, so a crash never leaves a half-written index."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
     
     def load_index(self, path: str):
         """
@@ -103,17 +128,37 @@ class DocumentRetriever:
 class SemanticRetriever(DocumentRetriever):
     """Document retriever using semantic similarity for retrieval."""
     
-    def __init__(self, index_path: Optional[str] = None, embedding_model: str = "openai"):
+    def __init__(self, index_path: Optional[str] = None, embedding_model: str = "openai",
+                 index_backend: str = "exact", index_params: Optional[Dict[str, Any]] = None,
+                 embed_batch_size: Optional[int] = None, embed_concurrency: Optional[int] = None):
         """
         Initialize the semantic retriever.
         
+        Embeddings are L2-normalized on insert and stored in a vector index, so
+        cosine similarity is an inner product. The default "exact" backend scores
+        every document with one matrix-vector product; "ivf" and "hnsw" are
+        approximate indexes for large corpora (see vector_index.py).
+        
         Args:
             index_path: Optional path to a pre-built index file
             embedding_model: Model to use for embeddings (default: openai)
+            index_backend: Vector index backend ("exact", "ivf" or "hnsw")
+            index_params: Optional tuning parameters for the index backend (e.g. nprobe, ef_search)
+            embed_batch_size: Texts per embedding request in add_documents (default: EMBEDDING_BATCH_SIZE)
+            embed_concurrency: Embedding requests in flight in add_documents (default: EMBEDDING_MAX_CONCURRENCY)
         """
-        super().__init__(index_path)
         self.embedding_model = embedding_model
-        self.embeddings = []
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+        self.index_backend = index_backend
+        self.index_params = index_params or {}
+        self.index: VectorIndex = create_index(index_backend, **self.index_params)
+        super().__init__(index_path)
+    
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Normalized embedding matrix, one row per document."""
+        return self.index.vectors
     
     def _index_document(self, doc_idx: int):
         """
@@ -124,137 +169,460 @@ class SemanticRetriever(DocumentRetriever):
         """
         document = self.documents[doc_idx]
         embedding = embed_text(document["content"], model=self.embedding_model)
-        
-        if len(self.embeddings) <= doc_idx:
-            self.embeddings.append(embedding)
-        else:
-            self.embeddings[doc_idx] = embedding
+        self.index.add(doc_idx, to_unit_vector(embedding, self.index.dim))
         
         # Update the document index with the position of the embedding
         self.document_index[document["id"]] = doc_idx
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def _index_documents(self, doc_indices: List[int]):
+        """
+        Index documents with batched embedding requests instead of one request per document.
+        
+        Args:
+            doc_indices: Indices of the documents in the documents list
+        """
+        if not doc_indices:
+            return
+        
+        contents = [self.documents[doc_idx]["content"] for doc_idx in doc_indices]
+        embeddings = batch_embed_texts(contents, model=self.embedding_model, batch_size=self.embed_batch_size,
+                                       max_concurrency=self.embed_concurrency)
+        
+        for doc_idx, embedding in zip(doc_indices, embeddings):
+            self.index.add(doc_idx, to_unit_vector(embedding, self.index.dim))
+            self.document_index[self.documents[doc_idx]["id"]] = doc_idx
+    
+    @staticmethod
+    def vectors_path(path: str) -> str:
+        """Path of the vector file that accompanies the document table at `path`."""
+        return path + ".vectors.npy"
+    
+    def save_index(self, path: str):
+        """
+        Save the index as a compact JSON document table plus a float32 .npy vector file.
+        
+        Args:
+            path: Path to save the document table; vectors go to `vectors_path(path)`
+        """
+        vectors = np.ascontiguousarray(self.embeddings, dtype=np.float32)
+        vectors_path = self.vectors_path(path)
+        tmp_path = vectors_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, vectors)
+        os.replace(tmp_path, vectors_path)
+        
+        self._write_json(path, {
+            "documents": self.documents,
+            "index": self.document_index,
+            "embedding_model": self.embedding_model,
+            "vectors_file": os.path.basename(vectors_path),
+            "count": int(vectors.shape[0]),
+        })
+    
+    def load_index(self, path: str):
+        """
+        Load an index saved with `save_index`.
+        
+        Vectors are memory-mapped read-only, so loading takes constant time and
+        worker processes loading the same file share its pages. Documents without
+        a stored vector (older JSON-only indexes, or a different embedding model)
+        are re-embedded.
+        
+        Args:
+            path: Path to the document table
+        """
+        with open(path, 'r') as f:
+            data = json.load(f)
+        self.documents = data.get("documents", [])
+        self.document_index = data.get("index", {})
+        
+        vectors = None
+        vectors_path = self.vectors_path(path)
+        saved_model = data.get("embedding_model", self.embedding_model)
+        if saved_model != self.embedding_model:
+            logger.warning(f"Index {path} was built with '{saved_model}' embeddings; re-embedding with '{self.embedding_model}'")
+        elif os.path.exists(vectors_path):
+            vectors = np.load(vectors_path, mmap_mode="r")
+            if vectors.ndim != 2 or vectors.shape[0] > len(self.documents):
+                logger.warning(f"Ignoring vector file {vectors_path} that does not match the document table")
+                vectors = None
+        
+        start_idx = 0
+        if vectors is not None and vectors.shape[0] > 0:
+            self.index.load_vectors(vectors)
+            start_idx = vectors.shape[0]
+        self._index_documents(list(range(start_idx, len(self.documents))))
+    
+    def retrieve(self, query: str, top_k: int = 5,
+                 doc_indices: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents using semantic similarity.
         
         Args:
             query: The search query
             top_k: Number of top results to return
+            doc_indices: Optional document indices to restrict the search to (pre-filtering)
             
         Returns:
             List of the top k semantically similar documents
         """
-        if not self.documents:
+        if not self.documents or len(self.index) == 0 or top_k <= 0:
             return []
         
-        query_embedding = embed_text(query, model=self.embedding_model)
-        
-        # Calculate similarities
-        similarities = []
-        for doc_embedding in self.embeddings:
-            similarity = calculate_similarity(query_embedding, doc_embedding)
-            similarities.append(similarity)
-        
-        # Get top k indices
-        if len(similarities) <= top_k:
-            top_indices = list(range(len(similarities)))
+        query_vector = to_unit_vector(embed_text(query, model=self.embedding_model), self.index.dim)
+        if doc_indices is None:
+            top_indices, similarities = self.index.search(query_vector, top_k=top_k)
         else:
-            top_indices = np.argsort(similarities)[-top_k:][::-1]
+            top_indices, similarities = self.index.search_subset(query_vector, doc_indices, top_k=top_k)
         
         # Return top k documents with their similarity scores
         results = []
-        for idx in top_indices:
+        for idx, score in zip(top_indices, similarities):
             doc = self.documents[idx]
             results.append({
                 "id": doc["id"],
                 "content": doc["content"],
                 "metadata": doc.get("metadata", {}),
-                "score": similarities[idx]
+                "score": float(score)
             })
         
         return results
 
 
 class KeywordRetriever(DocumentRetriever):
-    """Document retriever using keyword-based search."""
+    """Document retriever using keyword-based search, ranked with BM25."""
     
-    def __init__(self, index_path: Optional[str] = None, case_sensitive: bool = False):
+    # Runs of letters and digits; punctuation and underscores separate tokens
+    TOKEN_PATTERN = re.compile(r"[^\W_]+")
+    
+    def __init__(self, index_path: Optional[str] = None, case_sensitive: bool = False,
+                 k1: float = 1.5, b: float = 0.75):
         """
         Initialize the keyword retriever.
         
+        The inverted index maps each term to two parallel int arrays (document
+        indices and term frequencies). Documents are appended in increasing index
+        order, so postings never need a membership check.
+        
         Args:
             index_path: Optional path to a pre-built index file
             case_sensitive: Whether to perform case-sensitive indexing and retrieval
+            k1: BM25 term-frequency saturation
+            b: BM25 document-length normalization
         """
-        super().__init__(index_path)
         self.case_sensitive = case_sensitive
-        self.keyword_index = {}  # Maps keywords to document indices
+        self.k1 = k1
+        self.b = b
+        self.keyword_index: Dict[str, Tuple[array, array]] = {}  # term -> (doc indices, term frequencies)
+        self.doc_lengths = array("i")
+        self.total_length = 0
+        super().__init__(index_path)
+    
+    def tokenize(self, text: str) -> List[str]:
+        """Split text into terms."""
+        if not self.case_sensitive:
+            text = text.lower()
+        return self.TOKEN_PATTERN.findall(text)
     
     def _index_document(self, doc_idx: int):
         """
-        Index a document by extracting keywords.
+        Index a document by adding its terms to the postings.
         
         Args:
             doc_idx: Index of the document in the documents list
         """
         document = self.documents[doc_idx]
-        content = document["content"]
-        
-        if not self.case_sensitive:
-            content = content.lower()
+        terms = self.tokenize(document["content"])
         
-        # Simple tokenization - split by whitespace and punctuation
-        words = ''.join(c if c.isalnum() else ' ' for c in content).split()
+        # Documents are indexed in order; pad lengths if an index was skipped
+        while len(self.doc_lengths) < doc_idx:
+            self.doc_lengths.append(0)
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
         
-        # Add document to the keyword index
-        for word in words:
-            if word not in self.keyword_index:
-                self.keyword_index[word] = []
-            if doc_idx not in self.keyword_index[word]:
-                self.keyword_index[word].append(doc_idx)
+        for term, frequency in Counter(terms).items():
+            postings = self.keyword_index.get(term)
+            if postings is None:
+                postings = self.keyword_index[term] = (array("i"), array("i"))
+            postings[0].append(doc_idx)
+            postings[1].append(frequency)
         
         # Update the document index
         self.document_index[document["id"]] = doc_idx
     
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def load_index(self, path: str):
+        """
+        Load the document table and rebuild the inverted index from it.
+        
+        Args:
+            path: Path to the index file
+        """
+        super().load_index(path)
+        self.keyword_index = {}
+        self.doc_lengths = array("i")
+        self.total_length = 0
+        self._index_documents(list(range(len(self.documents))))
+    
+    def retrieve(self, query: str, top_k: int = 5,
+                 doc_indices: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
         """
-        Retrieve relevant documents using keyword matching.
+        Retrieve relevant documents ranked by BM25.
         
         Args:
             query: The search query
             top_k: Number of top results to return
+            doc_indices: Optional document indices to restrict the search to (pre-filtering)
             
         Returns:
             List of the top k documents matching the keywords in the query
         """
-        if not self.documents:
+        num_docs = len(self.doc_lengths)
+        if not self.documents or num_docs == 0 or top_k <= 0:
             return []
         
-        if not self.case_sensitive:
-            query = query.lower()
-        
-        # Split query into keywords
-        query_words = ''.join(c if c.isalnum() else ' ' for c in query).split()
+        query_terms = [term for term in dict.fromkeys(self.tokenize(query)) if term in self.keyword_index]
+        if not query_terms:
+            return []
         
-        # Count occurrences of each document
-        doc_counts = {}
-        for word in query_words:
-            if word in self.keyword_index:
-                for doc_idx in self.keyword_index[word]:
-                    doc_counts[doc_idx] = doc_counts.get(doc_idx, 0) + 1
+        # Views over private copies (array slices, taken atomically), never over the live
+        # arrays: a view exports the buffer, and an add_document running meanwhile could
+        # not append to it (BufferError)
+        doc_lengths = np.frombuffer(self.doc_lengths[:num_docs], dtype=np.intc)
+        avg_length = max(self.total_length / num_docs, 1e-9)
+        scores = np.zeros(num_docs, dtype=np.float64)
+        for term in query_terms:
+            posting_docs, frequencies = self.keyword_index[term]
+            # Frequencies are appended after doc indices, so they never run ahead of them;
+            # documents added after num_docs was read are left out
+            tf = np.frombuffer(frequencies[:], dtype=np.intc).astype(np.float64)
+            docs = np.frombuffer(posting_docs[:len(tf)], dtype=np.intc)
+            in_range = docs < num_docs
+            if not in_range.all():
+                docs, tf = docs[in_range], tf[in_range]
+            idf = math.log(1.0 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[docs] / avg_length)
+            scores[docs] += idf * tf * (self.k1 + 1.0) / (tf + norm)
         
-        # Sort documents by their keyword match count
-        sorted_docs = sorted(doc_counts.items(), key=lambda x: x[1], reverse=True)
+        # Heap selection over the matching documents only
+        if doc_indices is None:
+            candidates = np.flatnonzero(scores)
+        else:
+            candidates = np.asarray(doc_indices, dtype=np.int64)
+            candidates = candidates[candidates < num_docs]
+            candidates = candidates[scores[candidates] > 0]
+        top_indices = heapq.nlargest(top_k, candidates.tolist(), key=scores.__getitem__)
         
-        # Get top k results
         results = []
-        for doc_idx, count in sorted_docs[:top_k]:
+        for doc_idx in top_indices:
             doc = self.documents[doc_idx]
             results.append({
                 "id": doc["id"],
                 "content": doc["content"],
                 "metadata": doc.get("metadata", {}),
-                "score": count / len(query_words)  # Normalize score
+                "score": float(scores[doc_idx])
+            })
+        
+        return results
+
+
+class HybridRetriever(DocumentRetriever):
+    """
+    Document retriever combining BM25 keyword search and vector search.
+    
+    Both indexes are queried in parallel and their rankings fused, either with
+    reciprocal-rank fusion ("rrf") or a weighted sum of min-max normalized
+    scores ("weighted"). Exact tokens (e.g. `KeyError: 'price'`) are found by the
+    keyword side, paraphrases by the semantic side.
+    """
+    
+    FUSION_METHODS = ("rrf", "weighted")
+    
+    def __init__(self, index_path: Optional[str] = None, embedding_model: str = "openai",
+                 index_backend: str = "exact", index_params: Optional[Dict[str, Any]] = None,
+                 fusion: str = "rrf", rrf_k: int = 60, semantic_weight: float = 0.5,
+                 candidate_multiplier: int = 4, case_sensitive: bool = False):
+        """
+        Initialize the hybrid retriever.
+        
+        Args:
+            index_path: Optional path to a pre-built index file (as written by SemanticRetriever)
+            embedding_model: Model to use for embeddings (default: openai)
+            index_backend: Vector index backend ("exact", "ivf" or "hnsw")
+            index_params: Optional tuning parameters for the index backend
+            fusion: Fusion method, "rrf" or "weighted"
+            rrf_k: RRF rank constant; larger values flatten the contribution of top ranks
+            semantic_weight: Weight of the semantic score with weighted fusion (keyword gets the rest)
+            candidate_multiplier: Each stage retrieves top_k * candidate_multiplier candidates
+            case_sensitive: Whether keyword matching is case-sensitive
+        """
+        if fusion not in self.FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method: {fusion}. Options: {', '.join(self.FUSION_METHODS)}")
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.semantic_weight = semantic_weight
+        self.candidate_multiplier = candidate_multiplier
+        self.semantic = SemanticRetriever(embedding_model=embedding_model, index_backend=index_backend,
+                                          index_params=index_params)
+        self.keyword = KeywordRetriever(case_sensitive=case_sensitive)
+        self.last_timings: Dict[str, float] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        super().__init__(index_path)
+    
+    # Both sub-retrievers index the same documents in the same order, so the
+    # document list and id map are the semantic retriever's.
+    @property
+    def documents(self) -> List[Dict[str, Any]]:
+        return self.semantic.documents
+    
+    @documents.setter
+    def documents(self, value: List[Dict[str, Any]]):
+        self.semantic.documents = value
+    
+    @property
+    def document_index(self) -> Dict[str, int]:
+        return self.semantic.document_index
+    
+    @document_index.setter
+    def document_index(self, value: Dict[str, int]):
+        self.semantic.document_index = value
+    
+    def add_document(self, doc_id: str, content: str, metadata: Dict[str, Any] = None):
+        self.semantic.add_document(doc_id, content, metadata)
+        self.keyword.add_document(doc_id, content, metadata)
+    
+    def add_documents(self, documents: List[Dict[str, Any]]):
+        self.semantic.add_documents(documents)
+        self.keyword.add_documents(documents)
+    
+    def save_index(self, path: str):
+        self.semantic.save_index(path)
+    
+    def load_index(self, path: str):
+        self.semantic.load_index(path)
+        self.keyword.documents = []
+        self.keyword.document_index = {}
+        self.keyword.keyword_index = {}
+        self.keyword.doc_lengths = array("i")
+        self.keyword.total_length = 0
+        self.keyword.add_documents(self.semantic.documents)
+    
+    def _timed_retrieve(self, retriever: DocumentRetriever, query: str, top_k: int,
+                        doc_indices: Optional[Sequence[int]] = None):
+        start = time.perf_counter()
+        results = retriever.retrieve(query, top_k=top_k, doc_indices=doc_indices)
+        return results, (time.perf_counter() - start) * 1000
+    
+    @staticmethod
+    def _normalized_scores(results: List[Dict[str, Any]]) -> Dict[str, float]:
+        if not results:
+            return {}
+        scores = [result["score"] for result in results]
+        low, high = min(scores), max(scores)
+        span = high - low
+        return {result["id"]: (result["score"] - low) / span if span > 0 else 1.0 for result in results}
+    
+    def _fuse(self, semantic_results: List[Dict[str, Any]],
+              keyword_results: List[Dict[str, Any]]) -> Dict[str, float]:
+        fused: Dict[str, float] = {}
+        if self.fusion == "rrf":
+            for results in (semantic_results, keyword_results):
+                for rank, result in enumerate(results):
+                    fused[result["id"]] = fused.get(result["id"], 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        else:
+            for weight, results in ((self.semantic_weight, semantic_results),
+                                    (1.0 - self.semantic_weight, keyword_results)):
+                for doc_id, score in self._normalized_scores(results).items():
+                    fused[doc_id] = fused.get(doc_id, 0.0) + weight * score
+        return fused
+    
+    def retrieve_with_timings(self, query: str, top_k: int = 5, doc_indices: Optional[Sequence[int]] = None):
+        """
+        Retrieve documents and report how long each stage took.
+        
+        Args:
+            query: The search query
+            top_k: Number of top results to return
+            doc_indices: Optional document indices to restrict the search to (pre-filtering)
+            
+        Returns:
+            Tuple of (results, timings) where timings has semantic_ms, keyword_ms, fusion_ms and total_ms
+        """
+        start = time.perf_counter()
+        if not self.documents or top_k <= 0:
+            return [], {"semantic_ms": 0.0, "keyword_ms": 0.0, "fusion_ms": 0.0, "total_ms": 0.0}
+        
+        candidate_k = top_k * self.candidate_multiplier
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-retriever")
+        semantic_future = self._executor.submit(self._timed_retrieve, self.semantic, query, candidate_k, doc_indices)
+        keyword_results, keyword_ms = self._timed_retrieve(self.keyword, query, candidate_k, doc_indices)
+        semantic_results, semantic_ms = semantic_future.result()
+        
+        fusion_start = time.perf_counter()
+        fused = self._fuse(semantic_results, keyword_results)
+        semantic_scores = {result["id"]: result["score"] for result in semantic_results}
+        keyword_scores = {result["id"]: result["score"] for result in keyword_results}
+        
+        results = []
+        for doc_id in heapq.nlargest(top_k, fused, key=fused.get):
+            doc = self.documents[self.document_index[doc_id]]
+            results.append({
+                "id": doc["id"],
+                "content": doc["content"],
+                "metadata": doc.get("metadata", {}),
+                "score": fused[doc_id],
+                "semantic_score": semantic_scores.get(doc_id),
+                "keyword_score": keyword_scores.get(doc_id)
             })
         
-        return results 
\ No newline at end of file
+        timings = {
+            "semantic_ms": round(semantic_ms, 3),
+            "keyword_ms": round(keyword_ms, 3),
+            "fusion_ms": round((time.perf_counter() - fusion_start) * 1000, 3),
+            "total_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+        logger.debug(f"Hybrid retrieval timings: {timings}")
+        return results, timings
+    
+    def retrieve(self, query: str, top_k: int = 5,
+                 doc_indices: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Retrieve relevant documents by fusing keyword and semantic rankings.
+        
+        Per-stage latencies of the call are kept in `last_timings`.
+        
+        Args:
+            query: The search query
+            top_k: Number of top results to return
+            doc_indices: Optional document indices to restrict the search to (pre-filtering)
+            
+        Returns:
+            List of the top k documents with fused scores
+        """
+        results, self.last_timings = self.retrieve_with_timings(query, top_k=top_k, doc_indices=doc_indices)
+        return results
+
+
+RETRIEVAL_MODES = ("semantic", "keyword", "hybrid")
+
+
+def create_retriever(retrieval_mode: str = "semantic", index_backend: str = "exact",
+                     index_params: Optional[Dict[str, Any]] = None) -> DocumentRetriever:
+    """
+    Create a retriever for the given retrieval mode.
+    
+    Args:
+        retrieval_mode: One of "semantic", "keyword" or "hybrid"
+        index_backend: Vector index backend for the semantic and hybrid modes
+        index_params: Optional tuning parameters for the index backend
+        
+    Returns:
+        A DocumentRetriever instance
+    """
+    if retrieval_mode == "keyword":
+        return KeywordRetriever()
+    if retrieval_mode == "hybrid":
+        return HybridRetriever(index_backend=index_backend, index_params=index_params)
+    if retrieval_mode != "semantic":
+        logger.warning(f"Unknown retrieval mode: {retrieval_mode}, falling back to semantic retrieval")
+    return SemanticRetriever(index_backend=index_backend, index_params=index_params)
@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Cache settings
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EMBEDDING_CACHE_DIR = os.environ.get(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/embedding_cache")
+)
+EMBEDDING_CACHE_MAX_MB = float(os.environ.get("EMBEDDING_CACHE_MAX_MB", "512"))
+
+_DIGEST_SIZE = 16
+
+
+def text_digest(model: str, text: str) -> bytes:
+    """Cache key for a text embedded with a given model."""
+    return hashlib.blake2b(f"{model}\0{text}".encode("utf-8"), digest_size=_DIGEST_SIZE).digest()
+
+
+class _ModelStore:
+    """
+    Append-only vector store for one embedding model.
+
+    Three files share a prefix: `.keys` holds 16-byte digests back to back,
+    `.f32` holds float32 vectors back to back (read through a memmap) and
+    `.meta.json` records the dimension. Row i of both files belongs together.
+    Appends, truncation and compaction hold an exclusive lock on `.lock`, so
+    several worker processes can share the directory.
+    """
+
+    def __init__(self, prefix: str):
+        self.keys_path = prefix + ".keys"
+        self.vectors_path = prefix + ".f32"
+        self.meta_path = prefix + ".meta.json"
+        self.lock_path = prefix + ".lock"
+        self.dim: Optional[int] = None
+        self.rows: "OrderedDict[bytes, int]" = OrderedDict()  # digest -> row, least recently used first
+        self._next_row = 0
+        self._file_id: Optional[tuple] = None
+        self._mmap: Optional[np.memmap] = None
+        self._mapped_rows = 0
+        self._load()
+
+    @property
+    def total_rows(self) -> int:
+        return self._next_row
+
+    @property
+    def size_bytes(self) -> int:
+        return self.total_rows * ((self.dim or 0) * 4 + _DIGEST_SIZE)
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        """
+        Lock on the store's files, across processes (callers serialize threads): exclusive
+        for writers, shared for readers.
+        """
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _vectors_file_id(self) -> Optional[tuple]:
+        """Identity of the vector file; it changes when a compaction replaces the file."""
+        try:
+            stat = os.stat(self.vectors_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _load(self):
+        try:
+            with self._locked():
+                self._read_files()
+        except Exception as e:
+            logger.error(f"Error loading embedding cache {self.meta_path}, starting empty: {str(e)}")
+            self.dim = None
+            self.rows = OrderedDict()
+            self._next_row = 0
+
+    def _read_files(self):
+        """(Re)load the keys from disk. Must be called with the lock held."""
+        self.dim = None
+        self.rows = OrderedDict()
+        self._next_row = 0
+        self._mmap = None
+        self._mapped_rows = 0
+        self._file_id = self._vectors_file_id()
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, "r") as f:
+            self.dim = int(json.load(f)["dim"])
+        num_rows = self._sync_rows()
+        with open(self.keys_path, "rb") as f:
+            keys = f.read(num_rows * _DIGEST_SIZE)
+        for row in range(num_rows):
+            self.rows[keys[row * _DIGEST_SIZE:(row + 1) * _DIGEST_SIZE]] = row
+        self._next_row = num_rows
+
+    def _sync_rows(self) -> int:
+        """
+        Number of complete rows on disk. A crash between the two appends leaves the
+        files uneven; both are cut back to the rows they agree on, so the next
+        append lands on the same row in each. Must be called with the lock held.
+        """
+        key_bytes = os.path.getsize(self.keys_path) if os.path.exists(self.keys_path) else 0
+        vector_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        row_size = self.dim * 4
+        num_rows = min(key_bytes // _DIGEST_SIZE, vector_bytes // row_size)
+        for path, size, expected in ((self.keys_path, key_bytes, num_rows * _DIGEST_SIZE),
+                                     (self.vectors_path, vector_bytes, num_rows * row_size)):
+            if size > expected:
+                logger.warning(f"Truncating {path} from {size} to {expected} bytes (uneven embedding cache files)")
+                os.truncate(path, expected)
+        return num_rows
+
+    def _remap(self):
+        num_rows = self.total_rows
+        self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(num_rows, self.dim)) \
+            if num_rows else None
+        self._mapped_rows = num_rows
+
+    def get_many(self, digests: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        Vectors for `digests` (None for misses), read under the shared lock. A lookup
+        that fails (e.g. the files changed under an older mapping) is a miss too.
+        """
+        vectors: List[Optional[np.ndarray]] = [None] * len(digests)
+        if not any(digest in self.rows for digest in digests):
+            return vectors
+        try:
+            with self._locked(shared=True):
+                for i, digest in enumerate(digests):
+                    try:
+                        vectors[i] = self._read_row(digest)
+                    except Exception as e:
+                        logger.debug(f"Embedding cache lookup failed in {self.vectors_path}, treating as a miss: {str(e)}")
+        except Exception as e:
+            logger.debug(f"Could not lock embedding cache {self.lock_path}, treating as a miss: {str(e)}")
+        return vectors
+
+    def _read_row(self, digest: bytes) -> Optional[np.ndarray]:
+        """Must be called with the lock held."""
+        row = self.rows.get(digest)
+        if row is None:
+            return None
+        if row >= self._mapped_rows:
+            if self._vectors_file_id() != self._file_id:
+                # Another process compacted the files: the known rows are stale. Writers hold
+                # the lock exclusively, so any trim `_read_files` does here is crash recovery.
+                self._read_files()
+                row = self.rows.get(digest)
+                if row is None:
+                    return None
+            self._remap()
+        vector = np.array(self._mmap[row])
+        self.rows.move_to_end(digest)
+        return vector
+
+    def put_many(self, digests: List[bytes], vectors: np.ndarray):
+        with self._locked():
+            if self._vectors_file_id() != self._file_id:
+                # Created or compacted by another process since it was loaded
+                self._read_files()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            if vectors.shape[1] != self.dim:
+                logger.warning(f"Not caching embeddings of dimension {vectors.shape[1]} (cache dimension {self.dim})")
+                return
+
+            # Rows are appended even for digests already present; the newest row wins.
+            # Rows appended by other processes are skipped, not indexed.
+            start_row = self._sync_rows()
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(digests))
+            self._file_id = self._vectors_file_id()
+        for offset, digest in enumerate(digests):
+            self.rows[digest] = start_row + offset
+            self.rows.move_to_end(digest)
+        self._next_row = start_row + len(digests)
+
+    def compact(self, max_bytes: int):
+        """Rewrite the files keeping the most recently used rows that fit in `max_bytes`."""
+        with self._locked():
+            if self._vectors_file_id() != self._file_id:
+                # Another process already compacted the files
+                self._read_files()
+                return
+            row_bytes = self.dim * 4 + _DIGEST_SIZE
+            keep = list(self.rows.items())[-max(0, max_bytes // row_bytes):] if max_bytes >= row_bytes else []
+            if self._mapped_rows < self.total_rows:
+                self._remap()
+            source = self._mmap
+
+            vectors = np.empty((len(keep), self.dim), dtype=np.float32)
+            for new_row, (_, old_row) in enumerate(keep):
+                vectors[new_row] = source[old_row]
+            self._mmap = None
+            self._mapped_rows = 0
+
+            # Empty the key file first: a crash between the two replaces then leaves an empty
+            # store instead of old keys pointing into the new vectors
+            os.truncate(self.keys_path, 0)
+            for path, payload in ((self.vectors_path, vectors.tobytes()),
+                                  (self.keys_path, b"".join(digest for digest, _ in keep))):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            self._file_id = self._vectors_file_id()
+
+        self.rows = OrderedDict((digest, new_row) for new_row, (digest, _) in enumerate(keep))
+        self._next_row = len(keep)
+        logger.info(f"Compacted embedding cache {self.vectors_path} to {len(keep)} entries")
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embeddings keyed by (model, text hash).
+
+    Lookups go through a read-only memmap, so loading a cache of any size only
+    reads the key file. When a model's files grow beyond `max_bytes` they are
+    compacted, keeping the most recently used entries (least recently used are
+    evicted first).
+    """
+
+    def __init__(self, cache_dir: str = EMBEDDING_CACHE_DIR, max_mb: float = EMBEDDING_CACHE_MAX_MB):
+        """
+        Initialize the embedding cache.
+
+        Args:
+            cache_dir: Directory holding the cache files
+            max_mb: Size limit per model, in megabytes
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._stores: Dict[str, _ModelStore] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _store(self, model: str) -> _ModelStore:
+        store = self._stores.get(model)
+        if store is None:
+            safe_name = re.sub(r"[^\w.-]", "_", model)
+            store = self._stores[model] = _ModelStore(os.path.join(self.cache_dir, safe_name))
+        return store
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Return the cached embedding for `text`, or None on a miss."""
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return cached embeddings for `texts`, with None for every miss."""
+        with self._lock:
+            vectors = self._store(model).get_many([text_digest(model, text) for text in texts])
+        return [None if vector is None else vector.tolist() for vector in vectors]
+
+    def put(self, model: str, text: str, embedding: Sequence[float]):
+        self.put_many(model, [text], [embedding])
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        """Add embeddings to the cache. Only cache results from the requested model, never fallbacks."""
+        if not texts:
+            return
+        try:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            with self._lock:
+                store = self._store(model)
+                store.put_many([text_digest(model, text) for text in texts], vectors)
+                if store.size_bytes > self.max_bytes:
+                    # Compact below the limit so the next few writes don't trigger it again
+                    store.compact(int(self.max_bytes * 0.75))
+        except Exception as e:
+            logger.error(f"Error writing to embedding cache: {str(e)}")
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide embedding cache, or None when disabled with EMBEDDING_CACHE_ENABLED=false."""
+    global _cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = EmbeddingCache()
+                except Exception as e:
+                    logger.error(f"Error creating embedding cache, continuing without it: {str(e)}")
+                    return None
+    return _cache
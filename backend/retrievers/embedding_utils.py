@@ -1,16 +1,41 @@
 import os
+import time
 import logging
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Union, Optional
 import json
 import requests
 from sklearn.metrics.pairwise import cosine_similarity
+from .embedding_cache import get_embedding_cache
+from .local_embeddings import LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_MODEL_DIR, get_local_embedding_engine
 
 logger = logging.getLogger(__name__)
 
 # Default OpenAI API key environment variable
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 
+# Batching settings for bulk embedding requests
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_MAX_CONCURRENCY = int(os.environ.get("EMBEDDING_MAX_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.environ.get("EMBEDDING_MAX_RETRIES", "3"))
+
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+# A local model directory is identified by its folder name
+HUGGINGFACE_EMBEDDING_MODEL = os.path.basename(LOCAL_EMBEDDING_MODEL_DIR.rstrip("/\\")) or LOCAL_EMBEDDING_MODEL
+
+# Cache namespace per embedding option. Local hash embeddings are cheap and never cached.
+_CACHE_NAMESPACES = {
+    "openai": f"openai-{OPENAI_EMBEDDING_MODEL}",
+    "huggingface": f"huggingface-{HUGGINGFACE_EMBEDDING_MODEL}",
+}
+
+def _cache_put(model: str, texts: List[str], embeddings: List[List[float]]):
+    """Store embeddings produced by `model` itself (callers never pass fallback results)."""
+    cache = get_embedding_cache()
+    if cache is not None and model in _CACHE_NAMESPACES:
+        cache.put_many(_CACHE_NAMESPACES[model], texts, embeddings)
+
 def embed_text(text: str, model: str = "openai") -> List[float]:
     """
     Generate embeddings for a text string.
@@ -22,6 +47,12 @@ def embed_text(text: str, model: str = "openai") -> List[float]:
     Returns:
         A list of float values representing the embedding
     """
+    cache = get_embedding_cache() if model in _CACHE_NAMESPACES else None
+    if cache is not None:
+        cached = cache.get(_CACHE_NAMESPACES[model], text)
+        if cached is not None:
+            return cached
+    
     if model == "openai":
         return _embed_openai(text)
     elif model == "huggingface":
@@ -52,21 +83,42 @@ def calculate_similarity(embedding1: List[float], embedding2: List[float]) -> fl
     
     return float(similarity)
 
-def batch_embed_texts(texts: List[str], model: str = "openai") -> List[List[float]]:
+def batch_embed_texts(texts: List[str], model: str = "openai", batch_size: Optional[int] = None,
+                      max_concurrency: Optional[int] = None) -> List[List[float]]:
     """
     Generate embeddings for multiple texts at once.
     
     Args:
         texts: List of text strings to embed
         model: The embedding model to use
+        batch_size: Texts per API request (default: EMBEDDING_BATCH_SIZE)
+        max_concurrency: Batches requested in parallel (default: EMBEDDING_MAX_CONCURRENCY)
         
     Returns:
-        List of embedding vectors
+        List of embedding vectors, in the same order as `texts`
     """
+    if not texts:
+        return []
+    
+    cache = get_embedding_cache() if model in _CACHE_NAMESPACES else None
+    if cache is None:
+        return _batch_embed_uncached(texts, model, batch_size, max_concurrency)
+    
+    # Only embed cache misses, and each distinct text once
+    embeddings = cache.get_many(_CACHE_NAMESPACES[model], texts)
+    missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+    if missing:
+        computed = dict(zip(missing, _batch_embed_uncached(missing, model, batch_size, max_concurrency)))
+        embeddings = [computed[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+    return embeddings
+
+def _batch_embed_uncached(texts: List[str], model: str, batch_size: Optional[int] = None,
+                          max_concurrency: Optional[int] = None) -> List[List[float]]:
+    """Dispatch a batch to the embedding backend without consulting the cache."""
     if model == "openai":
-        return _batch_embed_openai(texts)
+        return _batch_embed_openai(texts, batch_size=batch_size, max_concurrency=max_concurrency)
     elif model == "huggingface":
-        return [_embed_huggingface(text) for text in texts]
+        return _batch_embed_huggingface(texts)
     elif model == "local":
         return [_embed_local(text) for text in texts]
     else:
@@ -87,12 +139,13 @@ def _embed_openai(text: str) -> List[float]:
         # Make API request
         openai.api_key = api_key
         response = openai.embeddings.create(
-            model="text-embedding-3-small",
+            model=OPENAI_EMBEDDING_MODEL,
             input=text
         )
         
         # Extract embedding
         embedding = response.data[0].embedding
+        _cache_put("openai", [text], [embedding])
         return embedding
     
     except ImportError:
@@ -103,55 +156,95 @@ def _embed_openai(text: str) -> List[float]:
         logger.error(f"Error generating OpenAI embedding: {str(e)}")
         return _embed_local(text)
 
-def _batch_embed_openai(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings for multiple texts using OpenAI API."""
+def _request_openai_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Request embeddings for one batch from the OpenAI API.
+    
+    Unlike the public helpers this does not fall back: it raises on any failure,
+    including a response that does not cover every input.
+    """
+    import openai
+    
+    openai.api_key = OPENAI_API_KEY
+    response = openai.embeddings.create(
+        model=OPENAI_EMBEDDING_MODEL,
+        # The API rejects empty strings
+        input=[text if text.strip() else " " for text in texts]
+    )
+    
+    if len(response.data) != len(texts):
+        raise ValueError(f"OpenAI returned {len(response.data)} embeddings for {len(texts)} inputs")
+    
+    # Results carry their input position; don't rely on response order
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+def _embed_openai_batch_with_retry(texts: List[str], max_retries: int = EMBEDDING_MAX_RETRIES) -> List[List[float]]:
+    """Embed one batch, retrying with exponential backoff before falling back to local embeddings."""
+    for attempt in range(max_retries + 1):
+        try:
+            embeddings = _request_openai_embeddings(texts)
+            _cache_put("openai", texts, embeddings)
+            return embeddings
+        except Exception as e:
+            if attempt == max_retries:
+                logger.error(f"Error generating OpenAI embeddings for a batch of {len(texts)} texts "
+                             f"after {max_retries + 1} attempts: {str(e)}")
+                break
+            delay = 0.5 * (2 ** attempt)
+            logger.warning(f"OpenAI embedding batch failed ({str(e)}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+    
+    return [_embed_local(text) for text in texts]
+
+def _batch_embed_openai(texts: List[str], batch_size: Optional[int] = None,
+                        max_concurrency: Optional[int] = None) -> List[List[float]]:
+    """
+    Generate embeddings for multiple texts using OpenAI API.
+    
+    Texts are split into batches of `batch_size` requested concurrently. A batch that
+    still fails after retries falls back to local embeddings without affecting the others.
+    """
     try:
         import openai
-        
-        # Configure API key
-        api_key = OPENAI_API_KEY
-        if not api_key:
-            logger.error("OpenAI API key not found. Set the OPENAI_API_KEY environment variable.")
-            return [_embed_local(text) for text in texts]  # Fallback to local embedding
-        
-        # Make API request
-        openai.api_key = api_key
-        response = openai.embeddings.create(
-            model="text-embedding-3-small",
-            input=texts
-        )
-        
-        # Extract embeddings
-        embeddings = [item.embedding for item in response.data]
-        return embeddings
-    
     except ImportError:
         logger.warning("OpenAI package not installed. Please install with `pip install openai`")
         return [_embed_local(text) for text in texts]
     
-    except Exception as e:
-        logger.error(f"Error generating OpenAI embeddings: {str(e)}")
-        return [_embed_local(text) for text in texts]
+    # Configure API key
+    if not OPENAI_API_KEY:
+        logger.error("OpenAI API key not found. Set the OPENAI_API_KEY environment variable.")
+        return [_embed_local(text) for text in texts]  # Fallback to local embedding
+    
+    batch_size = max(1, batch_size or EMBEDDING_BATCH_SIZE)
+    max_concurrency = max(1, max_concurrency or EMBEDDING_MAX_CONCURRENCY)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    
+    if len(batches) == 1 or max_concurrency == 1:
+        results = [_embed_openai_batch_with_retry(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+            results = list(executor.map(_embed_openai_batch_with_retry, batches))
+    
+    return [embedding for batch in results for embedding in batch]
 
 def _embed_huggingface(text: str) -> List[float]:
     """Generate embeddings using Hugging Face models."""
+    return _batch_embed_huggingface([text])[0]
+
+def _batch_embed_huggingface(texts: List[str]) -> List[List[float]]:
+    """Generate embeddings for multiple texts with the shared local SentenceTransformer model."""
     try:
-        from sentence_transformers import SentenceTransformer
-        
-        # Load model (will be cached after first load)
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Generate embedding
-        embedding = model.encode(text).tolist()
-        return embedding
+        embeddings = get_local_embedding_engine().encode(texts)
+        _cache_put("huggingface", texts, embeddings)
+        return embeddings
     
     except ImportError:
         logger.warning("sentence-transformers package not installed. Please install with `pip install sentence-transformers`")
-        return _embed_local(text)
+        return [_embed_local(text) for text in texts]
     
     except Exception as e:
-        logger.error(f"Error generating Hugging Face embedding: {str(e)}")
-        return _embed_local(text)
+        logger.error(f"Error generating Hugging Face embeddings: {str(e)}")
+        return [_embed_local(text) for text in texts]
 
 def _embed_local(text: str) -> List[float]:
     """
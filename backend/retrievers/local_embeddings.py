@@ -0,0 +1,113 @@
+import os
+import logging
+import threading
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Local embedding settings
+LOCAL_EMBEDDING_MODEL = os.environ.get("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_MODEL_DIR = os.environ.get("LOCAL_EMBEDDING_MODEL_DIR", "")
+LOCAL_EMBEDDING_THREADS = int(os.environ.get("LOCAL_EMBEDDING_THREADS", "0"))  # 0 keeps the torch default
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.environ.get("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+LOCAL_EMBEDDING_DEVICE = os.environ.get("LOCAL_EMBEDDING_DEVICE", "cpu")
+
+
+class LocalEmbeddingEngine:
+    """
+    SentenceTransformer model loaded once and shared by the whole process.
+
+    The model is loaded on the first `encode` call. When `model_dir` points to a
+    directory (e.g. one written with `SentenceTransformer.save()`), the model is
+    loaded from it with the Hugging Face hub in offline mode, so no network
+    access is needed.
+    """
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL, model_dir: str = LOCAL_EMBEDDING_MODEL_DIR,
+                 num_threads: int = LOCAL_EMBEDDING_THREADS, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+                 device: str = LOCAL_EMBEDDING_DEVICE):
+        """
+        Initialize the engine (without loading the model).
+
+        Args:
+            model_name: Sentence-transformers model name, used when no local directory is given
+            model_dir: Optional local model directory for fully offline use
+            num_threads: CPU threads used by torch (0 keeps the default)
+            batch_size: Texts encoded per forward pass
+            device: Torch device to run on
+        """
+        self.model_name = model_name
+        self.model_dir = model_dir
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+        self._load_error: Optional[Exception] = None
+        self._load_lock = threading.Lock()
+        # Serializes forward passes; parallelism comes from torch's intra-op threads
+        self._encode_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def _load(self):
+        if self._model is not None:
+            return self._model
+        if self._load_error is not None:
+            # Don't retry a failed load on every call
+            raise self._load_error
+
+        with self._load_lock:
+            if self._model is not None:
+                return self._model
+            try:
+                if self.model_dir:
+                    if not os.path.isdir(self.model_dir):
+                        raise FileNotFoundError(f"Local embedding model directory not found: {self.model_dir}")
+                    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+                    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+                from sentence_transformers import SentenceTransformer
+
+                if self.num_threads > 0:
+                    import torch
+                    torch.set_num_threads(self.num_threads)
+
+                source = self.model_dir or self.model_name
+                self._model = SentenceTransformer(source, device=self.device)
+                logger.info(f"Loaded local embedding model from {source}")
+            except Exception as e:
+                self._load_error = e
+                raise
+        return self._model
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """
+        Encode texts in batches.
+
+        Raises:
+            ImportError: If sentence-transformers is not installed
+            Exception: If the model cannot be loaded or encoding fails
+        """
+        if not texts:
+            return []
+        model = self._load()
+        with self._encode_lock:
+            embeddings = model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                      show_progress_bar=False)
+        return embeddings.tolist()
+
+
+_engine: Optional[LocalEmbeddingEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_local_embedding_engine() -> LocalEmbeddingEngine:
+    """Process-wide local embedding engine, created on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = LocalEmbeddingEngine()
+    return _engine
@@ -0,0 +1,360 @@
+import logging
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def to_unit_vector(embedding, dim: Optional[int] = None) -> np.ndarray:
+    """
+    Convert an embedding to a normalized float32 vector.
+
+    Args:
+        embedding: Embedding values (list or array)
+        dim: Optional target dimension; shorter vectors are zero-padded and longer ones truncated
+
+    Returns:
+        A 1-D float32 array with unit L2 norm (or all zeros)
+    """
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    if dim is not None and vector.shape[0] != dim:
+        # Happens when an embedding call fell back to a different model
+        logger.warning(f"Embedding dimension {vector.shape[0]} does not match index dimension {dim}; resizing")
+        vector = np.pad(vector, (0, dim - vector.shape[0])) if vector.shape[0] < dim else vector[:dim]
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector = vector / norm
+    return vector
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Positions of the `top_k` highest scores, best first."""
+    if scores.shape[0] <= top_k:
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class VectorIndex:
+    """
+    Base class for vector indexes over unit-normalized embeddings.
+
+    Vectors are addressed by integer ids (the document position in the owning
+    retriever) and scored by inner product, i.e. cosine similarity.
+    """
+
+    def __init__(self):
+        self._matrix: Optional[np.ndarray] = None  # (capacity, dim), rows [0, _size) are valid
+        self._size = 0
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Stored vectors, one row per id."""
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._matrix[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _store(self, vector_id: int, vector: np.ndarray):
+        """Store a vector at row `vector_id`, growing the matrix geometrically."""
+        if self._matrix is None:
+            self._matrix = np.zeros((max(16, vector_id + 1), vector.shape[0]), dtype=np.float32)
+        elif vector_id >= self._matrix.shape[0] or not self._matrix.flags.writeable:
+            # Also copies a read-only memmap (see load_vectors) before its first write
+            capacity = max(vector_id + 1, self._matrix.shape[0] * 2)
+            grown = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[vector_id] = vector
+        self._size = max(self._size, vector_id + 1)
+
+    def load_vectors(self, vectors: np.ndarray):
+        """
+        Replace the index contents with `vectors` (row i gets id i).
+
+        The array is used as-is, so a read-only memmap stays shared with other
+        processes until the first insert copies it.
+
+        Args:
+            vectors: Unit-normalized float32 matrix, one row per id
+        """
+        self._matrix = vectors
+        self._size = vectors.shape[0]
+
+    def add(self, vector_id: int, vector: np.ndarray):
+        """
+        Insert (or replace) a normalized vector.
+
+        Args:
+            vector_id: Integer id of the vector
+            vector: Unit-normalized float32 vector of the index dimension
+        """
+        raise NotImplementedError("Subclasses must implement add method")
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the vectors most similar to a normalized query.
+
+        Args:
+            query: Unit-normalized float32 query vector
+            top_k: Number of results to return
+
+        Returns:
+            Tuple of (ids, scores), best first
+        """
+        raise NotImplementedError("Subclasses must implement search method")
+
+    def search_subset(self, query: np.ndarray, ids: Sequence[int], top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact search restricted to the given ids (used for metadata pre-filtering).
+
+        Args:
+            query: Unit-normalized float32 query vector
+            ids: Ids of the vectors eligible for the result
+            top_k: Number of results to return
+
+        Returns:
+            Tuple of (ids, scores), best first
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[ids < self._size]
+        if ids.size == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self._matrix[ids] @ query
+        best = _top_k(scores, top_k)
+        return ids[best], scores[best]
+
+
+class ExactIndex(VectorIndex):
+    """Brute-force index: one matrix-vector product over every stored vector."""
+
+    def add(self, vector_id: int, vector: np.ndarray):
+        self._store(vector_id, vector)
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        if self._size == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.vectors @ query
+        ids = _top_k(scores, top_k)
+        return ids, scores[ids]
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index built in-house with numpy.
+
+    Vectors are assigned to the nearest of `nlist` spherical k-means centroids;
+    a query only scores the vectors in its `nprobe` closest lists. Until
+    `train_threshold` vectors have been added the index behaves like ExactIndex,
+    then it trains on the vectors it holds and from there on assigns new vectors
+    incrementally. Raising `nprobe` trades latency for recall.
+    """
+
+    def __init__(self, nlist: int = 64, nprobe: int = 8, train_threshold: Optional[int] = None,
+                 kmeans_iterations: int = 10, max_train_samples: int = 20000, seed: int = 0):
+        """
+        Initialize the IVF index.
+
+        Args:
+            nlist: Number of inverted lists (centroids)
+            nprobe: Number of lists scanned per query
+            train_threshold: Vectors required before training (default: 40 per list)
+            kmeans_iterations: Lloyd iterations used for training
+            max_train_samples: Maximum vectors sampled for training
+            seed: Random seed for centroid initialization and sampling
+        """
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold or nlist * 40
+        self.kmeans_iterations = kmeans_iterations
+        self.max_train_samples = max_train_samples
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._list_sizes: Optional[np.ndarray] = None
+        self._assignments: Dict[int, int] = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _append_to_list(self, list_idx: int, vector_id: int):
+        size = self._list_sizes[list_idx]
+        ids = self._lists[list_idx]
+        if size >= ids.shape[0]:
+            grown = np.empty(max(16, ids.shape[0] * 2), dtype=np.int64)
+            grown[:size] = ids[:size]
+            self._lists[list_idx] = ids = grown
+        ids[size] = vector_id
+        self._list_sizes[list_idx] = size + 1
+
+    def _remove_from_list(self, list_idx: int, vector_id: int):
+        size = self._list_sizes[list_idx]
+        ids = self._lists[list_idx]
+        position = np.flatnonzero(ids[:size] == vector_id)
+        if position.size:
+            ids[position[0]] = ids[size - 1]
+            self._list_sizes[list_idx] = size - 1
+
+    def train(self):
+        """Run spherical k-means over (a sample of) the stored vectors and build the inverted lists."""
+        rng = np.random.default_rng(self.seed)
+        vectors = self.vectors
+        nlist = min(self.nlist, self._size)
+
+        sample = vectors
+        if self._size > self.max_train_samples:
+            sample = vectors[rng.choice(self._size, self.max_train_samples, replace=False)]
+
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self.centroids = centroids.astype(np.float32)
+        self._lists = [np.empty(16, dtype=np.int64) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self._assignments = {}
+
+        labels = np.argmax(vectors @ self.centroids.T, axis=1)
+        for vector_id, list_idx in enumerate(labels):
+            self._append_to_list(int(list_idx), vector_id)
+            self._assignments[vector_id] = int(list_idx)
+        logger.info(f"Trained IVF index with {nlist} lists over {self._size} vectors")
+
+    def load_vectors(self, vectors: np.ndarray):
+        super().load_vectors(vectors)
+        self.centroids = None
+        if self._size >= self.train_threshold:
+            self.train()
+
+    def add(self, vector_id: int, vector: np.ndarray):
+        self._store(vector_id, vector)
+        if not self.is_trained:
+            if self._size >= self.train_threshold:
+                self.train()
+            return
+
+        if vector_id in self._assignments:
+            self._remove_from_list(self._assignments[vector_id], vector_id)
+        list_idx = int(np.argmax(self.centroids @ vector))
+        self._append_to_list(list_idx, vector_id)
+        self._assignments[vector_id] = list_idx
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        if self._size == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if not self.is_trained:
+            scores = self.vectors @ query
+            ids = _top_k(scores, top_k)
+            return ids, scores[ids]
+
+        probe = _top_k(self.centroids @ query, min(self.nprobe, self.centroids.shape[0]))
+        candidates = np.concatenate([self._lists[i][:self._list_sizes[i]] for i in probe])
+        if candidates.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self._matrix[candidates] @ query
+        best = _top_k(scores, top_k)
+        return candidates[best], scores[best]
+
+
+class HNSWIndex(VectorIndex):
+    """
+    HNSW graph index backed by the optional `hnswlib` package.
+
+    `ef_search` is the recall/latency knob at query time; `M` and
+    `ef_construction` control graph quality at build time.
+    """
+
+    def __init__(self, M: int = 16, ef_construction: int = 200, ef_search: int = 64,
+                 initial_capacity: int = 1024):
+        """
+        Initialize the HNSW index.
+
+        Args:
+            M: Number of graph neighbours per node
+            ef_construction: Candidate list size while inserting
+            ef_search: Candidate list size while searching
+            initial_capacity: Initial number of elements allocated
+        """
+        import hnswlib  # Raises ImportError when the optional backend is not installed
+
+        super().__init__()
+        self._hnswlib = hnswlib
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.initial_capacity = initial_capacity
+        self._graph = None
+
+    def load_vectors(self, vectors: np.ndarray):
+        super().load_vectors(vectors)
+        self._graph = None
+        if self._size == 0:
+            return
+        self._graph = self._hnswlib.Index(space="ip", dim=vectors.shape[1])
+        self._graph.init_index(max_elements=max(self.initial_capacity, self._size),
+                               ef_construction=self.ef_construction, M=self.M, allow_replace_deleted=False)
+        self._graph.set_ef(self.ef_search)
+        self._graph.add_items(np.asarray(vectors), np.arange(self._size))
+
+    def add(self, vector_id: int, vector: np.ndarray):
+        self._store(vector_id, vector)
+        if self._graph is None:
+            self._graph = self._hnswlib.Index(space="ip", dim=vector.shape[0])
+            self._graph.init_index(max_elements=max(self.initial_capacity, vector_id + 1),
+                                   ef_construction=self.ef_construction, M=self.M, allow_replace_deleted=False)
+            self._graph.set_ef(self.ef_search)
+        elif vector_id >= self._graph.get_max_elements():
+            self._graph.resize_index(max(vector_id + 1, self._graph.get_max_elements() * 2))
+        self._graph.add_items(vector.reshape(1, -1), np.array([vector_id]))
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        if self._graph is None or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        k = min(top_k, self._graph.get_current_count())
+        self._graph.set_ef(max(self.ef_search, k))
+        labels, distances = self._graph.knn_query(query.reshape(1, -1), k=k)
+        # hnswlib's "ip" distance is 1 - inner product
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+    "hnsw": HNSWIndex,
+}
+
+
+def create_index(backend: str = "exact", **params: Any) -> VectorIndex:
+    """
+    Create a vector index by backend name.
+
+    Args:
+        backend: One of "exact", "ivf" or "hnsw"
+        **params: Backend-specific tuning parameters
+
+    Returns:
+        A VectorIndex instance (exact search if the backend is unknown or unavailable)
+    """
+    index_cls = INDEX_BACKENDS.get(backend)
+    if index_cls is None:
+        logger.warning(f"Unknown index backend: {backend}, falling back to exact search")
+        return ExactIndex()
+    try:
+        return index_cls(**params)
+    except ImportError:
+        logger.warning(f"Index backend '{backend}' requires hnswlib. Please install with `pip install hnswlib`. "
+                       "Falling back to exact search")
+        return ExactIndex()
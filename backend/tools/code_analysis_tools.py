@@ -6,6 +6,7 @@ from pydantic import BaseModel, Field
 from typing import Type
 import io
 import sys
+from backend.utils.telemetry import telemetry
 
 # El esquema no cambia, sigue siendo correcto.
 class CodeExecutorToolSchema(BaseModel):
@@ -19,6 +20,7 @@ class PythonCodeExecutorTool(BaseTool):
     El DataFrame está disponible como 'df'. El código debe terminar con una línea que imprima el resultado final."""
     args_schema: Type[BaseModel] = CodeExecutorToolSchema
 
+    @telemetry.traced("Ejecutor de Código Python", kind="tool")
     def _run(self, code: str, file_path: str) -> str:
         # --- LA ÚNICA LÍNEA QUE NECESITAS AÑADIR ---
         # Esta línea corrige los saltos de línea dobles (\\n) que a veces genera el LLM,
@@ -8,6 +8,7 @@ import uuid
 from typing import Type
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
+from backend.utils.telemetry import telemetry
 
 CHARTS_DIR = "static/charts"
 os.makedirs(CHARTS_DIR, exist_ok=True)
@@ -24,6 +25,7 @@ class CodeExecutionTool(BaseTool):
     args_schema: Type[BaseModel] = GraphingToolSchema
 
     # --- CAMBIO 2: La función _run ahora acepta 'file_path' directamente ---
+    @telemetry.traced("Ejecutor de Código Python para Gráficos", kind="tool")
     def _run(self, code: str, file_path: str) -> str:
         
         # Añadimos la limpieza de código que nos faltaba
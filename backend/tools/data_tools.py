@@ -13,6 +13,7 @@ import dspy # <--- Importar dspy aquí
 import logging
 
 from backend.agents.dspy_system import get_multi_agent_system
+from backend.utils.telemetry import telemetry
 
 class DspyAnalysisToolSchema(BaseModel):
     user_question: str = Field(..., description="La pregunta específica del usuario sobre el conjunto de datos.")
@@ -31,6 +32,7 @@ class DspyAnalysisTool(BaseTool):
             return code.split("```")[1].split("```")[0].strip()
         return code.strip()
 
+    @telemetry.traced("Análisis de Datos con DSPy", kind="tool")
     def _run(self, user_question: str, file_path: str) -> str:
         logging.warning(f"RUTA RECIBIDA POR LA HERRAMIENTA: '{file_path}'")
         print(f"--- ⚒️ DspyAnalysisTool (v4-Inyección) iniciada: '{user_question}' ---")
@@ -73,8 +75,8 @@ class DspyAnalysisTool(BaseTool):
             }
 
             print(f"--- 🧠 Invocando al agente DSPy '{agent_to_use}'... ---")
-            statistical_agent_module = getattr(dspy_system, agent_to_use)
-            result = statistical_agent_module(**agent_inputs)
+            # Con la memoria de la sesión (la sesión sale de la traza de la petición en curso)
+            result = dspy_system.execute_agent_with_memory(agent_to_use, agent_inputs, user_question)
             
             if not hasattr(result, 'code') or not result.code:
                 return "Error: El sistema DSPy no generó el código de análisis necesario."
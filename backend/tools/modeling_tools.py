@@ -9,6 +9,7 @@ import numpy as np
 import joblib
 import os
 import uuid
+from backend.utils.telemetry import telemetry
 
 # --- HERRAMIENTA 1: ENTRENAR Y GUARDAR MODELO (SIN CAMBIOS) ---
 class ModelTrainingTool(BaseTool):
@@ -23,6 +24,7 @@ class ModelTrainingTool(BaseTool):
 
     args_schema = ModelTrainingToolSchema
 
+    @telemetry.traced("Entrenador de Modelos de Regresión", kind="tool")
     def _run(self, file_path: str, target_column: str, feature_columns: List[str]) -> str:
         try:
             df = pd.read_csv(file_path)
@@ -80,6 +82,7 @@ class ModelPredictionTool(BaseTool):
 
     args_schema = ModelPredictionToolSchema
 
+    @telemetry.traced("Herramienta de Predicción de Precios", kind="tool")
     def _run(self, model_path: str, new_data: Dict) -> str:
         try:
             if not os.path.exists(model_path):
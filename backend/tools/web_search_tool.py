@@ -2,22 +2,32 @@
 
 import os
 import json
-import requests
+import logging
 from crewai import Agent, Task
 from crewai.tools import BaseTool
 from datetime import datetime # <--- 1. Importamos la librería datetime
+from backend.utils.telemetry import telemetry
+from backend.utils.search_client import SearchAPIError
+from backend.utils.search_providers import get_web_search
+from backend.utils.page_fetcher import build_page_context, get_page_fetcher
+
+logger = logging.getLogger(__name__)
+
+# Páginas de resultados que se descargan para dar al investigador contexto denso en un solo paso
+WEB_SEARCH_FETCH_PAGES = int(os.getenv("WEB_SEARCH_FETCH_PAGES", "3"))
 
 class WebSearchTool(BaseTool):
     name: str = "Web Search Tool"
     description: str = "Realiza una búsqueda en internet sobre un tema específico y devuelve los resultados en un formato JSON estructurado."
 
+    @telemetry.traced("Web Search Tool", kind="tool")
     def _run(self, query: str) -> str:
         """
-        Ejecuta la búsqueda web usando la API de Serper, añadiendo contexto de la fecha actual.
+        Ejecuta la búsqueda web con los proveedores configurados (Serper, Brave), añadiendo contexto de la fecha actual.
         """
-        api_key = os.getenv("SERPER_API_KEY")
-        if not api_key:
-            return "Error: La clave de API de Serper (SERPER_API_KEY) no está configurada."
+        web_search = get_web_search()
+        if not web_search.providers:
+            return "Error: No hay ningún proveedor de búsqueda configurado (SERPER_API_KEY o BRAVE_SEARCH_API_KEY)."
 
         # --- 2. OBTENER LA FECHA ACTUAL ---
         current_date = datetime.now().strftime("%Y-%m-%d")
@@ -26,40 +36,41 @@ class WebSearchTool(BaseTool):
         # Esto le da al motor de búsqueda (y al LLM que lo interpreta) el contexto temporal correcto.
         contextualized_query = f"Hoy es {current_date}. La búsqueda relevante para esta fecha es: {query}"
         
-        print(f"--- 🌐 Búsqueda Web con Contexto de Fecha ---")
-        print(f"Consulta original: {query}")
-        print(f"Consulta contextualizada enviada a Serper: {contextualized_query}")
-        print(f"-------------------------------------------")
-
-        url = "https://google.serper.dev/search"
-        # Usamos la consulta contextualizada en el payload
-        payload = json.dumps({"q": contextualized_query})
-        headers = {
-            'X-API-KEY': api_key,
-            'Content-Type': 'application/json'
-        }
+        logger.info(f"Búsqueda web (consulta original: {query!r}) enviada a "
+                    f"{', '.join(p.name for p in web_search.providers)}: {contextualized_query}")
 
         try:
-            response = requests.post(url, headers=headers, data=payload)
-            response.raise_for_status() 
-            search_results = response.json()
+            # Capa unificada: consulta los proveedores configurados (ver SEARCH_STRATEGY y SEARCH_HEDGE_DELAY)
+            search_results = web_search.search_sync(contextualized_query, count=5)
 
-            # El resto del formateo de resultados sigue igual
             formatted_results = []
-            if "organic" in search_results:
-                for result in search_results["organic"][:5]:
-                    formatted_results.append({
-                        "title": result.get("title"),
-                        "link": result.get("link"),
-                        "snippet": result.get("snippet")
-                    })
+            for result in search_results["results"][:5]:
+                formatted_results.append({
+                    "title": result.get("title"),
+                    "link": result.get("url"),
+                    "snippet": result.get("description")
+                })
+
+            # Descarga concurrente (con caché en disco) de las mejores páginas y extracción de los
+            # pasajes más relevantes, para no depender solo de los snippets
+            if WEB_SEARCH_FETCH_PAGES > 0 and formatted_results:
+                urls = [result["link"] for result in formatted_results if result["link"]][:WEB_SEARCH_FETCH_PAGES]
+                try:
+                    passages = build_page_context(query, get_page_fetcher().fetch_many_sync(urls))
+                except Exception as e:
+                    logger.warning(f"No se pudo extraer el contenido de las páginas: {e}")
+                    passages = []
+                for result in formatted_results:
+                    excerpts = [p["excerpt"] for p in passages if p["url"] == result["link"]]
+                    if excerpts:
+                        result["content"] = "\n...\n".join(excerpts)
 
             if not formatted_results:
                 return "No se encontraron resultados relevantes para la búsqueda."
 
             return json.dumps(formatted_results, indent=2)
 
-        except requests.exceptions.RequestException as e:
-            return f"Error al contactar la API de Serper: {e}"
+        except SearchAPIError as e:
+            return f"Error al contactar la API de búsqueda: {e}"
         except Exception as e:
-            return f"Ocurrió un error inesperado durante la búsqueda: {e}"
\ No newline at end of file
+            return f"Ocurrió un error inesperado durante la búsqueda: {e}"
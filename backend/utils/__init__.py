@@ -4,9 +4,13 @@ DSAgency Auto-Analyst Utilities Module
 This module contains utility functions and classes.
 """
 
-from backend.utils.logger import Logger, log_time
+from backend.utils.logger import Logger, log_time, shutdown_logging
+from backend.utils.telemetry import Telemetry, telemetry
 
 __all__ = [
     "Logger",
-    "log_time"
+    "log_time",
+    "shutdown_logging",
+    "Telemetry",
+    "telemetry"
 ] 
\ No newline at end of file
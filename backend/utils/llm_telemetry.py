@@ -0,0 +1,170 @@
+"""
+Per-call LLM telemetry. CrewAI agents and DSPy modules both call
+`litellm.completion`, so a LiteLLM logger sees every one of their completions;
+LangChain `ChatOpenAI` calls (the fast path) are seen by a LangChain callback.
+Each completion becomes one `llm` span, timed, with its token usage, in the
+trace that was active when the call started and attributed to the calling
+agent (LiteLLM `metadata["agent"]`, else the enclosing agent span).
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from backend.utils.telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+try:
+    from litellm.integrations.custom_logger import CustomLogger
+except ImportError:  # Optional: CrewAI and DSPy calls are then not recorded
+    CustomLogger = object
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:  # Optional: ChatOpenAI calls are then not recorded
+    BaseCallbackHandler = object
+
+# Calls started but not finished; bounds the bookkeeping if a callback never arrives
+MAX_PENDING_CALLS = 1000
+
+
+def _usage_value(usage: Any, key: str) -> int:
+    if usage is None:
+        return 0
+    if isinstance(usage, dict):
+        return usage.get(key) or 0
+    return getattr(usage, key, 0) or 0
+
+
+class LiteLLMTelemetryLogger(CustomLogger):
+    """
+    LiteLLM runs the success/failure callbacks of sync calls on its own thread pool,
+    so the trace and agent of the caller are captured in the pre-call hook (which runs
+    on the calling thread) and looked up by `litellm_call_id` when the call finishes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def log_pre_api_call(self, model, messages, kwargs):
+        call_id = kwargs.get("litellm_call_id")
+        if not call_id:
+            return
+        with self._lock:
+            self._pending[call_id] = (telemetry.current_trace(), telemetry.current_agent(), time.perf_counter())
+            while len(self._pending) > MAX_PENDING_CALLS:
+                self._pending.popitem(last=False)
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self._record(kwargs, response_obj, start_time, end_time)
+
+    def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        error = kwargs.get("exception")
+        self._record(kwargs, None, start_time, end_time,
+                     error=f"{type(error).__name__}: {error}" if error else "LLM call failed")
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self._record(kwargs, response_obj, start_time, end_time)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self.log_failure_event(kwargs, response_obj, start_time, end_time)
+
+    def _record(self, kwargs: Dict[str, Any], response_obj: Any, start_time, end_time,
+                error: Optional[str] = None):
+        try:
+            with self._lock:
+                trace, context_agent, started = self._pending.pop(kwargs.get("litellm_call_id"), (None, None, None))
+            metadata = (kwargs.get("litellm_params") or {}).get("metadata") or {}
+            usage = response_obj.get("usage") if isinstance(response_obj, dict) else getattr(response_obj, "usage", None)
+            try:
+                duration_s = (end_time - start_time).total_seconds()
+            except (TypeError, AttributeError):
+                duration_s = 0.0
+            telemetry.record_llm_call(
+                model=kwargs.get("model") or "unknown",
+                prompt_tokens=_usage_value(usage, "prompt_tokens"),
+                completion_tokens=_usage_value(usage, "completion_tokens"),
+                duration_s=duration_s,
+                agent=metadata.get("agent") or context_agent,
+                trace=trace,
+                error=error,
+                started=started,
+            )
+        except Exception as e:
+            # Telemetry must never break an LLM call
+            logger.debug(f"Could not record LiteLLM call: {str(e)}")
+
+
+class LangChainTelemetryHandler(BaseCallbackHandler):
+    """Records each completion of the LangChain model it is attached to (sync callbacks run inline)."""
+
+    def __init__(self, model: str, agent: Optional[str] = None):
+        super().__init__()
+        self.model = model
+        self.agent = agent
+        self._starts: Dict[Any, float] = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        llm_output = getattr(response, "llm_output", None) or {}
+        usage = llm_output.get("token_usage") or {}
+        self._record(run_id, llm_output.get("model_name") or self.model,
+                     _usage_value(usage, "prompt_tokens"), _usage_value(usage, "completion_tokens"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._record(run_id, self.model, 0, 0, error=f"{type(error).__name__}: {error}")
+
+    def _record(self, run_id, model: str, prompt_tokens: int, completion_tokens: int,
+                error: Optional[str] = None):
+        start = self._starts.pop(run_id, None)
+        # Sync callbacks run inline, so the trace of the current context is the caller's
+        telemetry.record_llm_call(
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            duration_s=time.perf_counter() - start if start is not None else 0.0,
+            agent=self.agent or telemetry.current_agent(),
+            error=error,
+            started=start,
+        )
+
+
+_litellm_logger: Optional[LiteLLMTelemetryLogger] = None
+_install_lock = threading.Lock()
+
+
+def install_litellm_telemetry() -> bool:
+    """
+    Register the LiteLLM logger once per process. It goes on the input/success/failure
+    callback lists rather than `litellm.callbacks`, which CrewAI replaces on every call.
+    """
+    global _litellm_logger
+    if CustomLogger is object:
+        logger.warning("litellm is not installed; CrewAI and DSPy LLM calls will not be recorded")
+        return False
+    import litellm
+
+    with _install_lock:
+        if _litellm_logger is None:
+            _litellm_logger = LiteLLMTelemetryLogger()
+            litellm.input_callback.append(_litellm_logger)
+            litellm.success_callback.append(_litellm_logger)
+            litellm.failure_callback.append(_litellm_logger)
+    return True
+
+
+def langchain_callbacks(model: str, agent: Optional[str] = None) -> list:
+    """Callbacks to pass to a LangChain chat model so its calls are recorded."""
+    if BaseCallbackHandler is object:
+        return []
+    return [LangChainTelemetryHandler(model, agent=agent)]
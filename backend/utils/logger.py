@@ -1,61 +1,185 @@
 import os
+import copy
+import json
 import time
+import functools
+import queue
+import atexit
+import random
 import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional, Union
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Fraction of verbose messages (full plan/result dumps) that actually get logged.
+VERBOSE_LOG_SAMPLE_RATE = float(os.getenv("LOG_VERBOSE_SAMPLE_RATE", "0.1"))
+
+_TEXT_FORMAT_WITH_TIME = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_TEXT_FORMAT = "%(message)s,"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, logger, level, message and exception text."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Puts records on the shared queue without running the formatter: only the
+    %-interpolation happens on the caller's thread, timestamps/JSON rendering and
+    the file write happen on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class _RoutingHandler(logging.Handler):
+    """Listener-side handler: routes each record to the file (and console) handlers of its logger."""
+
+    def __init__(self):
+        super().__init__()
+        self._routes: Dict[str, list] = {}
+        self._routes_lock = threading.Lock()
+
+    def add_route(self, name: str, handler: logging.Handler):
+        with self._routes_lock:
+            self._routes.setdefault(name, []).append(handler)
+
+    def has_route(self, name: str, handler_type: type) -> bool:
+        with self._routes_lock:
+            return any(type(h) is handler_type for h in self._routes.get(name, []))
+
+    def emit(self, record: logging.LogRecord):
+        for handler in self._routes.get(record.name, []):
+            handler.handle(record)
+
+    def close(self):
+        with self._routes_lock:
+            for handlers in self._routes.values():
+                for handler in handlers:
+                    handler.close()
+        super().close()
+
+
+_log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_router = _RoutingHandler()
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def _ensure_listener():
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_log_queue, _router)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush pending records and stop the background listener."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
 class Logger:
-    def __init__(self, name: str, see_time: bool = False, console_log: bool = False, level: int = logging.INFO):
+    def __init__(self, name: str, see_time: bool = False, console_log: bool = False, level: int = logging.INFO,
+                 json_format: Optional[bool] = None):
         self.is_dev = os.getenv("ENVIRONMENT", "development") == "development"
         self.logger = logging.getLogger(name)
         self.logger.setLevel(level)
 
         if not self.is_dev:
-            self.logger.addHandler(logging.NullHandler())
+            if not any(isinstance(h, logging.NullHandler) for h in self.logger.handlers):
+                self.logger.addHandler(logging.NullHandler())
             return
 
-        os.makedirs("./logs", exist_ok=True)
-
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s" if see_time else "%(message)s,"
+        if json_format is None:
+            json_format = os.getenv("LOG_FORMAT", "text").lower() == "json"
+        formatter = JsonFormatter() if json_format else logging.Formatter(
+            _TEXT_FORMAT_WITH_TIME if see_time else _TEXT_FORMAT
         )
 
-        file_handler = logging.FileHandler(f"./logs/{name}.log")
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
+        # Handlers are configured once per logger name, no matter how many times
+        # a Logger with that name is constructed.
+        with _setup_lock:
+            _ensure_listener()
 
-        if console_log:
-            console_handler = logging.StreamHandler()
-            console_handler.setFormatter(formatter)
-            self.logger.addHandler(console_handler)
+            if not _router.has_route(name, logging.FileHandler):
+                os.makedirs("./logs", exist_ok=True)
+                file_handler = logging.FileHandler(f"./logs/{name}.log")
+                file_handler.setFormatter(formatter)
+                _router.add_route(name, file_handler)
 
-    def log_message(self, message: str, level: int = logging.INFO):
-        if not self.is_dev:
+            if console_log and not _router.has_route(name, logging.StreamHandler):
+                console_handler = logging.StreamHandler()
+                console_handler.setFormatter(formatter)
+                _router.add_route(name, console_handler)
+
+            if not any(isinstance(h, QueueHandler) for h in self.logger.handlers):
+                self.logger.addHandler(_DeferredQueueHandler(_log_queue))
+
+    def is_enabled_for(self, level: int) -> bool:
+        return self.is_dev and self.logger.isEnabledFor(level)
+
+    def log_message(self, message: Union[str, Callable[[], str]], level: int = logging.INFO, *args: Any,
+                    sample_rate: float = 1.0):
+        """
+        Log a message. Nothing is formatted when the level is disabled: pass
+        %-style `args` or a zero-argument callable instead of an f-string for
+        expensive messages. `sample_rate` < 1 keeps only that fraction of calls.
+        """
+        if not self.is_enabled_for(level):
             return
-        if level == logging.INFO:
-            self.logger.info(message)
-        elif level == logging.ERROR:
-            self.logger.error(message)
-        elif level == logging.WARNING:
-            self.logger.warning(message)
-        elif level == logging.DEBUG:
-            self.logger.debug(message)
-        else:
-            self.logger.info(message)
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return
+        if callable(message):
+            message = message()
+        self.logger.log(level, message, *args)
 
     def disable_logging(self):
         self.logger.disabled = True
 
 
 def log_time(func):
+    timing_logger: Dict[str, Logger] = {}
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         if os.getenv("ENV", "development") != "development":
             return func(*args, **kwargs)
         start_time = time.time()
         result = func(*args, **kwargs)
         end_time = time.time()
-        logger = Logger(func.__name__ + "_time", see_time=True, level=logging.INFO)
-        logger.log_message(f"Function: {func.__name__}, Execution time: {round(end_time - start_time, 5)} seconds")
+        # One Logger per decorated function, created on first use
+        if "logger" not in timing_logger:
+            timing_logger["logger"] = Logger(func.__name__ + "_time", see_time=True, level=logging.INFO)
+        timing_logger["logger"].log_message(
+            "Function: %s, Execution time: %s seconds", logging.INFO, func.__name__, round(end_time - start_time, 5)
+        )
         return result
-    return wrapper 
\ No newline at end of file
+    return wrapper
@@ -0,0 +1,405 @@
+"""
+Fetch-and-extract pipeline for search result pages: an async fetcher with
+bounded global and per-host concurrency and timeouts, HTML-to-text extraction,
+chunking, and an on-disk content cache, plus `build_page_context` to pick the
+chunks most relevant to a query within a character budget.
+
+Extraction uses BeautifulSoup (with lxml when installed) and falls back to the
+standard library HTML parser.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import socket
+import hashlib
+import logging
+import ipaddress
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+from backend.utils.search_client import get_search_loop, run_on_search_loop
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:  # Optional: the standard library parser is used instead
+    BeautifulSoup = None
+
+logger = logging.getLogger(__name__)
+
+# Fetcher settings
+PAGE_FETCH_CONCURRENCY = int(os.getenv("PAGE_FETCH_CONCURRENCY", "8"))
+PAGE_FETCH_PER_HOST = int(os.getenv("PAGE_FETCH_PER_HOST", "2"))
+PAGE_FETCH_TIMEOUT = float(os.getenv("PAGE_FETCH_TIMEOUT", "8"))
+PAGE_FETCH_MAX_BYTES = int(os.getenv("PAGE_FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+PAGE_FETCH_MAX_REDIRECTS = int(os.getenv("PAGE_FETCH_MAX_REDIRECTS", "5"))
+PAGE_CACHE_DIR = os.getenv(
+    "PAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/page_cache")
+)
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "86400"))
+PAGE_CHUNK_SIZE = int(os.getenv("PAGE_CHUNK_SIZE", "1200"))
+PAGE_CHUNK_OVERLAP = int(os.getenv("PAGE_CHUNK_OVERLAP", "150"))
+
+_USER_AGENT = "Mozilla/5.0 (compatible; DSAgency-Researcher/1.0)"
+_SKIPPED_TAGS = ("script", "style", "noscript", "template", "svg", "canvas", "iframe", "form",
+                 "nav", "header", "footer", "aside")
+_BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "br", "tr", "table", "h1", "h2",
+               "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt", "figcaption"}
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+# --- Extraction and chunking ---
+
+class _TextExtractor(HTMLParser):
+    """Standard-library fallback: collects visible text, one line per block element."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.parts: List[str] = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip_depth:
+            self.parts.append(data)
+
+
+def _clean_lines(text: str) -> str:
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def extract_text(html: str) -> Tuple[str, str]:
+    """Return (title, visible text) of an HTML document, one paragraph per line."""
+    if BeautifulSoup is not None:
+        try:
+            soup = BeautifulSoup(html, "lxml")
+        except Exception:
+            soup = BeautifulSoup(html, "html.parser")
+        title = soup.title.get_text(" ", strip=True) if soup.title else ""
+        for element in soup(list(_SKIPPED_TAGS)):
+            element.decompose()
+        body = soup.body or soup
+        return title, _clean_lines(body.get_text("\n"))
+
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return " ".join(parser.title.split()), _clean_lines("".join(parser.parts))
+
+
+def chunk_text(text: str, chunk_size: int = PAGE_CHUNK_SIZE, overlap: int = PAGE_CHUNK_OVERLAP) -> List[str]:
+    """
+    Split text into chunks of about `chunk_size` characters, packing whole
+    paragraphs when possible; consecutive chunks share `overlap` characters.
+    """
+    chunks: List[str] = []
+    current = ""
+    for paragraph in text.split("\n"):
+        while len(paragraph) > chunk_size:
+            # Paragraph longer than a chunk: cut at the last sentence end (or space) that fits
+            cut = max(paragraph.rfind(". ", 0, chunk_size), paragraph.rfind(" ", 0, chunk_size))
+            cut = cut + 1 if cut > chunk_size // 2 else chunk_size
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[max(1, cut - overlap):]
+        if current and len(current) + len(paragraph) + 1 > chunk_size:
+            chunks.append(current)
+            current = current[-overlap:] if overlap else ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current.strip():
+        chunks.append(current)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+# --- Disk cache ---
+
+class PageCache:
+    """One JSON file per URL (named by its hash), valid for `ttl` seconds."""
+
+    def __init__(self, cache_dir: str = PAGE_CACHE_DIR, ttl: float = PAGE_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        path = self._path(url)
+        try:
+            if self.ttl > 0 and time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable page cache entry for {url}: {str(e)}")
+            return None
+
+    def put(self, url: str, page: Dict[str, Any]):
+        path = self._path(url)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(page, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Error writing page cache entry for {url}: {str(e)}")
+
+
+# --- Fetcher ---
+
+class BlockedURLError(ValueError):
+    """A URL (or a redirect target) points to a non-public address and is not fetched."""
+
+
+async def _check_public_url(url: str):
+    """
+    Refuse URLs that are not http(s) or whose host resolves to any loopback, private,
+    link-local or otherwise non-global address. Result URLs come from the web, so without
+    this a page (or a redirect) could reach internal services such as the LiteLLM proxy
+    or the cloud metadata endpoint.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise BlockedURLError(f"Unsupported URL {url}")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            parts.hostname, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise BlockedURLError(f"Cannot resolve {parts.hostname}: {e}") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise BlockedURLError(f"Refusing to fetch {url}: {parts.hostname} resolves to non-public address {address}")
+
+class PageFetcher:
+    """
+    Async page fetcher with bounded concurrency (overall and per host), a
+    per-request timeout, a response size limit and an on-disk cache.
+
+    `fetch` returns a page dict: url, final_url, title, text, chunks, status
+    ("ok", "cached" or "error") and, on failure, error. Runs on the shared search
+    loop, like the search clients.
+    """
+
+    def __init__(self, concurrency: int = PAGE_FETCH_CONCURRENCY, per_host: int = PAGE_FETCH_PER_HOST,
+                 timeout: float = PAGE_FETCH_TIMEOUT, max_bytes: int = PAGE_FETCH_MAX_BYTES,
+                 cache: Optional[PageCache] = None, chunk_size: int = PAGE_CHUNK_SIZE,
+                 chunk_overlap: int = PAGE_CHUNK_OVERLAP, max_redirects: int = PAGE_FETCH_MAX_REDIRECTS):
+        """
+        Initialize the fetcher.
+
+        Args:
+            concurrency: Maximum number of pages downloaded at the same time
+            per_host: Maximum number of simultaneous downloads from one host
+            timeout: Per-request timeout, in seconds
+            max_bytes: Pages are truncated after this many bytes
+            cache: Content cache (default: PageCache at PAGE_CACHE_DIR)
+            chunk_size: Characters per text chunk
+            chunk_overlap: Characters shared by consecutive chunks
+            max_redirects: Redirects followed per page (each target is checked like the URL)
+        """
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.cache = cache if cache is not None else PageCache()
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.max_redirects = max_redirects
+        # Created on the search loop on first use
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """Fetch one page (from the cache when fresh)."""
+        loop = get_search_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._fetch(url)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._fetch(url), loop))
+
+    async def fetch_many(self, urls: Sequence[str]) -> List[Dict[str, Any]]:
+        """Fetch pages concurrently; results keep the order of `urls`."""
+        loop = get_search_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._fetch_many(urls)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._fetch_many(urls), loop))
+
+    def fetch_many_sync(self, urls: Sequence[str]) -> List[Dict[str, Any]]:
+        """Blocking version of `fetch_many` for code running outside an event loop."""
+        return run_on_search_loop(self._fetch_many(urls))
+
+    async def _fetch_many(self, urls: Sequence[str]) -> List[Dict[str, Any]]:
+        unique_urls = list(dict.fromkeys(urls))
+        pages = await asyncio.gather(*(self._fetch(url) for url in unique_urls))
+        by_url = dict(zip(unique_urls, pages))
+        return [by_url[url] for url in urls]
+
+    async def _fetch(self, url: str) -> Dict[str, Any]:
+        cached = self.cache.get(url)
+        if cached is not None:
+            cached["status"] = "cached"
+            return cached
+
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                # Redirects are followed by _download, which checks every hop
+                timeout=self.timeout, follow_redirects=False, headers={"User-Agent": _USER_AGENT},
+                limits=httpx.Limits(max_connections=self.concurrency,
+                                    max_keepalive_connections=self.concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        host = urlsplit(url).netloc.lower()
+        host_semaphore = self._host_semaphores.get(host)
+        if host_semaphore is None:
+            host_semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host)
+
+        try:
+            async with host_semaphore, self._semaphore:
+                html, final_url = await asyncio.wait_for(self._download(url), timeout=self.timeout)
+        except Exception as e:
+            message = str(e) or type(e).__name__
+            logger.warning(f"Could not fetch {url}: {message}")
+            return {"url": url, "final_url": url, "title": "", "text": "", "chunks": [], "status": "error",
+                    "error": message}
+
+        # Parsing is CPU-bound: keep it off the event loop
+        title, text = await asyncio.get_running_loop().run_in_executor(None, extract_text, html)
+        page = {
+            "url": url,
+            "final_url": final_url,
+            "title": title,
+            "text": text,
+            "chunks": chunk_text(text, self.chunk_size, self.chunk_overlap),
+            "fetched_at": time.time(),
+            "status": "ok",
+        }
+        self.cache.put(url, page)
+        return page
+
+    async def _download(self, url: str) -> Tuple[str, str]:
+        for _ in range(self.max_redirects + 1):
+            await _check_public_url(url)
+            async with self._http.stream("GET", url) as response:
+                if response.is_redirect:
+                    location = response.headers.get("Location")
+                    if not location:
+                        raise ValueError(f"Redirect without a Location header from {url}")
+                    url = urljoin(str(response.url), location)
+                    continue
+                return await self._read_body(response)
+        raise ValueError(f"Too many redirects (more than {self.max_redirects})")
+
+    async def _read_body(self, response: httpx.Response) -> Tuple[str, str]:
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "")
+        if content_type and "html" not in content_type and "text/plain" not in content_type:
+            raise ValueError(f"Unsupported content type {content_type}")
+        body = bytearray()
+        async for data in response.aiter_bytes():
+            body.extend(data)
+            if len(body) >= self.max_bytes:
+                break
+        encoding = response.encoding or "utf-8"
+        text = bytes(body[:self.max_bytes]).decode(encoding, errors="replace")
+        if "text/plain" in content_type:
+            # Keep plain text pages as-is through the HTML extractor
+            text = "<pre>" + text.replace("&", "&amp;").replace("<", "&lt;") + "</pre>"
+        return text, str(response.url)
+
+    def close(self):
+        """Close the HTTP connection pool."""
+        if self._http is not None:
+            try:
+                run_on_search_loop(self._http.aclose())
+            except Exception as e:
+                logger.error(f"Error closing page fetcher: {str(e)}")
+            self._http = None
+
+
+def build_page_context(query: str, pages: Sequence[Dict[str, Any]], max_chars: int = 6000,
+                       max_chunks_per_page: int = 2) -> List[Dict[str, Any]]:
+    """
+    Pick the chunks that best match the query (share of query words they contain),
+    at most `max_chunks_per_page` per page, until `max_chars` is reached.
+
+    Returns:
+        List of {"url", "final_url", "title", "excerpt", "score"} in decreasing relevance
+    """
+    query_terms = set(_WORD_PATTERN.findall(query.lower()))
+    candidates = []
+    for page_rank, page in enumerate(pages):
+        for chunk_rank, chunk in enumerate(page.get("chunks") or []):
+            chunk_terms = set(_WORD_PATTERN.findall(chunk.lower()))
+            score = len(query_terms & chunk_terms) / float(len(query_terms) or 1)
+            # Ties go to better-ranked pages and earlier chunks
+            candidates.append((score, -page_rank, -chunk_rank, page, chunk))
+    candidates.sort(key=lambda candidate: candidate[:3], reverse=True)
+
+    selected, used_chars, per_page = [], 0, {}
+    for score, _, _, page, chunk in candidates:
+        url = page.get("url")
+        if per_page.get(url, 0) >= max_chunks_per_page:
+            continue
+        if selected and used_chars + len(chunk) > max_chars:
+            continue
+        selected.append({"url": url, "final_url": page.get("final_url") or url, "title": page.get("title", ""),
+                         "excerpt": chunk, "score": round(score, 3)})
+        per_page[url] = per_page.get(url, 0) + 1
+        used_chars += len(chunk)
+        if used_chars >= max_chars:
+            break
+    return selected
+
+
+_fetcher: Optional[PageFetcher] = None
+
+
+def get_page_fetcher() -> PageFetcher:
+    """Process-wide page fetcher, created on first use."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = PageFetcher()
+    return _fetcher
+
+
+def close_page_fetcher():
+    """Close the process-wide page fetcher (called on application shutdown)."""
+    global _fetcher
+    if _fetcher is not None:
+        _fetcher.close()
+        _fetcher = None
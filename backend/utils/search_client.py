@@ -0,0 +1,342 @@
+"""
+Async client for web search APIs (Brave Search, Serper) shared by the web search agent
+and the search routes: pooled HTTP connections, a TTL result cache keyed by the
+normalized query and parameters, coalescing of identical in-flight requests and
+retries that honour the provider's rate-limit headers.
+
+Clients run on a shared background event loop thread, so the cache, the
+in-flight map and the connection pool are shared by async callers
+(`await client.search(...)` from any event loop) and by synchronous callers
+such as CrewAI tools (`client.search_sync(...)`).
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BRAVE_SEARCH_URL = "https://api.search.brave.com/res/v1/web/search"
+SERPER_SEARCH_URL = "https://google.serper.dev/search"
+
+# Client settings
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", "3"))
+SEARCH_MAX_RETRY_DELAY = float(os.getenv("SEARCH_MAX_RETRY_DELAY", "30"))
+SEARCH_MAX_CONNECTIONS = int(os.getenv("SEARCH_MAX_CONNECTIONS", "20"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))
+
+
+class SearchAPIError(Exception):
+    """A search request failed (after retries, when the failure was retryable)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used for cache keys."""
+    return " ".join(query.lower().split())
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+
+def get_search_loop() -> asyncio.AbstractEventLoop:
+    """Background event loop shared by all search clients, started on first use."""
+    global _loop, _loop_thread
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _loop_thread = threading.Thread(target=loop.run_forever, name="search-client", daemon=True)
+                _loop_thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_on_search_loop(coroutine):
+    """Run a coroutine on the search loop from synchronous code and return its result."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_search_loop()).result()
+
+
+def _first_number(header_value: Optional[str]) -> Optional[float]:
+    """First value of a header like Brave's `X-RateLimit-Reset: 1, 1419704` (per-second window first)."""
+    if not header_value:
+        return None
+    try:
+        return float(header_value.split(",")[0].strip())
+    except ValueError:
+        return None
+
+
+class TTLCache:
+    """Bounded mapping whose entries expire `ttl` seconds after being set (least recently used evicted first)."""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class AsyncSearchClient:
+    """
+    Search API client with connection pooling, result caching, request coalescing
+    and rate-limit-aware retries.
+
+    Identical concurrent queries (same normalized query and parameters) share a
+    single upstream call. 429 and 5xx responses are retried after the delay the
+    server asks for (`Retry-After` / `X-RateLimit-Reset`), or with exponential
+    backoff; when a response reports the rate-limit window as exhausted, new
+    requests wait for the window to reset instead of being rejected.
+    """
+
+    def __init__(self, base_url: str, headers: Optional[Dict[str, str]] = None, query_param: str = "q",
+                 method: str = "GET", ttl: float = SEARCH_CACHE_TTL,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES, max_retries: int = SEARCH_MAX_RETRIES,
+                 max_retry_delay: float = SEARCH_MAX_RETRY_DELAY,
+                 max_connections: int = SEARCH_MAX_CONNECTIONS, timeout: float = SEARCH_TIMEOUT):
+        """
+        Initialize the client (the search loop starts on the first request).
+
+        Args:
+            base_url: Search endpoint
+            headers: Headers sent with every request (e.g. the API token)
+            query_param: Name of the query parameter
+            method: "GET" sends the parameters in the query string, "POST" as a JSON body
+            ttl: Seconds a successful result stays cached (0 disables the cache)
+            max_entries: Maximum number of cached results
+            max_retries: Retries for rate-limited (429), server (5xx) and network errors
+            max_retry_delay: Upper bound for a single retry delay, in seconds
+            max_connections: Size of the HTTP connection pool
+            timeout: Request timeout, in seconds
+        """
+        self.base_url = base_url
+        self.headers = dict(headers or {})
+        self.query_param = query_param
+        self.method = method.upper()
+        self.max_retries = max_retries
+        self.max_retry_delay = max_retry_delay
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.cache = TTLCache(ttl=ttl, max_entries=max_entries)
+        self.stats = {"requests": 0, "upstream_calls": 0, "cache_hits": 0, "coalesced": 0, "retries": 0,
+                      "errors": 0}
+
+        # Only touched from the search loop
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._blocked_until = 0.0
+
+    def cache_key(self, query: str, params: Optional[Dict[str, Any]] = None) -> tuple:
+        """Cache/coalescing key: normalized query plus the sorted remaining parameters."""
+        extra = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items() if k != self.query_param))
+        return normalize_query(query), extra
+
+    # --- Public API ---
+
+    async def search(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Run a search from any event loop and return the decoded JSON response.
+
+        Raises:
+            SearchAPIError: If the request fails
+        """
+        loop = get_search_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._search(query, params or {})
+        future = asyncio.run_coroutine_threadsafe(self._search(query, params or {}), loop)
+        return await asyncio.wrap_future(future)
+
+    def search_sync(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Blocking version of `search` for code running outside an event loop.
+
+        Raises:
+            SearchAPIError: If the request fails
+        """
+        return run_on_search_loop(self._search(query, params or {}))
+
+    def close(self):
+        """Close the connection pool."""
+        if self._http is not None and _loop is not None:
+            asyncio.run_coroutine_threadsafe(self._http.aclose(), _loop).result(timeout=5)
+        self._http = None
+
+    # --- Internals (run on the search loop) ---
+
+    async def _search(self, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.stats["requests"] += 1
+        key = self.cache_key(query, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, query, params))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: a cancelled caller must not cancel the request other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: tuple, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        request_params = {self.query_param: query, **params}
+        if self.method == "POST":
+            request_kwargs = {"json": request_params}
+        else:
+            request_kwargs = {"params": request_params}
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._blocked_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            self.stats["upstream_calls"] += 1
+            try:
+                response = await self._http.request(self.method, self.base_url, headers=self.headers,
+                                                    **request_kwargs)
+            except httpx.HTTPError as e:
+                error = SearchAPIError(f"Request to {self.base_url} failed: {str(e)}")
+                delay = self._backoff(attempt)
+            else:
+                self._note_rate_limit(response)
+                if response.status_code == 200:
+                    try:
+                        data = response.json()
+                    except ValueError as e:
+                        self.stats["errors"] += 1
+                        raise SearchAPIError(f"Invalid JSON from {self.base_url}: {str(e)}", 200)
+                    self.cache.set(key, data)
+                    return data
+
+                error = SearchAPIError(f"{self.base_url} returned HTTP {response.status_code}", response.status_code)
+                if response.status_code != 429 and response.status_code < 500:
+                    self.stats["errors"] += 1
+                    raise error
+                delay = self._retry_delay(response, attempt)
+
+            if attempt == self.max_retries:
+                break
+            self.stats["retries"] += 1
+            logger.warning(f"{error}; retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+            await asyncio.sleep(delay)
+
+        self.stats["errors"] += 1
+        raise error
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_retry_delay, 0.5 * (2 ** attempt) + random.uniform(0, 0.25))
+
+    def _retry_delay(self, response: httpx.Response, attempt: int) -> float:
+        """Delay requested by the server (`Retry-After`, then `X-RateLimit-Reset`), or exponential backoff."""
+        requested = _first_number(response.headers.get("Retry-After"))
+        if requested is None and response.status_code == 429:
+            requested = _first_number(response.headers.get("X-RateLimit-Reset"))
+        if requested is None:
+            return self._backoff(attempt)
+        return min(self.max_retry_delay, max(0.0, requested) + random.uniform(0, 0.1))
+
+    def _note_rate_limit(self, response: httpx.Response):
+        """Hold new requests until the window resets when the server says none are left."""
+        remaining = _first_number(response.headers.get("X-RateLimit-Remaining"))
+        reset = _first_number(response.headers.get("X-RateLimit-Reset"))
+        if remaining is not None and remaining <= 0 and reset is not None:
+            self._blocked_until = max(self._blocked_until,
+                                      time.monotonic() + min(reset, self.max_retry_delay))
+
+
+_clients: Dict[tuple, AsyncSearchClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _shared_client(provider: str, api_key: str, factory) -> AsyncSearchClient:
+    key = (provider, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
+
+def get_brave_search_client(api_key: str) -> AsyncSearchClient:
+    """Process-wide Brave Search client for an API key, created on first use."""
+    return _shared_client("brave", api_key, lambda: AsyncSearchClient(
+        BRAVE_SEARCH_URL,
+        headers={"Accept": "application/json", "X-Subscription-Token": api_key},
+    ))
+
+
+def get_serper_search_client(api_key: str) -> AsyncSearchClient:
+    """Process-wide Serper (Google) client for an API key, created on first use."""
+    return _shared_client("serper", api_key, lambda: AsyncSearchClient(
+        SERPER_SEARCH_URL,
+        headers={"X-API-KEY": api_key, "Content-Type": "application/json"},
+        method="POST",
+    ))
+
+
+def close_search_clients():
+    """Close every process-wide search client and stop the search loop (called on application shutdown)."""
+    global _loop, _loop_thread
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.error(f"Error closing search client: {str(e)}")
+    with _loop_lock:
+        loop, thread = _loop, _loop_thread
+        _loop = _loop_thread = None
+    if loop is not None:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
@@ -0,0 +1,357 @@
+"""
+Unified web search layer: one provider interface (Brave, Serper and an offline
+mock) returning results in a single format, and a `WebSearch` front end that fans
+out to the configured providers and either returns the first adequate result
+set (hedged by default: the next provider starts only if the previous one has
+not answered after `hedge_delay` seconds, so a healthy primary is the only paid
+call) or merges all of them with reciprocal rank fusion and URL deduplication.
+
+Result format (one dict per hit):
+    {"title", "url", "description", "published", "source", "provider"}
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from backend.utils.search_client import (
+    SearchAPIError, get_brave_search_client, get_serper_search_client, run_on_search_loop,
+)
+
+logger = logging.getLogger(__name__)
+
+SEARCH_STRATEGIES = ("fastest", "merge")
+
+# Web search settings
+SEARCH_PROVIDERS = os.getenv("SEARCH_PROVIDERS", "")  # e.g. "brave,serper"; empty = every provider with a key
+SEARCH_STRATEGY = os.getenv("SEARCH_STRATEGY", "fastest")
+SEARCH_HEDGE_DELAY = float(os.getenv("SEARCH_HEDGE_DELAY", "1.0"))  # 0 = query every provider at once (opt-in)
+SEARCH_MIN_RESULTS = int(os.getenv("SEARCH_MIN_RESULTS", "1"))
+SEARCH_FANOUT_TIMEOUT = float(os.getenv("SEARCH_FANOUT_TIMEOUT", "15"))
+
+
+def normalize_url(url: str) -> str:
+    """Key used to detect the same page returned by different providers."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    normalized = host + parts.path.rstrip("/")
+    if parts.query:
+        normalized += "?" + parts.query
+    return normalized
+
+
+class SearchProvider:
+    """Base class for search providers: `search` returns hits in the common result format."""
+
+    name = "provider"
+
+    @property
+    def available(self) -> bool:
+        """Whether the provider is configured (e.g. has an API key)."""
+        return True
+
+    async def search(self, query: str, count: int = 10) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _result(self, title: str, url: str, description: str, published: str = "",
+                source: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "title": title or "",
+            "url": url or "",
+            "description": description or "",
+            "published": published or "",
+            "source": source or self.name,
+            "provider": self.name,
+        }
+
+
+class BraveProvider(SearchProvider):
+    """Brave Search API (web and news results)."""
+
+    name = "brave"
+
+    def __init__(self, api_key: Optional[str] = None, params: Optional[Dict[str, Any]] = None):
+        self.api_key = api_key or os.getenv("BRAVE_SEARCH_API_KEY")
+        self.params = dict(params or {})
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    async def search(self, query: str, count: int = 10) -> List[Dict[str, Any]]:
+        params = {"count": min(count, 20), **self.params}  # Brave API max is 20
+        data = await get_brave_search_client(self.api_key).search(query, params)
+        return self.format_results(data)
+
+    def format_results(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        results = []
+        for section, source in (("web", "Brave Search"), ("news", "News")):
+            for item in data.get(section, {}).get("results", []):
+                results.append(self._result(item.get("title", ""), item.get("url", ""),
+                                            item.get("description", ""), item.get("age", ""), source))
+        return results
+
+
+class SerperProvider(SearchProvider):
+    """Serper (Google results) API."""
+
+    name = "serper"
+
+    def __init__(self, api_key: Optional[str] = None, params: Optional[Dict[str, Any]] = None):
+        self.api_key = api_key or os.getenv("SERPER_API_KEY")
+        self.params = dict(params or {})
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    async def search(self, query: str, count: int = 10) -> List[Dict[str, Any]]:
+        data = await get_serper_search_client(self.api_key).search(query, {"num": count, **self.params})
+        return self.format_results(data)
+
+    def format_results(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [
+            self._result(item.get("title", ""), item.get("link", ""), item.get("snippet", ""),
+                         item.get("date", ""), "Google (Serper)")
+            for item in data.get("organic", [])
+        ]
+
+
+class MockSearchProvider(SearchProvider):
+    """
+    Offline provider for tests and local development: returns deterministic hits
+    derived from the query (or the fixed `results` given), after `latency`
+    seconds, and raises SearchAPIError when `fail` is set. `params` is kept, like
+    the real providers' request parameters, but does not change the hits.
+    """
+
+    def __init__(self, name: str = "mock", results: Optional[List[Dict[str, Any]]] = None,
+                 latency: float = 0.0, fail: bool = False, params: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.params = dict(params or {})
+        self.results = results
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    async def search(self, query: str, count: int = 10) -> List[Dict[str, Any]]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail:
+            raise SearchAPIError(f"Mock provider '{self.name}' failed")
+        if self.results is not None:
+            return [self._result(r.get("title", ""), r.get("url", ""), r.get("description", ""),
+                                 r.get("published", "")) for r in self.results[:count]]
+        slug = hashlib.md5(query.encode("utf-8")).hexdigest()[:8]
+        return [
+            self._result(f"{query} - result {rank + 1}", f"https://example.com/{slug}/{rank + 1}",
+                         f"Mock result {rank + 1} for '{query}' from {self.name}.")
+            for rank in range(count)
+        ]
+
+
+class WebSearch:
+    """
+    Fan-out over several search providers.
+
+    Strategies:
+        fastest: providers are started one after another, `hedge_delay` seconds
+            apart (all at once when it is 0), and the first result set with at
+            least `min_results` hits wins; the remaining requests are cancelled.
+        merge: every provider is queried and the result lists are fused with
+            reciprocal rank fusion, deduplicating hits by normalized URL.
+    """
+
+    def __init__(self, providers: Sequence[SearchProvider], strategy: str = SEARCH_STRATEGY,
+                 hedge_delay: float = SEARCH_HEDGE_DELAY, min_results: int = SEARCH_MIN_RESULTS,
+                 timeout: float = SEARCH_FANOUT_TIMEOUT, rrf_k: int = 60):
+        """
+        Initialize the fan-out.
+
+        Args:
+            providers: Providers in order of preference (unavailable ones are skipped)
+            strategy: "fastest" or "merge"
+            hedge_delay: Seconds to wait before starting the next provider (0 = all at once,
+                which sends every query to every paid API)
+            min_results: Hits needed for a result set to count as adequate
+            timeout: Overall time limit for one search, in seconds
+            rrf_k: Rank constant for reciprocal rank fusion in "merge"
+        """
+        if strategy not in SEARCH_STRATEGIES:
+            logger.warning(f"Unknown search strategy '{strategy}', using 'fastest'")
+            strategy = "fastest"
+        self.providers = [provider for provider in providers if provider.available]
+        self.strategy = strategy
+        self.hedge_delay = hedge_delay
+        self.min_results = min_results
+        self.timeout = timeout
+        self.rrf_k = rrf_k
+
+    async def search(self, query: str, count: int = 10) -> Dict[str, Any]:
+        """
+        Search with the configured strategy.
+
+        Returns:
+            Dictionary with the query, results, total_results, search_time, the
+            provider(s) used in `api_used` and a per-provider `providers` status
+
+        Raises:
+            SearchAPIError: If no provider is configured or every provider failed
+        """
+        if not self.providers:
+            raise SearchAPIError("No web search provider is configured")
+        if self.strategy == "merge":
+            results, used, statuses = await self._merge(query, count)
+        else:
+            results, used, statuses = await self._fastest(query, count)
+        if not used:
+            raise SearchAPIError("All search providers failed: " +
+                                 "; ".join(f"{name}: {status}" for name, status in statuses.items()))
+        return {
+            "query": query,
+            "results": results[:count],
+            "total_results": len(results[:count]),
+            "search_time": datetime.utcnow().isoformat(),
+            "api_used": "+".join(used),
+            "providers": statuses,
+        }
+
+    def search_sync(self, query: str, count: int = 10) -> Dict[str, Any]:
+        """Blocking version of `search` for code running outside an event loop."""
+        return run_on_search_loop(self.search(query, count))
+
+    async def _fastest(self, query: str, count: int):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        waiting = list(self.providers)
+        running: Dict[asyncio.Future, SearchProvider] = {}
+        statuses: Dict[str, str] = {}
+        best: Optional[tuple] = None
+
+        def launch_next():
+            provider = waiting.pop(0)
+            running[asyncio.ensure_future(provider.search(query, count))] = provider
+
+        launch_next()
+        if self.hedge_delay <= 0:
+            while waiting:
+                launch_next()
+
+        try:
+            while running or waiting:
+                if not running:
+                    launch_next()
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                wait_for = min(self.hedge_delay, remaining) if waiting else remaining
+                done, _ = await asyncio.wait(list(running), timeout=wait_for,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    provider = running.pop(task)
+                    try:
+                        results = task.result()
+                    except Exception as e:
+                        statuses[provider.name] = f"error: {str(e)}"
+                        continue
+                    statuses[provider.name] = f"ok ({len(results)} results)"
+                    if len(results) >= self.min_results:
+                        return results, [provider.name], self._finish(running, statuses)
+                    if best is None or len(results) > len(best[1]):
+                        best = (provider.name, results)
+                # Hedge: nothing adequate yet, so start the next provider
+                if waiting:
+                    launch_next()
+        finally:
+            self._finish(running, statuses)
+
+        if best is not None:
+            return best[1], [best[0]], statuses
+        return [], [], statuses
+
+    @staticmethod
+    def _finish(running: Dict[asyncio.Future, SearchProvider], statuses: Dict[str, str]) -> Dict[str, str]:
+        for task, provider in running.items():
+            task.cancel()
+            statuses.setdefault(provider.name, "cancelled")
+        running.clear()
+        return statuses
+
+    async def _merge(self, query: str, count: int):
+        tasks = [asyncio.ensure_future(provider.search(query, count)) for provider in self.providers]
+        done, pending = await asyncio.wait(tasks, timeout=self.timeout)
+        for task in pending:
+            task.cancel()
+
+        statuses: Dict[str, str] = {}
+        scores: Dict[str, float] = {}
+        merged: Dict[str, Dict[str, Any]] = {}
+        used = []
+        for provider, task in zip(self.providers, tasks):
+            if task not in done:
+                statuses[provider.name] = "timeout"
+                continue
+            try:
+                results = task.result()
+            except Exception as e:
+                statuses[provider.name] = f"error: {str(e)}"
+                continue
+            statuses[provider.name] = f"ok ({len(results)} results)"
+            used.append(provider.name)
+            for rank, result in enumerate(results):
+                key = normalize_url(result["url"]) or f"{provider.name}:{rank}"
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                if key in merged:
+                    merged[key]["providers"].append(provider.name)
+                else:
+                    merged[key] = {**result, "providers": [provider.name]}
+
+        ranked = sorted(merged, key=lambda key: scores[key], reverse=True)
+        return [merged[key] for key in ranked], used, statuses
+
+
+PROVIDER_FACTORIES = {
+    "brave": BraveProvider,
+    "serper": SerperProvider,
+    "mock": MockSearchProvider,
+}
+
+
+def create_web_search(provider_names: Optional[Sequence[str]] = None,
+                      provider_params: Optional[Dict[str, Dict[str, Any]]] = None, **params) -> WebSearch:
+    """
+    Build a WebSearch from provider names (default: SEARCH_PROVIDERS, or every
+    provider with an API key when it is empty).
+
+    `provider_params` maps a provider name to extra request parameters sent with
+    every query (e.g. {"brave": {"freshness": "pd", "country": "US"}}).
+    """
+    if provider_names is None:
+        provider_names = [name.strip() for name in SEARCH_PROVIDERS.split(",") if name.strip()] or ["brave", "serper"]
+    providers = []
+    for name in provider_names:
+        factory = PROVIDER_FACTORIES.get(name)
+        if factory is None:
+            logger.warning(f"Unknown search provider '{name}', skipping")
+            continue
+        extra = (provider_params or {}).get(name)
+        providers.append(factory(params=extra) if extra else factory())
+    return WebSearch(providers, **params)
+
+
+_web_search: Optional[WebSearch] = None
+
+
+def get_web_search() -> WebSearch:
+    """Process-wide WebSearch built from the environment, created on first use."""
+    global _web_search
+    if _web_search is None:
+        _web_search = create_web_search()
+    return _web_search
@@ -0,0 +1,267 @@
+"""
+Request telemetry: per-session traces made of timed spans (router, planner,
+agent steps, tool calls, LLM calls with token counts) plus process-wide
+aggregates rendered in the Prometheus text exposition format.
+"""
+
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+SPAN_KINDS = ("request", "router", "context", "planner", "crew", "agent_step", "tool", "llm")
+# Spans of these kinds name the agent that LLM calls made inside them are attributed to
+AGENT_SPAN_KINDS = ("planner", "agent_step")
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("dsagency_current_trace", default=None)
+_current_agent: contextvars.ContextVar = contextvars.ContextVar("dsagency_current_agent", default=None)
+
+
+class Trace:
+    """Spans recorded while serving one request of a session."""
+
+    def __init__(self, session_id: Optional[str]):
+        self.trace_id = uuid.uuid4().hex
+        self.session_id = session_id or "anonymous"
+        self.started_at = datetime.utcnow().isoformat()
+        self.start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "spans": list(self.spans),
+        }
+
+
+class Telemetry:
+    """
+    Collects spans into the trace bound to the current request context and keeps
+    running aggregates by (kind, name) and, for tokens, by model.
+    """
+
+    def __init__(self, max_traces_per_session: int = 20, max_sessions: int = 1000):
+        self.max_traces_per_session = max_traces_per_session
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._traces: "OrderedDict[str, deque]" = OrderedDict()
+        self._span_count: Dict[tuple, int] = defaultdict(int)
+        self._span_seconds: Dict[tuple, float] = defaultdict(float)
+        self._span_errors: Dict[tuple, int] = defaultdict(int)
+        self._tokens: Dict[tuple, int] = defaultdict(int)
+        self._llm_requests: Dict[str, int] = defaultdict(int)
+
+    # --- Traces ---
+
+    @contextmanager
+    def trace(self, session_id: Optional[str]):
+        """Bind a new trace to the current context for the duration of a request."""
+        trace = Trace(session_id)
+        token = _current_trace.set(trace)
+        try:
+            with self.span("request", kind="request"):
+                yield trace
+        finally:
+            trace.duration_ms = round((time.perf_counter() - trace.start) * 1000, 3)
+            _current_trace.reset(token)
+            self._store_trace(trace)
+
+    def current_trace(self) -> Optional[Trace]:
+        return _current_trace.get()
+
+    def current_agent(self) -> Optional[str]:
+        return _current_agent.get()
+
+    def _store_trace(self, trace: Trace):
+        with self._lock:
+            session_traces = self._traces.get(trace.session_id)
+            if session_traces is None:
+                session_traces = deque(maxlen=self.max_traces_per_session)
+                self._traces[trace.session_id] = session_traces
+                if len(self._traces) > self.max_sessions:
+                    self._traces.popitem(last=False)
+            else:
+                self._traces.move_to_end(trace.session_id)
+            session_traces.append(trace)
+
+    def get_session_traces(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [trace.to_dict() for trace in self._traces.get(session_id, [])]
+
+    def get_session_summary(self, session_id: str) -> Dict[str, Any]:
+        """Totals over the retained traces of a session (sessions are not Prometheus labels)."""
+        traces = self.get_session_traces(session_id)
+        by_kind: Dict[str, float] = defaultdict(float)
+        for trace in traces:
+            for span in trace["spans"]:
+                by_kind[span["kind"]] += span["duration_ms"]
+        return {
+            "session_id": session_id,
+            "requests": len(traces),
+            "prompt_tokens": sum(trace["prompt_tokens"] for trace in traces),
+            "completion_tokens": sum(trace["completion_tokens"] for trace in traces),
+            "duration_ms_by_kind": {kind: round(ms, 3) for kind, ms in by_kind.items()},
+        }
+
+    # --- Spans ---
+
+    def _record(self, kind: str, name: str, duration_s: float, error: Optional[str] = None,
+                attributes: Optional[Dict[str, Any]] = None, trace: Optional[Trace] = None,
+                started: Optional[float] = None):
+        key = (kind, name)
+        with self._lock:
+            self._span_count[key] += 1
+            self._span_seconds[key] += duration_s
+            if error:
+                self._span_errors[key] += 1
+
+        trace = trace or _current_trace.get()
+        if trace is not None:
+            span = {
+                "kind": kind,
+                "name": name,
+                "offset_ms": round(((started if started is not None else time.perf_counter() - duration_s)
+                                    - trace.start) * 1000, 3),
+                "duration_ms": round(duration_s * 1000, 3),
+            }
+            if attributes:
+                span["attributes"] = attributes
+            if error:
+                span["error"] = error
+            trace.spans.append(span)
+
+    def record_span(self, kind: str, name: str, duration_s: float, error: Optional[str] = None,
+                    trace: Optional[Trace] = None, **attributes):
+        """
+        Record an already-timed span (for code paths that can't use the context manager).
+        `trace` overrides the context's trace, for callbacks that run on another thread.
+        """
+        self._record(kind, name, duration_s, error=error, attributes=attributes or None, trace=trace)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "request", **attributes):
+        """Time a block of work. Yields a dict the caller can add attributes to."""
+        start = time.perf_counter()
+        error = None
+        agent_token = _current_agent.set(name) if kind in AGENT_SPAN_KINDS else None
+        try:
+            yield attributes
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if agent_token is not None:
+                _current_agent.reset(agent_token)
+            self._record(kind, name, time.perf_counter() - start, error=error, attributes=attributes)
+
+    def traced(self, name: str, kind: str = "tool"):
+        """Decorator form of `span`, used for tool `_run` methods."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, kind=kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def step_recorder(self, agent_name: str):
+        """
+        Build a CrewAI `step_callback` that records one `agent_step` span per step,
+        timed from the previous step of the same agent.
+        """
+        state = {"last": time.perf_counter()}
+
+        def on_step(step_output):
+            now = time.perf_counter()
+            step_type = type(step_output).__name__
+            tool = getattr(step_output, "tool", None)
+            attributes = {"step": step_type}
+            if tool:
+                attributes["tool"] = str(tool)
+            self._record("agent_step", agent_name, now - state["last"], attributes=attributes)
+            state["last"] = now
+
+        return on_step
+
+    def record_llm_call(self, model: str, prompt_tokens: int, completion_tokens: int,
+                        duration_s: float = 0.0, requests: int = 1, agent: Optional[str] = None,
+                        trace: Optional[Trace] = None, error: Optional[str] = None,
+                        started: Optional[float] = None):
+        """
+        Record token usage for one LLM call (or a batch of `requests` calls). The span goes
+        to `trace` when given, otherwise to the trace of the current context; `started`
+        (a `time.perf_counter()` value) places it when it is recorded after the fact.
+        """
+        prompt_tokens = int(prompt_tokens or 0)
+        completion_tokens = int(completion_tokens or 0)
+        with self._lock:
+            self._tokens[(model, "prompt")] += prompt_tokens
+            self._tokens[(model, "completion")] += completion_tokens
+            self._llm_requests[model] += requests
+
+        attributes = {
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "requests": requests,
+        }
+        if agent:
+            attributes["agent"] = agent
+        trace = trace or _current_trace.get()
+        self._record("llm", agent or model, duration_s, error=error, attributes=attributes, trace=trace,
+                     started=started)
+
+        if trace is not None:
+            trace.prompt_tokens += prompt_tokens
+            trace.completion_tokens += completion_tokens
+
+    # --- Exposition ---
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    def render_prometheus(self) -> str:
+        """Render the aggregates in the Prometheus text format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            lines.append("# HELP dsagency_span_duration_seconds Time spent in instrumented spans.")
+            lines.append("# TYPE dsagency_span_duration_seconds summary")
+            for (kind, name), count in sorted(self._span_count.items()):
+                labels = f'kind="{self._escape(kind)}",name="{self._escape(name)}"'
+                lines.append(f"dsagency_span_duration_seconds_count{{{labels}}} {count}")
+                lines.append(f"dsagency_span_duration_seconds_sum{{{labels}}} {self._span_seconds[(kind, name)]:.6f}")
+
+            lines.append("# HELP dsagency_span_errors_total Instrumented spans that raised an exception.")
+            lines.append("# TYPE dsagency_span_errors_total counter")
+            for (kind, name), errors in sorted(self._span_errors.items()):
+                lines.append(f'dsagency_span_errors_total{{kind="{self._escape(kind)}",name="{self._escape(name)}"}} {errors}')
+
+            lines.append("# HELP dsagency_llm_tokens_total LLM tokens consumed, by model and token type.")
+            lines.append("# TYPE dsagency_llm_tokens_total counter")
+            for (model, token_type), tokens in sorted(self._tokens.items()):
+                lines.append(f'dsagency_llm_tokens_total{{model="{self._escape(model)}",type="{token_type}"}} {tokens}')
+
+            lines.append("# HELP dsagency_llm_requests_total LLM requests issued, by model.")
+            lines.append("# TYPE dsagency_llm_requests_total counter")
+            for model, requests in sorted(self._llm_requests.items()):
+                lines.append(f'dsagency_llm_requests_total{{model="{self._escape(model)}"}} {requests}')
+
+        return "\n".join(lines) + "\n"
+
+
+# Global instance shared by managers, agents, tools and the metrics routes
+telemetry = Telemetry()
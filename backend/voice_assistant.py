@@ -1,14 +1,16 @@
 import pyaudio
 import webrtcvad
 import speech_recognition as sr
-import queue
 import time
+import queue
 import threading
 import logging
 import json
 import asyncio
 import os
 import platform
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from typing import Dict, List, Any, Optional
 import requests
@@ -30,23 +32,336 @@ CHUNK_DURATION_MS = 30  # Duration of each chunk in milliseconds
 CHUNK_SIZE = int(RATE * CHUNK_DURATION_MS / 1000)  # Chunk size in samples
 VAD_MODE = 3  # Aggressiveness mode (3 is the most aggressive)
 PADDING_DURATION_MS = 300  # Amount of padding to add to each side of speech detection
+SEND_QUEUE_SIZE = 64  # Pending messages per WebSocket client before the oldest are dropped
+FRAME_BYTES = CHUNK_SIZE * 2  # 16-bit audio = 2 bytes per sample
+PRE_ROLL_FRAMES = 30  # Frames kept before speech onset (about 900ms of audio)
+MAX_UTTERANCE_MS = 30000  # Longer utterances are cut and processed
+RING_BUFFER_FRAMES = (MAX_UTTERANCE_MS // CHUNK_DURATION_MS) + PRE_ROLL_FRAMES + 100  # Extra slack for the consumer
+
+# Speech-to-text settings
+STT_ENGINE = os.getenv("STT_ENGINE", "auto")  # "auto", "vosk" (offline) or "google"
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "")
+STT_PARTIAL_INTERVAL_FRAMES = int(os.getenv("STT_PARTIAL_INTERVAL_FRAMES", "10"))  # About 300ms between partials
+VOICE_COMMAND_WORKERS = int(os.getenv("VOICE_COMMAND_WORKERS", "4"))  # Commands (search, agent) run at once
 
 # Detect if running in Docker
 IN_DOCKER = os.path.exists('/.dockerenv')
 
-# Active clients
-active_connections: List[WebSocket] = []
+class AudioRingBuffer:
+    """
+    Preallocated circular buffer of fixed-size audio frames.
+
+    The audio callback writes frames in place (no per-chunk allocation) and the
+    processing thread blocks on `read` until a frame is available, instead of
+    polling. Frames are addressed by an ever-increasing index, so a voiced
+    segment is just a (start, end) pair; `segment` returns it as a view of the
+    buffer (a single copy only when the segment wraps around the end).
+    """
+
+    def __init__(self, capacity: int = RING_BUFFER_FRAMES, frame_bytes: int = FRAME_BYTES):
+        self.capacity = capacity
+        self.frame_bytes = frame_bytes
+        self._data = bytearray(capacity * frame_bytes)
+        self._view = memoryview(self._data)
+        self._written = 0  # Index of the next frame to be written
+        self._read = 0  # Index of the next frame to be read
+        self._closed = False
+        self.overruns = 0
+        self._cond = threading.Condition()
+
+    @property
+    def oldest(self) -> int:
+        """Index of the oldest frame still in the buffer"""
+        return max(0, self._written - self.capacity)
+
+    def write(self, chunk: bytes):
+        """Copy one frame into its slot and wake the consumer (called from the audio callback)"""
+        if len(chunk) != self.frame_bytes:
+            return  # Partial frames can't be classified by the VAD
+        with self._cond:
+            offset = (self._written % self.capacity) * self.frame_bytes
+            self._data[offset:offset + self.frame_bytes] = chunk
+            self._written += 1
+            self._cond.notify()
+
+    def read(self, timeout: Optional[float] = None):
+        """
+        Block until a frame is available and return (index, read-only view of the frame),
+        or (None, None) on timeout or after `close`
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._read < self._written or self._closed, timeout):
+                return None, None
+            if self._closed:
+                return None, None
+            if self._read < self.oldest:
+                # The consumer fell behind by a whole buffer: skip the overwritten frames
+                self.overruns += self.oldest - self._read
+                self._read = self.oldest
+            index = self._read
+            self._read += 1
+        offset = (index % self.capacity) * self.frame_bytes
+        return index, self._view[offset:offset + self.frame_bytes].toreadonly()
+
+    def segment(self, start: int, end: int):
+        """Frames [start, end) as one bytes-like object (clamped to the frames still buffered)"""
+        start = max(start, self.oldest)
+        if end <= start:
+            return b""
+        first = (start % self.capacity) * self.frame_bytes
+        last = ((end - 1) % self.capacity + 1) * self.frame_bytes
+        if first < last:
+            return self._view[first:last].toreadonly()
+        return bytes(self._view[first:]) + bytes(self._view[:last])
+
+    def close(self):
+        """Wake up a blocked reader (used when stopping)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reset(self):
+        with self._cond:
+            self._written = self._read = 0
+            self._closed = False
+
+
+class STTError(Exception):
+    """The speech-to-text engine failed (as opposed to not understanding the audio)"""
+
+
+class STTStream:
+    """
+    One utterance being transcribed. Audio is fed while the user is still
+    speaking; `accept` may return a partial transcript and `finish` returns the
+    final one ("" when nothing was understood).
+    """
+
+    def accept(self, pcm: bytes) -> Optional[str]:
+        raise NotImplementedError
+
+    def finish(self) -> str:
+        raise NotImplementedError
+
+
+class STTEngine:
+    """Speech-to-text backend for 16-bit mono PCM at RATE Hz"""
+
+    name = "base"
+
+    def load(self):
+        """Load models ahead of the first utterance (may be slow)"""
+
+    def create_stream(self) -> STTStream:
+        raise NotImplementedError
+
+
+class _BufferedStream(STTStream):
+    """For engines without streaming support: collect the audio, transcribe it at the end"""
+
+    def __init__(self, transcribe):
+        self._transcribe = transcribe
+        self._audio = bytearray()
+
+    def accept(self, pcm: bytes) -> Optional[str]:
+        self._audio.extend(pcm)
+        return None
+
+    def finish(self) -> str:
+        return self._transcribe(bytes(self._audio))
+
+
+class GoogleSTTEngine(STTEngine):
+    """Google Web Speech API through speech_recognition (network, no partial transcripts)"""
+
+    name = "google"
 
-class VoiceAssistant:
     def __init__(self):
         self.recognizer = sr.Recognizer()
+
+    def create_stream(self) -> STTStream:
+        return _BufferedStream(self._transcribe)
+
+    def _transcribe(self, pcm: bytes) -> str:
+        audio = sr.AudioData(pcm, RATE, 2)  # 2 bytes per sample for 16-bit audio
+        try:
+            return self.recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            raise STTError(f"Could not request results from Speech Recognition service; {e}")
+
+
+class _VoskStream(STTStream):
+    def __init__(self, recognizer, partial_interval: int):
+        self._recognizer = recognizer
+        self._partial_interval = partial_interval
+        self._segments: List[str] = []
+        self._frames = 0
+
+    def accept(self, pcm: bytes) -> Optional[str]:
+        if self._recognizer.AcceptWaveform(pcm):
+            # Vosk closed a segment at an internal endpoint
+            text = json.loads(self._recognizer.Result()).get("text", "")
+            if text:
+                self._segments.append(text)
+        self._frames += 1
+        if self._frames % self._partial_interval:
+            return None
+        partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(self._segments + ([partial] if partial else [])) or None
+
+    def finish(self) -> str:
+        text = json.loads(self._recognizer.FinalResult()).get("text", "")
+        return " ".join(self._segments + ([text] if text else []))
+
+
+class VoskSTTEngine(STTEngine):
+    """
+    Offline recognition on the CPU with Vosk (Kaldi). Needs the optional `vosk`
+    package and a model directory (VOSK_MODEL_PATH); emits partial transcripts.
+    """
+
+    name = "vosk"
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH, partial_interval: int = STT_PARTIAL_INTERVAL_FRAMES):
+        self.model_path = model_path
+        self.partial_interval = max(1, partial_interval)
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                from vosk import Model, SetLogLevel  # Raises ImportError when the optional backend is not installed
+                if not os.path.isdir(self.model_path):
+                    raise FileNotFoundError(f"Vosk model directory not found: {self.model_path!r}")
+                SetLogLevel(-1)
+                self._model = Model(self.model_path)
+                logger.info(f"Loaded Vosk model from {self.model_path}")
+        return self._model
+
+    def create_stream(self) -> STTStream:
+        from vosk import KaldiRecognizer
+        return _VoskStream(KaldiRecognizer(self.load(), RATE), self.partial_interval)
+
+
+STT_ENGINES = {
+    "google": GoogleSTTEngine,
+    "vosk": VoskSTTEngine,
+}
+
+
+def create_stt_engine(name: str = STT_ENGINE) -> STTEngine:
+    """
+    Build the configured STT engine. "auto" prefers the offline Vosk engine when
+    its package and model are available, otherwise Google.
+    """
+    if name == "auto":
+        name = "vosk" if VOSK_MODEL_PATH and os.path.isdir(VOSK_MODEL_PATH) else "google"
+    if name == "vosk":
+        try:
+            engine = VoskSTTEngine()
+            engine.load()
+            return engine
+        except Exception as e:
+            logger.warning(f"Offline STT engine unavailable ({str(e)}), falling back to Google")
+            return GoogleSTTEngine()
+    factory = STT_ENGINES.get(name)
+    if factory is None:
+        logger.warning(f"Unknown STT engine '{name}', using Google")
+        factory = GoogleSTTEngine
+    return factory()
+
+
+class VoiceConnection:
+    """
+    A connected WebSocket client with its own bounded send queue, drained by a
+    sender task on the server loop. A slow client only fills its own queue (the
+    oldest messages are dropped) and never delays the other clients or the
+    audio thread.
+    """
+
+    def __init__(self, websocket: WebSocket, queue_size: int = SEND_QUEUE_SIZE,
+                 session_id: Optional[str] = None):
+        self.websocket = websocket
+        # Chat session this client's commands belong to (private to the connection)
+        self.session_id = session_id or f"voice-{uuid.uuid4().hex[:12]}"
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.sender: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.sender = asyncio.create_task(self._send_loop())
+
+    def enqueue(self, message: Dict[str, Any]):
+        """Queue a message without waiting (must run on the server loop)."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            if self.dropped % 10 == 1:
+                logger.warning(f"Slow voice client, {self.dropped} messages dropped so far")
+        self.queue.put_nowait(message)
+
+    async def _send_loop(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.websocket.send_json(message)
+            except Exception as e:
+                logger.error(f"Error sending message to voice client: {str(e)}")
+                _remove_connection(self)
+                return
+
+    def close(self):
+        if self.sender is not None and not self.sender.done():
+            self.sender.cancel()
+
+
+# Active clients
+active_connections: Dict[WebSocket, VoiceConnection] = {}
+
+
+def _remove_connection(connection: VoiceConnection):
+    if active_connections.get(connection.websocket) is connection:
+        del active_connections[connection.websocket]
+    connection.close()
+
+
+class VoiceAssistant:
+    def __init__(self, stt_engine: Optional[STTEngine] = None):
+        self._stt_engine = stt_engine
         self.vad = webrtcvad.Vad(VAD_MODE)
         self.audio_interface = None
         self.stream = None
-        self.audio_buffer = queue.Queue()
+        self.audio_buffer = AudioRingBuffer()
         self.is_listening = False
         self.thread = None
         self.mock_mode = False
+        # Server event loop that owns the WebSocket connections (see attach_loop)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Chat session of the commands spoken into the server microphone (or sent to /text);
+        # clients' own commands use their connection's session. Never exposed to clients.
+        self._local_session_id = f"voice-{uuid.uuid4().hex[:12]}"
+        # Recognition runs in its own thread, fed while the capture thread keeps reading audio
+        self._stt_queue: "queue.Queue" = queue.Queue()
+        self._stt_thread: Optional[threading.Thread] = None
+        # Commands (search, agent) run apart from recognition, in their own pool: a command
+        # waits for the crew, which runs on the default executor, so it must never occupy it
+        self._command_executor = ThreadPoolExecutor(max_workers=VOICE_COMMAND_WORKERS,
+                                                    thread_name_prefix="voice-command")
+    
+    @property
+    def stt_engine(self) -> STTEngine:
+        if self._stt_engine is None:
+            self._stt_engine = create_stt_engine()
+        return self._stt_engine
+    
+    def attach_loop(self, loop: asyncio.AbstractEventLoop):
+        """Remember the server loop so other threads can hand broadcasts to it"""
+        self.loop = loop
         
     def start(self):
         """Initialize and start the audio capture"""
@@ -64,6 +379,8 @@ class VoiceAssistant:
                 return True
                 
             # Normal audio device initialization for non-Docker environments
+            self.audio_buffer.reset()
+            self._start_recognition_worker()
             self.audio_interface = pyaudio.PyAudio()
             self.stream = self.audio_interface.open(
                 format=FORMAT,
@@ -99,6 +416,11 @@ class VoiceAssistant:
     def stop(self):
         """Stop audio capture and processing"""
         self.is_listening = False
+        self.audio_buffer.close()
+        if self._stt_thread and self._stt_thread.is_alive():
+            self._stt_queue.put(None)
+            self._stt_thread.join(timeout=2.0)
+        self._stt_thread = None
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
@@ -123,115 +445,167 @@ class VoiceAssistant:
         while self.is_listening:
             time.sleep(1)
     
-    def _process_text_input(self, text):
-        """Process text input directly (used for WebSocket text commands in mock mode)"""
+    def submit_text_input(self, text, connection: Optional[VoiceConnection] = None):
+        """Process text input on the command pool (it blocks on search and agent calls)"""
+        future = self._command_executor.submit(self._process_text_input, text, connection)
+        future.add_done_callback(lambda done: self._log_command_failure(done, connection))
+    
+    def _log_command_failure(self, future, connection: Optional[VoiceConnection] = None):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Error processing text input: {str(error)}")
+            self._broadcast_status("error", connection)
+    
+    def _process_text_input(self, text, connection: Optional[VoiceConnection] = None):
+        """
+        Process text input directly (used for WebSocket text commands in mock mode).
+        Replies go only to `connection` when given, otherwise to every client.
+        """
         if not text:
             return
             
         logger.info(f"Processing text input: {text}")
-        self._broadcast_status("processing")
-        self._broadcast_result(text)
-        self._process_command(text)
+        self._broadcast_status("processing", connection)
+        self._broadcast_result(text, connection)
+        self._process_command(text, connection)
             
     def _audio_callback(self, in_data, frame_count, time_info, status):
         """Callback function for audio stream"""
         try:
-            self.audio_buffer.put(in_data)
+            self.audio_buffer.write(in_data)
             return (in_data, pyaudio.paContinue)
         except Exception as e:
             logger.error(f"Error in audio callback: {str(e)}")
             return (in_data, pyaudio.paAbort)
     
     def _process_audio_loop(self):
-        """Main processing loop for audio data"""
-        ring_buffer = []
-        voiced_frames = []
-        is_speech = False
+        """Main processing loop for audio data: blocks until the callback delivers a frame"""
+        speech_start = None  # Index of the first frame of the current utterance
+        last_utterance_end = 0  # Frames before this index belong to an earlier utterance
         num_voiced = 0
         num_unvoiced = 0
+        max_utterance_frames = MAX_UTTERANCE_MS // CHUNK_DURATION_MS
         
         while self.is_listening:
             try:
-                # Get audio chunk from buffer
-                if self.audio_buffer.empty():
-                    time.sleep(0.01)
+                index, frame = self.audio_buffer.read(timeout=0.5)
+                if frame is None:
                     continue
-                    
-                chunk = self.audio_buffer.get()
-                ring_buffer.append(chunk)
                 
                 # Check if the chunk contains speech
-                if len(chunk) == CHUNK_SIZE * 2:  # 16-bit audio = 2 bytes per sample
-                    is_current_speech = self.vad.is_speech(chunk, RATE)
+                is_current_speech = self.vad.is_speech(frame, RATE)
+                
+                if is_current_speech:
+                    num_voiced += 1
+                    num_unvoiced = 0
+                else:
+                    num_unvoiced += 1
+                    
+                # Voice activity detection logic
+                if speech_start is None and num_voiced > 2:
+                    # Include the pre-roll frames that are still in the buffer, but never frames
+                    # of the previous utterance (its last word would be transcribed again)
+                    speech_start = max(index + 1 - PRE_ROLL_FRAMES, self.audio_buffer.oldest, last_utterance_end)
+                    logger.info("Speech detected, recording...")
+                    self._broadcast_status("listening")
+                    # Recognition starts now and runs while we keep capturing
+                    self._stt_queue.put(("start", None))
+                    self._stt_queue.put(("audio", bytes(self.audio_buffer.segment(speech_start, index + 1))))
+                    
+                elif speech_start is not None:
+                    self._stt_queue.put(("audio", bytes(frame)))
                     
-                    if is_current_speech:
-                        num_voiced += 1
+                    # If we detect a significant silence after speech (about 600ms), or the
+                    # utterance gets too long, process the audio
+                    if num_unvoiced > 20 or index + 1 - speech_start >= max_utterance_frames:
+                        num_voiced = 0
                         num_unvoiced = 0
-                    else:
-                        num_unvoiced += 1
                         
-                    # Voice activity detection logic
-                    if not is_speech and num_voiced > 2:
-                        is_speech = True
-                        voiced_frames = ring_buffer.copy()
-                        ring_buffer = []
-                        logger.info("Speech detected, recording...")
-                        self._broadcast_status("listening")
+                        # Process the speech
+                        if index + 1 - speech_start > 10:  # Ensure we have at least 300ms of audio
+                            self._stt_queue.put(("end", None))
+                        else:
+                            self._stt_queue.put(("cancel", None))
                         
-                    elif is_speech:
-                        voiced_frames.append(chunk)
-                        
-                        # If we detect a significant silence after speech, process the audio
-                        if num_unvoiced > 20:  # About 600ms of silence
-                            is_speech = False
-                            num_voiced = 0
-                            num_unvoiced = 0
-                            
-                            # Process the speech
-                            if len(voiced_frames) > 10:  # Ensure we have at least 300ms of audio
-                                self._process_speech(voiced_frames)
-                            
-                            voiced_frames = []
-                            ring_buffer = []
-                
-                # Keep the ring buffer at a reasonable size
-                if len(ring_buffer) > 30:  # About 900ms of audio
-                    ring_buffer.pop(0)
+                        speech_start = None
+                        last_utterance_end = index + 1
                     
             except Exception as e:
                 logger.error(f"Error processing audio: {str(e)}")
                 time.sleep(0.1)
     
-    def _process_speech(self, audio_frames):
-        """Process detected speech and convert to text"""
+    def _start_recognition_worker(self):
+        if self._stt_thread and self._stt_thread.is_alive():
+            return
+        self._stt_queue = queue.Queue()
+        self._stt_thread = threading.Thread(target=self._recognition_loop, daemon=True)
+        self._stt_thread.start()
+    
+    def _recognition_loop(self):
+        """
+        Worker thread: feeds each utterance to the STT engine as it is captured,
+        broadcasts partial transcripts and handles the final one
+        """
+        try:
+            self.stt_engine.load()
+        except Exception as e:
+            logger.error(f"Error loading STT engine {self.stt_engine.name}: {str(e)}")
+        
+        stream = None
+        last_partial = ""
+        while True:
+            item = self._stt_queue.get()
+            if item is None:
+                return
+            kind, payload = item
+            try:
+                if kind == "start":
+                    stream = self.stt_engine.create_stream()
+                    last_partial = ""
+                elif kind == "audio" and stream is not None:
+                    partial = stream.accept(payload)
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        self._broadcast({"type": "partial_result", "text": partial})
+                elif kind == "cancel":
+                    stream = None
+                elif kind == "end" and stream is not None:
+                    current, stream = stream, None
+                    self._finish_utterance(current)
+            except Exception as e:
+                logger.error(f"Error in speech recognition: {str(e)}")
+                stream = None
+                self._broadcast_status("error")
+    
+    def _finish_utterance(self, stream: STTStream):
+        """Get the final transcript and dispatch it (the command runs apart, recognition continues)"""
         self._broadcast_status("processing")
         logger.info("Processing speech...")
+        try:
+            text = stream.finish()
+        except STTError as e:
+            logger.error(str(e))
+            self._broadcast_status("error")
+            return
         
+        if not text:
+            logger.info("Speech Recognition could not understand audio")
+            self._broadcast_status("not_understood")
+            return
+        
+        logger.info(f"Recognized text: {text}")
+        self._broadcast_result(text)
+        self._command_executor.submit(self._run_command, text)
+    
+    def _run_command(self, text):
         try:
-            # Combine all audio frames into a single buffer
-            audio_data = b''.join(audio_frames)
-            
-            # Create an AudioData object from raw audio
-            audio = sr.AudioData(audio_data, RATE, 2)  # 2 bytes per sample for 16-bit audio
-            
-            # Attempt to recognize the speech
-            try:
-                text = self.recognizer.recognize_google(audio)
-                logger.info(f"Recognized text: {text}")
-                self._broadcast_result(text)
-                self._process_command(text)
-            except sr.UnknownValueError:
-                logger.info("Speech Recognition could not understand audio")
-                self._broadcast_status("not_understood")
-            except sr.RequestError as e:
-                logger.error(f"Could not request results from Speech Recognition service; {e}")
-                self._broadcast_status("error")
+            self._process_command(text)
         except Exception as e:
-            logger.error(f"Error processing speech: {str(e)}")
+            logger.error(f"Error processing command: {str(e)}")
             self._broadcast_status("error")
     
-    def _process_command(self, text):
-        """Process the recognized command text"""
+    def _process_command(self, text, connection: Optional[VoiceConnection] = None):
+        """Process the recognized command text (replies go to `connection` when given)"""
         text_lower = text.lower()
         
         # Check for search commands
@@ -246,16 +620,16 @@ class VoiceAssistant:
             for term in search_terms:
                 if term in text_lower:
                     query = text_lower.split(term, 1)[1].strip()
-                    self._perform_search(query)
+                    self._perform_search(query, connection)
                     return
         
         # If no specific command is detected, treat as a general query for agents
-        self._send_to_agent(text)
+        self._send_to_agent(text, connection)
     
-    def _perform_search(self, query):
+    def _perform_search(self, query, connection: Optional[VoiceConnection] = None):
         """Perform a web search using the Brave Search API"""
         logger.info(f"Performing web search for: {query}")
-        self._broadcast_status("searching")
+        self._broadcast_status("searching", connection)
         
         try:
             # Check if Brave Search API key is available
@@ -274,7 +648,7 @@ class VoiceAssistant:
                         "description": "Configure BRAVE_SEARCH_API_KEY in your environment to get real search results."
                     }
                 ]
-                self._broadcast_search_results(query, results)
+                self._broadcast_search_results(query, results, connection)
                 return
                 
             # Call Brave search API
@@ -299,89 +673,94 @@ class VoiceAssistant:
                     })
             
             # Broadcast search results
-            self._broadcast_search_results(query, results)
+            self._broadcast_search_results(query, results, connection)
             
         except Exception as e:
             logger.error(f"Error performing web search: {str(e)}")
-            self._broadcast_status("search_error")
+            self._broadcast_status("search_error", connection)
     
-    def _send_to_agent(self, text):
-        """Send the text to the agent system for processing"""
+    def _send_to_agent(self, text, connection: Optional[VoiceConnection] = None):
+        """
+        Run the text through the chat pipeline in-process (same session history as /api/chat)
+        and stream the response back over the voice WebSocket. Runs once: no loopback HTTP
+        call, no timeout-triggered retries that would re-run the crew.
+        
+        A client's command uses the client's session and its response is sent only to
+        that client; microphone commands use the assistant's local session.
+        """
         if not text:
             return
-            
-        self._broadcast_status("thinking")
         
-        max_retries = 3
-        retry_delay = 1  # seconds
+        if self.loop is None or self.loop.is_closed():
+            logger.error("Voice assistant is not attached to the server loop, cannot reach the agent system")
+            self._broadcast_agent_response("Sorry, the agent system is not available right now.", connection)
+            return
         
-        for attempt in range(max_retries):
-            try:
-                # Make an HTTP request to the chat endpoint - using localhost inside the container
-                url = "http://localhost:8000/api/chat"
-                payload = {
-                    "message": text,
-                    "conversation_id": None  # Create a new conversation
-                }
-                
-                response = requests.post(url, json=payload, timeout=10)  # Add timeout
-                
-                if response.status_code == 200:
-                    agent_response = response.json().get("response", "")
-                    self._broadcast_agent_response(agent_response)
-                    return
-                else:
-                    logger.error(f"Error from agent API (attempt {attempt+1}/{max_retries}): {response.status_code} - {response.text}")
-                    if attempt == max_retries - 1:
-                        self._broadcast_agent_response(f"Sorry, I encountered an error processing your request. Please try again.")
-                    else:
-                        time.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-            except requests.exceptions.Timeout:
-                logger.error(f"Timeout connecting to agent system (attempt {attempt+1}/{max_retries})")
-                if attempt == max_retries - 1:
-                    self._broadcast_agent_response(f"Sorry, the agent system is taking too long to respond. Please try again later.")
-                else:
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-            except Exception as e:
-                logger.error(f"Error connecting to agent system (attempt {attempt+1}/{max_retries}): {str(e)}")
-                if attempt == max_retries - 1:
-                    self._broadcast_agent_response(f"Sorry, I encountered an error: {str(e)}")
-                else:
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
+        # Imported lazily: the chat pipeline pulls in the whole agent stack
+        from backend.api.chat_routes import process_chat_message
+        
+        session_id = connection.session_id if connection is not None else self._local_session_id
+        future = asyncio.run_coroutine_threadsafe(
+            process_chat_message(session_id, text, on_event=lambda event: self._broadcast(event, connection)),
+            self.loop
+        )
+        try:
+            # Status updates, response chunks and the final response are sent by the pipeline
+            future.result()
+        except Exception as e:
+            logger.error(f"Error in agent system: {str(e)}")
+            self._broadcast_agent_response(f"Sorry, I encountered an error: {str(e)}", connection)
     
-    def _broadcast_status(self, status):
-        """Broadcast status updates to all connected clients"""
-        asyncio.run(self._async_broadcast({"type": "status", "status": status}))
+    def _broadcast(self, message, connection: Optional[VoiceConnection] = None):
+        """
+        Hand a message to the server loop without blocking the calling thread
+        (audio/processing threads never wait for the clients). Sent to every
+        client, or only to `connection` when given.
+        """
+        loop = self.loop
+        if loop is None or loop.is_closed() or not active_connections:
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            loop.create_task(self._async_broadcast(message, connection))
+        else:
+            asyncio.run_coroutine_threadsafe(self._async_broadcast(message, connection), loop)
     
-    def _broadcast_result(self, text):
-        """Broadcast speech recognition results to all connected clients"""
-        asyncio.run(self._async_broadcast({"type": "speech_result", "text": text}))
+    def _broadcast_status(self, status, connection: Optional[VoiceConnection] = None):
+        """Broadcast status updates to all connected clients (or to `connection`)"""
+        self._broadcast({"type": "status", "status": status}, connection)
     
-    def _broadcast_search_results(self, query, results):
-        """Broadcast search results to all connected clients"""
-        asyncio.run(self._async_broadcast({
+    def _broadcast_result(self, text, connection: Optional[VoiceConnection] = None):
+        """Broadcast speech recognition results to all connected clients (or to `connection`)"""
+        self._broadcast({"type": "speech_result", "text": text}, connection)
+    
+    def _broadcast_search_results(self, query, results, connection: Optional[VoiceConnection] = None):
+        """Broadcast search results to all connected clients (or to `connection`)"""
+        self._broadcast({
             "type": "search_results", 
             "query": query, 
             "results": results
-        }))
+        }, connection)
     
-    def _broadcast_agent_response(self, response):
-        """Broadcast agent response to all connected clients"""
-        asyncio.run(self._async_broadcast({
+    def _broadcast_agent_response(self, response, connection: Optional[VoiceConnection] = None):
+        """Broadcast agent response to all connected clients (or to `connection`)"""
+        self._broadcast({
             "type": "agent_response", 
             "response": response
-        }))
+        }, connection)
     
-    async def _async_broadcast(self, message):
-        """Asynchronously broadcast a message to all connected WebSocket clients"""
-        for connection in active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting message: {str(e)}")
+    async def _async_broadcast(self, message, connection: Optional[VoiceConnection] = None):
+        """Fan a message out to the clients' send queues (each client is sent to by its own task)"""
+        if connection is not None:
+            # Only while it is still connected
+            if active_connections.get(connection.websocket) is connection:
+                connection.enqueue(message)
+            return
+        for connection in list(active_connections.values()):
+            connection.enqueue(message)
 
 # Create global voice assistant instance
 voice_assistant = VoiceAssistant()
@@ -389,6 +768,7 @@ voice_assistant = VoiceAssistant()
 @router.on_event("startup")
 async def startup_voice_assistant():
     """Start the voice assistant when the API starts"""
+    voice_assistant.attach_loop(asyncio.get_running_loop())
     voice_assistant.start()
 
 @router.on_event("shutdown")
@@ -400,11 +780,16 @@ async def shutdown_voice_assistant():
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for voice assistant communication"""
     await websocket.accept()
-    active_connections.append(websocket)
+    voice_assistant.attach_loop(asyncio.get_running_loop())
+    # Every send to this client goes through its queue, so sends never overlap. The client
+    # can join its voice commands to one of its chat sessions (?session_id=...)
+    connection = VoiceConnection(websocket, session_id=websocket.query_params.get("session_id"))
+    connection.start()
+    active_connections[websocket] = connection
     
     try:
         # Send initial status
-        await websocket.send_json({"type": "status", "status": "ready"})
+        connection.enqueue({"type": "status", "status": "ready"})
         
         # Keep the connection alive and handle any client messages
         while True:
@@ -414,28 +799,31 @@ async def websocket_endpoint(websocket: WebSocket):
                 if message.get("action") == "start_listening":
                     if not voice_assistant.is_listening:
                         success = voice_assistant.start()
-                        await websocket.send_json({
+                        connection.enqueue({
                             "type": "status", 
                             "status": "listening" if success else "error"
                         })
                 elif message.get("action") == "stop_listening":
                     if voice_assistant.is_listening:
-                        voice_assistant.stop()
-                        await websocket.send_json({"type": "status", "status": "stopped"})
+                        await asyncio.get_running_loop().run_in_executor(None, voice_assistant.stop)
+                        connection.enqueue({"type": "status", "status": "stopped"})
+                elif message.get("action") == "set_session" and message.get("session_id"):
+                    connection.session_id = message["session_id"]
+                    connection.enqueue({"type": "session", "session_id": connection.session_id})
                 elif message.get("action") == "process_text" and voice_assistant.mock_mode:
                     # Process text directly in mock mode
                     text = message.get("text", "")
                     if text:
-                        voice_assistant._process_text_input(text)
+                        # Processing blocks (search, agent call): run it off the event loop
+                        voice_assistant.submit_text_input(text, connection)
             except json.JSONDecodeError:
                 logger.error(f"Invalid JSON received: {data}")
                 
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        _remove_connection(connection)
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
-        if websocket in active_connections:
-            active_connections.remove(websocket)
+        _remove_connection(connection)
 
 @router.get("/status")
 async def get_status():
@@ -462,5 +850,6 @@ async def process_text_input(text: str):
         if not success:
             return {"success": False, "error": "Could not start voice assistant"}
     
-    voice_assistant._process_text_input(text)
+    voice_assistant.attach_loop(asyncio.get_running_loop())
+    voice_assistant.submit_text_input(text)
     return {"success": True} 
\ No newline at end of file